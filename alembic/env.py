@@ -16,6 +16,8 @@ from src.models.db_schema import (
     Variant,
     VariantRun,
     Evaluation,
+    Job,
+    SuiteRunStats,
 )  # NOQA
 
 from alembic import context
@@ -0,0 +1,58 @@
+"""add access path indexes
+
+Revision ID: 0b6f3d48a1e9
+Revises: e5d2a7b913c4
+Create Date: 2024-07-23 09:14:36.820417
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0b6f3d48a1e9"
+down_revision = "e5d2a7b913c4"
+branch_labels = None
+depends_on = None
+
+# (table, columns) of the foreign key filters and created_at sorts used by the list, analytics and run queries
+# The models' __table_args__ declare the current indexes so autogenerate doesn't drop them
+INDEXES = [
+    ("bot", ["user_id", "created_at"]),
+    ("bot", ["organization_id", "created_at"]),
+    ("environment", ["bot_id", "created_at"]),
+    ("suite", ["bot_id", "created_at"]),
+    ("suite_run", ["suite_id", "environment_id", "created_at"]),
+    ("suite_run", ["environment_id", "created_at"]),
+    ("test", ["suite_id", "created_at"]),
+    ("test_run", ["test_id", "environment_id", "created_at"]),
+    ("test_run", ["environment_id", "created_at"]),
+    ("test_run", ["suite_run_id"]),
+    ("baseline", ["test_id", "created_at"]),
+    ("variant", ["test_id"]),
+    ("variant_run", ["test_run_id"]),
+    ("evaluation", ["variant_run_id"]),
+    ("job", ["target_id"]),
+]
+
+
+def get_index_name(table: str, columns: list[str]):
+    return f"ix_{table}_{'_'.join(columns)}"
+
+
+def upgrade() -> None:
+    # Built CONCURRENTLY on Postgres so writes to these tables aren't blocked, which can't run in a transaction
+    # If a build fails, drop the invalid index it leaves behind and run the migration again
+    with op.get_context().autocommit_block():
+        for table, columns in INDEXES:
+            op.create_index(
+                get_index_name(table, columns), table, columns, postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, columns in reversed(INDEXES):
+            op.drop_index(
+                get_index_name(table, columns), table_name=table, postgresql_concurrently=True, if_exists=True
+            )
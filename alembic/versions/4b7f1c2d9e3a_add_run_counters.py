@@ -0,0 +1,75 @@
+"""add run counters
+
+Revision ID: 4b7f1c2d9e3a
+Revises: 93882ec78efd
+Create Date: 2024-07-08 10:12:31.402177
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "4b7f1c2d9e3a"
+down_revision = "93882ec78efd"
+branch_labels = None
+depends_on = None
+
+RUN_TABLES = ["suite_run", "test_run", "variant_run"]
+
+# (parent table, child table, child foreign key, child pass rate expression, child runtime expression)
+BACKFILLS = [
+    (
+        "variant_run",
+        "evaluation",
+        "variant_run_id",
+        "CASE WHEN status = 'PASS' THEN 1 ELSE 0 END",
+        "replayed_elapsed_seconds",
+    ),
+    ("test_run", "variant_run", "test_run_id", "pass_rate", "average_replayed_elapsed_seconds"),
+    ("suite_run", "test_run", "suite_run_id", "pass_rate", "average_replayed_elapsed_seconds"),
+]
+
+
+def backfill_counters(parent: str, child: str, foreign_key: str, pass_rate: str, runtime: str):
+    completed = (
+        f"FROM {child} WHERE {child}.{foreign_key} = {parent}.id"
+        f" AND {child}.status IN ('PASS', 'FAIL', 'MIXED', 'ERROR')"
+    )
+    op.execute(
+        f"""
+        UPDATE {parent} SET
+            completed_count = (SELECT COUNT(*) {completed}),
+            pass_count = (SELECT COUNT(*) {completed} AND {child}.status = 'PASS'),
+            fail_count = (SELECT COUNT(*) {completed} AND {child}.status = 'FAIL'),
+            error_count = (SELECT COUNT(*) {completed} AND {child}.status = 'ERROR'),
+            pass_rate_sum = (SELECT COALESCE(SUM({pass_rate}), 0) {completed}),
+            replayed_elapsed_seconds_sum = (SELECT COALESCE(SUM({runtime}), 0) {completed})
+        """
+    )
+
+
+def upgrade() -> None:
+    for table in RUN_TABLES:
+        op.add_column(table, sa.Column("completed_count", sa.Integer(), server_default="0", nullable=False))
+        op.add_column(table, sa.Column("pass_count", sa.Integer(), server_default="0", nullable=False))
+        op.add_column(table, sa.Column("fail_count", sa.Integer(), server_default="0", nullable=False))
+        op.add_column(table, sa.Column("error_count", sa.Integer(), server_default="0", nullable=False))
+        op.add_column(table, sa.Column("pass_rate_sum", sa.Float(), server_default="0", nullable=False))
+        op.add_column(table, sa.Column("replayed_elapsed_seconds_sum", sa.Float(), server_default="0", nullable=False))
+
+    # Seed the counters of existing runs so in-flight runs can still complete
+    for backfill in BACKFILLS:
+        backfill_counters(*backfill)
+
+
+def downgrade() -> None:
+    for table in reversed(RUN_TABLES):
+        op.drop_column(table, "replayed_elapsed_seconds_sum")
+        op.drop_column(table, "pass_rate_sum")
+        op.drop_column(table, "error_count")
+        op.drop_column(table, "fail_count")
+        op.drop_column(table, "pass_count")
+        op.drop_column(table, "completed_count")
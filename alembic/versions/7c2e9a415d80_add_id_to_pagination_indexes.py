@@ -0,0 +1,80 @@
+"""add id to pagination indexes
+
+Revision ID: 7c2e9a415d80
+Revises: 0b6f3d48a1e9
+Create Date: 2024-07-25 11:03:52.614208
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "7c2e9a415d80"
+down_revision = "0b6f3d48a1e9"
+branch_labels = None
+depends_on = None
+
+# (table, columns) of the indexes replaced by the ones below
+OLD_INDEXES = [
+    ("bot", ["user_id", "created_at"]),
+    ("bot", ["organization_id", "created_at"]),
+    ("environment", ["bot_id", "created_at"]),
+    ("suite", ["bot_id", "created_at"]),
+    ("suite_run", ["suite_id", "environment_id", "created_at"]),
+    ("suite_run", ["environment_id", "created_at"]),
+    ("test", ["suite_id", "created_at"]),
+    ("test_run", ["test_id", "environment_id", "created_at"]),
+    ("test_run", ["environment_id", "created_at"]),
+    ("test_run", ["suite_run_id"]),
+    ("baseline", ["test_id", "created_at"]),
+    ("variant", ["test_id"]),
+]
+
+# (table, columns) of the paginated list queries, which are ordered by created_at and id and seek on both, so the
+# index returns the rows in page order without a sort
+NEW_INDEXES = [
+    ("bot", ["user_id", "created_at", "id"]),
+    ("bot", ["organization_id", "created_at", "id"]),
+    ("environment", ["bot_id", "created_at", "id"]),
+    ("suite", ["bot_id", "created_at", "id"]),
+    ("suite_run", ["suite_id", "created_at", "id"]),
+    ("suite_run", ["suite_id", "environment_id", "created_at", "id"]),
+    ("suite_run", ["environment_id", "created_at", "id"]),
+    ("test", ["suite_id", "created_at", "id"]),
+    ("test_run", ["test_id", "created_at", "id"]),
+    ("test_run", ["test_id", "environment_id", "created_at", "id"]),
+    ("test_run", ["environment_id", "created_at", "id"]),
+    ("test_run", ["suite_run_id", "created_at", "id"]),
+    ("baseline", ["test_id", "created_at", "id"]),
+    ("variant", ["test_id", "created_at", "id"]),
+]
+
+
+def get_index_name(table: str, columns: list[str]):
+    return f"ix_{table}_{'_'.join(columns)}"
+
+
+def create_indexes(indexes: list[tuple[str, list[str]]]):
+    for table, columns in indexes:
+        op.create_index(
+            get_index_name(table, columns), table, columns, postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def drop_indexes(indexes: list[tuple[str, list[str]]]):
+    for table, columns in reversed(indexes):
+        op.drop_index(get_index_name(table, columns), table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def upgrade() -> None:
+    # Built CONCURRENTLY like the indexes they replace, which are only dropped once the new ones exist
+    with op.get_context().autocommit_block():
+        create_indexes(NEW_INDEXES)
+        drop_indexes(OLD_INDEXES)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        create_indexes(OLD_INDEXES)
+        drop_indexes(NEW_INDEXES)
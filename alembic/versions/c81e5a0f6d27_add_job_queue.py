@@ -0,0 +1,52 @@
+"""add job queue
+
+Revision ID: c81e5a0f6d27
+Revises: 4b7f1c2d9e3a
+Create Date: 2024-07-09 15:41:02.118734
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "c81e5a0f6d27"
+down_revision = "4b7f1c2d9e3a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job",
+        sa.Column("id", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column(
+            "job_type",
+            sa.Enum("EVALUATE_CONVERSATION", "POPULATE_CONVERSATION_JSON", name="jobtypeenum"),
+            nullable=False,
+        ),
+        sa.Column("target_id", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("QUEUED", "RUNNING", "COMPLETED", "FAILED", "CANCELLED", name="jobstatusenum"),
+            nullable=False,
+        ),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("available_at", sa.DateTime(), nullable=False),
+        sa.Column("locked_at", sa.DateTime(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # Workers poll for the oldest due job by status
+    op.create_index("ix_job_status_available_at", "job", ["status", "available_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_job_status_available_at", table_name="job")
+    op.drop_table("job")
+    sa.Enum(name="jobstatusenum").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="jobtypeenum").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,42 @@
+"""add suite run stats
+
+Revision ID: e5d2a7b913c4
+Revises: c81e5a0f6d27
+Create Date: 2024-07-16 10:22:47.503186
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "e5d2a7b913c4"
+down_revision = "c81e5a0f6d27"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Historic suite runs are filled in with `make backfill-suite-run-stats`
+    op.create_table(
+        "suite_run_stats",
+        sa.Column("suite_run_id", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("test_run_status_counts", sa.JSON(), nullable=False),
+        sa.Column("evaluation_status_counts", sa.JSON(), nullable=False),
+        sa.Column("evaluation_count", sa.Integer(), nullable=False),
+        sa.Column("runtime_boxplot", sa.JSON(), nullable=True),
+        sa.Column("runtime_outliers", sa.JSON(), nullable=False),
+        sa.Column("evaluation_runtimes", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["suite_run_id"],
+            ["suite_run.id"],
+        ),
+        sa.PrimaryKeyConstraint("suite_run_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("suite_run_stats")
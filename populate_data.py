@@ -251,6 +251,7 @@ def create_test_runs(environment, test_id, test_name, suite_run_id=None):
     print(f"Created test run for test: {test_name} in environment: {environment}")
 
     variants = requests.get(REQUEST_URL + f"/v1/tests/{test_id}/variants", headers=HEADERS).json()["data"]
+    evaluations = []
     for variant in variants:
         # create variant runs
         POST_VARIANT_RUN_BODY = {
@@ -265,15 +266,18 @@ def create_test_runs(environment, test_id, test_name, suite_run_id=None):
         # get test
         response = requests.get(REQUEST_URL + f"/v1/tests/{test_id}", headers=HEADERS)
         for i in range(response.json()["iteration_count"]):
-            # create evaluations
-            POST_EVALUATION_BODY = {
-                "variant_run_id": variant_run_id,
-                "html_blob": "<div>blob</div>",
-                "replayed_elapsed_seconds": random.randint(100, 50000) / 100,
-                "initiation_type": "Manual",
-            }
-            response = requests.post(REQUEST_URL + "/v1/evaluations", json=POST_EVALUATION_BODY, headers=HEADERS)
-            print(f"Created evaluation for test: {test_name} in environment: {environment}")
+            evaluations.append(
+                {
+                    "variant_run_id": variant_run_id,
+                    "html_blob": "<div>blob</div>",
+                    "replayed_elapsed_seconds": random.randint(100, 50000) / 100,
+                    "initiation_type": "Manual",
+                }
+            )
+
+    # create the test run's evaluations in one request
+    response = requests.post(REQUEST_URL + "/v1/evaluations/batch", json={"evaluations": evaluations}, headers=HEADERS)
+    print(f"Created {len(evaluations)} evaluations for test: {test_name} in environment: {environment}")
 
 
 try:
@@ -348,19 +352,32 @@ try:
         # create a couple suite runs for each environment
         for environment in ENVIRONMENTS:
             for i in range(random.randint(2, 4)):
-                # create suite run
+                # create suite run, along with its test runs and variant runs
                 POST_SUITE_RUN_BODY = {
                     "suite_id": suite_to_id[suite],
                     "environment_id": env_to_id[environment],
                     "initiation_type": "Manual",
+                    "materialize_runs": True,
                 }
                 response = requests.post(REQUEST_URL + "/v1/suite_runs", json=POST_SUITE_RUN_BODY, headers=HEADERS)
                 suite_run_id = response.json()["id"]
                 print(f"Created suite run for suite: {suite} in environment: {environment} - id: {suite_run_id}")
 
-                # create test runs
-                for test_id in suite_to_tests[suite]:
-                    create_test_runs(environment, test_id, test_name, suite_run_id)
+                # create evaluations
+                evaluations = [
+                    {
+                        "variant_run_id": variant_run["id"],
+                        "html_blob": "<div>blob</div>",
+                        "replayed_elapsed_seconds": random.randint(100, 50000) / 100,
+                        "initiation_type": "Manual",
+                    }
+                    for test_run in response.json()["test_runs"]
+                    for variant_run in test_run["variant_runs"]
+                    for i in range(suite_iteration_count[suite])
+                ]
+                response = requests.post(
+                    REQUEST_URL + "/v1/evaluations/batch", json={"evaluations": evaluations}, headers=HEADERS
+                )
 
     print("Completed successfully!")
 except Exception as e:
@@ -15,5 +15,5 @@ async def root():
 
 
 @router.post("/contact")
-async def contact_form(request: ContactFormRequest):
+def contact_form(request: ContactFormRequest):
     return send_contact_form(request)
@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Response
+from sqlmodel.orm.session import Session
 
 from src.core import analytics
+from src.db import get_db_session
 from src.models.api_schema import (
+    NotModifiedResponse,
     ReportResponse,
     TrendingPerformance,
     TrendingSuccess,
     TrendingUsage,
 )
-from src.utils import get_actor
+from src.utils import etag_matches, get_actor
 
 router = APIRouter(prefix="/analytics")
 
@@ -18,8 +21,10 @@ router = APIRouter(prefix="/analytics")
     response_model_exclude_none=True,
     tags=["Analytics"],
 )
-async def get_trending_success(suite_id: str, environment_id: str, actor: dict = Depends(get_actor)):
-    return analytics.get_success_data(suite_id, environment_id, actor)
+def get_trending_success(
+    suite_id: str, environment_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
+):
+    return analytics.get_success_data(suite_id, environment_id, actor, db_session=db_session)
 
 
 @router.get(
@@ -28,8 +33,10 @@ async def get_trending_success(suite_id: str, environment_id: str, actor: dict =
     response_model_exclude_none=True,
     tags=["Analytics"],
 )
-async def get_trending_performance(suite_id: str, environment_id: str, actor: dict = Depends(get_actor)):
-    return analytics.get_performance_data(suite_id, environment_id, actor)
+def get_trending_performance(
+    suite_id: str, environment_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
+):
+    return analytics.get_performance_data(suite_id, environment_id, actor, db_session=db_session)
 
 
 @router.get(
@@ -38,8 +45,10 @@ async def get_trending_performance(suite_id: str, environment_id: str, actor: di
     response_model_exclude_none=True,
     tags=["Analytics"],
 )
-async def get_trending_usage(suite_id: str, environment_id: str, actor: dict = Depends(get_actor)):
-    return analytics.get_usage_data(suite_id, environment_id, actor)
+def get_trending_usage(
+    suite_id: str, environment_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
+):
+    return analytics.get_usage_data(suite_id, environment_id, actor, db_session=db_session)
 
 
 @router.get(
@@ -48,5 +57,18 @@ async def get_trending_usage(suite_id: str, environment_id: str, actor: dict = D
     response_model_exclude_none=True,
     tags=["Analytics"],
 )
-async def get_report(suite_run_id: str, actor: dict = Depends(get_actor)):
-    return analytics.get_report_data(suite_run_id, actor)
+def get_report(
+    suite_run_id: str,
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+):
+    # Clients whose copy is current get a 304 before any of the analytics are computed
+    etag = analytics.get_report_etag(suite_run_id, actor, db_session=db_session)
+    if etag_matches(etag, if_none_match):
+        return NotModifiedResponse(etag)
+    if etag:
+        response.headers["ETag"] = etag
+
+    return analytics.get_report_data(suite_run_id, actor, db_session=db_session)
@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends
+from sqlmodel.orm.session import Session
 
 from src.core import bots, copy, environments, suites
+from src.db import get_db_session
 from src.models.api_schema import (
     BotCreateRequest,
     BotReadResponse,
     BotUpdateRequest,
     ListEnvironmentReadResponse,
     ListSuiteReadResponse,
+    PageCursorQuery,
 )
 from src.utils import get_actor
 
@@ -14,23 +17,30 @@ router = APIRouter(prefix="/bots")
 
 
 @router.post("", response_model=BotReadResponse, response_model_exclude_none=True, tags=["Bots"])
-async def post_bots(request: BotCreateRequest, actor: dict = Depends(get_actor)):
-    return bots.create_bot(request, actor)
+def post_bots(
+    request: BotCreateRequest, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
+):
+    return bots.create_bot(request, actor, db_session=db_session)
 
 
 @router.patch("/{bot_id}", response_model=BotReadResponse, response_model_exclude_none=True, tags=["Bots"])
-async def patch_bots_id(request: BotUpdateRequest, bot_id: str, actor: dict = Depends(get_actor)):
-    return bots.update_bot_by_id(request, bot_id, actor)
+def patch_bots_id(
+    request: BotUpdateRequest,
+    bot_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+):
+    return bots.update_bot_by_id(request, bot_id, actor, db_session=db_session)
 
 
 @router.get("/{bot_id}", response_model=BotReadResponse, response_model_exclude_none=True, tags=["Bots"])
-async def get_bots_id(bot_id: str, actor: dict = Depends(get_actor)):
-    return bots.get_bot_by_id(bot_id, actor)
+def get_bots_id(bot_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)):
+    return bots.get_bot_by_id(bot_id, actor, db_session=db_session)
 
 
 @router.delete("/{bot_id}", tags=["Bots"])
-async def delete_bots_id(bot_id: str, actor: dict = Depends(get_actor)):
-    return bots.delete_bot_by_id(bot_id, actor)
+def delete_bots_id(bot_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)):
+    return bots.delete_bot_by_id(bot_id, actor, db_session=db_session)
 
 
 @router.get(
@@ -39,15 +49,39 @@ async def delete_bots_id(bot_id: str, actor: dict = Depends(get_actor)):
     response_model_exclude_none=True,
     tags=["Bots"],
 )
-async def get_bots_id_environments(bot_id: str, actor: dict = Depends(get_actor), limit: int = 10, page: int = 1):
-    return environments.get_environments_by_bot_id(bot_id, actor, limit, page)
+def get_bots_id_environments(
+    bot_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    limit: int = 10,
+    page: int = 1,
+    cursor: PageCursorQuery | None = None,
+    include_total: bool = True,
+):
+    return environments.get_environments_by_bot_id(
+        bot_id, actor, limit, page, cursor, include_total, db_session=db_session
+    )
 
 
 @router.get("/{bot_id}/suites", response_model=ListSuiteReadResponse, response_model_exclude_none=True, tags=["Bots"])
-async def get_bots_id_suites(bot_id: str, actor: dict = Depends(get_actor), limit: int = 10, page: int = 1):
-    return suites.get_suites_by_bot_id(bot_id, actor, limit, page)
+def get_bots_id_suites(
+    bot_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    limit: int = 10,
+    page: int = 1,
+    cursor: PageCursorQuery | None = None,
+    include_total: bool = True,
+):
+    return suites.get_suites_by_bot_id(bot_id, actor, limit, page, cursor, include_total, db_session=db_session)
 
 
 @router.post("/{bot_id}/copy", response_model=BotReadResponse, response_model_exclude_none=True, tags=["Bots"])
-async def post_bots_id_copy(bot_id: str, actor: dict = Depends(get_actor)):
-    return copy.copy_bot_by_id(bot_id, actor)
+def post_bots_id_copy(
+    bot_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    in_db: bool = False,
+):
+    # in_db copies the tests, variants and baselines inside the database, for suites with large baselines
+    return copy.copy_bot_by_id(bot_id, actor, in_db, db_session=db_session)
@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends
+from sqlmodel.orm.session import Session
 
 from src.core import environments, suite_runs, test_runs
+from src.db import get_db_session
 from src.models.api_schema import (
     EnvironmentCreateRequest,
     EnvironmentReadResponse,
     EnvironmentUpdateRequest,
     ListSuiteRunReadResponse,
     ListTestRunReadResponse,
+    PageCursorQuery,
 )
 from src.utils import get_actor
 
@@ -14,29 +17,38 @@ router = APIRouter(prefix="/environments")
 
 
 @router.post("", response_model=EnvironmentReadResponse, response_model_exclude_none=True, tags=["Environments"])
-async def post_environments(request: EnvironmentCreateRequest, actor: dict = Depends(get_actor)):
-    return environments.create_environment(request, actor)
+def post_environments(
+    request: EnvironmentCreateRequest, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
+):
+    return environments.create_environment(request, actor, db_session=db_session)
 
 
 @router.patch(
     "/{environment_id}", response_model=EnvironmentReadResponse, response_model_exclude_none=True, tags=["Environments"]
 )
-async def patch_environments_id(
-    request: EnvironmentUpdateRequest, environment_id: str, actor: dict = Depends(get_actor)
+def patch_environments_id(
+    request: EnvironmentUpdateRequest,
+    environment_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
 ):
-    return environments.update_environment_by_id(request, environment_id, actor)
+    return environments.update_environment_by_id(request, environment_id, actor, db_session=db_session)
 
 
 @router.get(
     "/{environment_id}", response_model=EnvironmentReadResponse, response_model_exclude_none=True, tags=["Environments"]
 )
-async def get_environments_id(environment_id: str, actor: dict = Depends(get_actor)):
-    return environments.get_environment_by_id(environment_id, actor)
+def get_environments_id(
+    environment_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
+):
+    return environments.get_environment_by_id(environment_id, actor, db_session=db_session)
 
 
 @router.delete("/{environment_id}", tags=["Environments"])
-async def delete_environments_id(environment_id: str, actor: dict = Depends(get_actor)):
-    return environments.delete_environment_by_id(environment_id, actor)
+def delete_environments_id(
+    environment_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
+):
+    return environments.delete_environment_by_id(environment_id, actor, db_session=db_session)
 
 
 @router.get(
@@ -45,10 +57,19 @@ async def delete_environments_id(environment_id: str, actor: dict = Depends(get_
     response_model_exclude_none=True,
     tags=["Environments"],
 )
-async def get_environments_id_suite_runs(
-    environment_id: str, actor: dict = Depends(get_actor), limit: int = 10, page: int = 1
+def get_environments_id_suite_runs(
+    environment_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    limit: int = 10,
+    page: int = 1,
+    cursor: PageCursorQuery | None = None,
+    include_total: bool = True,
+    include_blobs: bool = True,
 ):
-    return suite_runs.get_suite_runs_by_environment_id(environment_id, actor, limit, page)
+    return suite_runs.get_suite_runs_by_environment_id(
+        environment_id, actor, limit, page, cursor, include_total, include_blobs, db_session=db_session
+    )
 
 
 @router.get(
@@ -57,7 +78,16 @@ async def get_environments_id_suite_runs(
     response_model_exclude_none=True,
     tags=["Environments"],
 )
-async def get_environments_id_test_runs(
-    environment_id: str, actor: dict = Depends(get_actor), limit: int = 10, page: int = 1
+def get_environments_id_test_runs(
+    environment_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    limit: int = 10,
+    page: int = 1,
+    cursor: PageCursorQuery | None = None,
+    include_total: bool = True,
+    include_blobs: bool = True,
 ):
-    return test_runs.get_test_runs_by_environment_id(environment_id, actor, limit, page)
+    return test_runs.get_test_runs_by_environment_id(
+        environment_id, actor, limit, page, cursor, include_total, include_blobs, db_session=db_session
+    )
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi import APIRouter, Depends
+from sqlmodel.orm.session import Session
 
 from src.core import evaluations
+from src.db import get_db_session
 from src.models.api_schema import (
+    EvaluationBatchCreateRequest,
+    EvaluationBatchReadResponse,
     EvaluationCreateRequest,
     EvaluationReadResponse,
-    InvalidPermissionsResponse,
 )
 from src.utils import get_actor
 
@@ -12,25 +15,29 @@ router = APIRouter(prefix="/evaluations")
 
 
 @router.post("", response_model=EvaluationReadResponse, response_model_exclude_none=True, tags=["Evaluations"])
-async def post_evaluations(
-    request: EvaluationCreateRequest,
-    background_tasks: BackgroundTasks,
-    actor: dict = Depends(get_actor),
+def post_evaluations(
+    request: EvaluationCreateRequest, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
 ):
-    response: EvaluationReadResponse | InvalidPermissionsResponse = evaluations.create_evaluation(request, actor)
-
-    if isinstance(response, InvalidPermissionsResponse):
-        return response
+    # The evaluation itself is queued and run by a worker (src/worker.py) so we can send back a response sooner
+    return evaluations.create_evaluation(request, actor, db_session=db_session)
 
-    # Evaluate the actual conversation in the background so we can send back a response sooner
-    # Note that there still might be a delay to the reseponse as we have to process the HTML blob -> JSON using AI
-    background_tasks.add_task(evaluations.evaluate_conversation, response.id)
 
-    return response
+@router.post(
+    "/batch", response_model=EvaluationBatchReadResponse, response_model_exclude_none=True, tags=["Evaluations"]
+)
+def post_evaluations_batch(
+    request: EvaluationBatchCreateRequest,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+):
+    # Creates and queues many evaluations at once, e.g. every evaluation of a suite run
+    return evaluations.create_evaluations(request, actor, db_session=db_session)
 
 
 @router.get(
     "/{evaluation_id}", response_model=EvaluationReadResponse, response_model_exclude_none=True, tags=["Evaluations"]
 )
-async def get_evaluations_id(evaluation_id: str, actor: dict = Depends(get_actor)):
-    return evaluations.get_evaluation_by_id(evaluation_id, actor)
+def get_evaluations_id(
+    evaluation_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
+):
+    return evaluations.get_evaluation_by_id(evaluation_id, actor, db_session=db_session)
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends
+from sqlmodel.orm.session import Session
 
 from src.core import bots
-from src.models.api_schema import ListBotReadResponse
+from src.db import get_db_session
+from src.models.api_schema import ListBotReadResponse, PageCursorQuery
 from src.utils import get_actor
 
 router = APIRouter(prefix="/organizations")
@@ -13,7 +15,15 @@ router = APIRouter(prefix="/organizations")
     response_model_exclude_none=True,
     tags=["Organizations"],
 )
-async def get_organizations_id_bots(
-    organization_id: str, actor: dict = Depends(get_actor), limit: int = 10, page: int = 1
+def get_organizations_id_bots(
+    organization_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    limit: int = 10,
+    page: int = 1,
+    cursor: PageCursorQuery | None = None,
+    include_total: bool = True,
 ):
-    return bots.get_bots_by_organization_id(organization_id, actor, limit, page)
+    return bots.get_bots_by_organization_id(
+        organization_id, actor, limit, page, cursor, include_total, db_session=db_session
+    )
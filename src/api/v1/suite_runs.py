@@ -1,19 +1,33 @@
-from fastapi import APIRouter, Depends
+import asyncio
+from time import monotonic
+
+from fastapi import APIRouter, Depends, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlmodel.orm.session import Session
 
 from src.core import suite_runs, test_runs
+from src.db import get_db_session
+from src.events import format_event
 from src.models.api_schema import (
     ListTestRunReadResponse,
+    NotModifiedResponse,
+    PageCursorQuery,
     SuiteRunCreateRequest,
     SuiteRunReadResponse,
 )
-from src.utils import get_actor
+from src.models.enums import RunStatusEnum
+from src.settings import settings
+from src.utils import etag_matches, get_actor
 
 router = APIRouter(prefix="/suite_runs")
 
 
 @router.post("", response_model=SuiteRunReadResponse, response_model_exclude_none=True, tags=["Suite Runs"])
-async def post_suite_runs(request: SuiteRunCreateRequest, actor: dict = Depends(get_actor)):
-    return suite_runs.create_suite_run(request, actor)
+def post_suite_runs(
+    request: SuiteRunCreateRequest, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
+):
+    return suite_runs.create_suite_run(request, actor, db_session=db_session)
 
 
 @router.post(
@@ -22,8 +36,10 @@ async def post_suite_runs(request: SuiteRunCreateRequest, actor: dict = Depends(
     response_model_exclude_none=True,
     tags=["Suite Runs"],
 )
-async def post_suite_runs_id_stop(suite_run_id: str, actor: dict = Depends(get_actor)):
-    return suite_runs.suite_run_stop_by_id(suite_run_id, actor)
+def post_suite_runs_id_stop(
+    suite_run_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
+):
+    return suite_runs.suite_run_stop_by_id(suite_run_id, actor, db_session=db_session)
 
 
 @router.get(
@@ -32,8 +48,22 @@ async def post_suite_runs_id_stop(suite_run_id: str, actor: dict = Depends(get_a
     response_model_exclude_none=True,
     tags=["Suite Runs"],
 )
-async def get_suite_runs_id(suite_run_id: str, actor: dict = Depends(get_actor)):
-    return suite_runs.get_suite_run_by_id(suite_run_id, actor)
+def get_suite_runs_id(
+    suite_run_id: str,
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    include_blobs: bool = True,
+):
+    # Polling clients whose copy is current get a 304 before the run tree is loaded and serialized
+    etag = suite_runs.get_suite_run_etag(suite_run_id, actor, db_session=db_session)
+    if etag_matches(etag, if_none_match):
+        return NotModifiedResponse(etag)
+    if etag:
+        response.headers["ETag"] = etag
+
+    return suite_runs.get_suite_run_by_id(suite_run_id, actor, include_blobs, db_session=db_session)
 
 
 @router.get(
@@ -42,7 +72,59 @@ async def get_suite_runs_id(suite_run_id: str, actor: dict = Depends(get_actor))
     response_model_exclude_none=True,
     tags=["Suite Runs"],
 )
-async def get_suite_runs_id_test_runs(
-    suite_run_id: str, actor: dict = Depends(get_actor), limit: int = 10, page: int = 1
+def get_suite_runs_id_test_runs(
+    suite_run_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    limit: int = 10,
+    page: int = 1,
+    cursor: PageCursorQuery | None = None,
+    include_total: bool = True,
+    include_blobs: bool = True,
 ):
-    return test_runs.get_test_runs_by_suite_run_id(suite_run_id, actor, limit, page)
+    return test_runs.get_test_runs_by_suite_run_id(
+        suite_run_id, actor, limit, page, cursor, include_total, include_blobs, db_session=db_session
+    )
+
+
+async def stream_suite_run_events(suite_run_id: str, progress: dict, request: Request):
+    yield format_event("progress", progress)
+    last_sent_at = monotonic()
+    poll_interval_seconds = settings.run_events_poll_interval_seconds
+
+    while progress["status"] == RunStatusEnum.RUNNING.value:
+        await asyncio.sleep(poll_interval_seconds)
+        if await request.is_disconnected():
+            return
+
+        # Evaluations run in the worker process, so progress is polled from the database
+        # Each poll uses its own short session so the stream doesn't hold a connection
+        latest_progress = await run_in_threadpool(suite_runs.poll_suite_run_progress, suite_run_id)
+        if latest_progress != progress:
+            progress = latest_progress
+            yield format_event("progress", progress)
+            last_sent_at = monotonic()
+            poll_interval_seconds = settings.run_events_poll_interval_seconds
+            continue
+
+        # Back off while nothing changes
+        poll_interval_seconds = min(poll_interval_seconds * 2, settings.run_events_max_poll_interval_seconds)
+        if monotonic() - last_sent_at >= settings.run_events_keepalive_seconds:
+            # Comment lines keep proxies from closing an idle stream
+            yield ": keep-alive\n\n"
+            last_sent_at = monotonic()
+
+
+@router.get("/{suite_run_id}/events", tags=["Suite Runs"])
+def get_suite_runs_id_events(suite_run_id: str, request: Request, actor: dict = Depends(get_actor)):
+    # Permissions are only checked once, when the stream is opened
+    progress = suite_runs.get_suite_run_progress(suite_run_id, actor)
+    if not isinstance(progress, dict):
+        return progress
+
+    # The stream ends after the progress event with the suite run's final status
+    return StreamingResponse(
+        stream_suite_run_events(suite_run_id, progress, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends
+from sqlmodel.orm.session import Session
 
 from src.core import copy, suite_runs, suites, tests
+from src.db import get_db_session
 from src.models.api_schema import (
     ListSuiteRunReadResponse,
     ListTestReadResponse,
+    PageCursorQuery,
     SuiteCreateRequest,
     SuiteReadResponse,
     SuiteUpdateRequest,
@@ -14,23 +17,30 @@ router = APIRouter(prefix="/suites")
 
 
 @router.post("", response_model=SuiteReadResponse, response_model_exclude_none=True, tags=["Suites"])
-async def post_suites(request: SuiteCreateRequest, actor: dict = Depends(get_actor)):
-    return suites.create_suite(request, actor)
+def post_suites(
+    request: SuiteCreateRequest, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
+):
+    return suites.create_suite(request, actor, db_session=db_session)
 
 
 @router.patch("/{suite_id}", response_model=SuiteReadResponse, response_model_exclude_none=True, tags=["Suites"])
-async def patch_suites_id(request: SuiteUpdateRequest, suite_id: str, actor: dict = Depends(get_actor)):
-    return suites.update_suite_by_id(request, suite_id, actor)
+def patch_suites_id(
+    request: SuiteUpdateRequest,
+    suite_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+):
+    return suites.update_suite_by_id(request, suite_id, actor, db_session=db_session)
 
 
 @router.get("/{suite_id}", response_model=SuiteReadResponse, response_model_exclude_none=True, tags=["Suites"])
-async def get_suites_id(suite_id: str, actor: dict = Depends(get_actor)):
-    return suites.get_suite_by_id(suite_id, actor)
+def get_suites_id(suite_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)):
+    return suites.get_suite_by_id(suite_id, actor, db_session=db_session)
 
 
 @router.delete("/{suite_id}", tags=["Suites"])
-async def delete_suites_id(suite_id: str, actor: dict = Depends(get_actor)):
-    return suites.delete_suite_by_id(suite_id, actor)
+def delete_suites_id(suite_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)):
+    return suites.delete_suite_by_id(suite_id, actor, db_session=db_session)
 
 
 @router.get(
@@ -39,23 +49,44 @@ async def delete_suites_id(suite_id: str, actor: dict = Depends(get_actor)):
     response_model_exclude_none=True,
     tags=["Suites"],
 )
-async def get_suites_id_suite_runs(
-    suite_id: str, actor: dict = Depends(get_actor), environment_id: str | None = None, limit: int = 10, page: int = 1
+def get_suites_id_suite_runs(
+    suite_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    environment_id: str | None = None,
+    limit: int = 10,
+    page: int = 1,
+    cursor: PageCursorQuery | None = None,
+    include_total: bool = True,
+    include_blobs: bool = True,
 ):
-    return suite_runs.get_suite_runs_by_suite_id(suite_id, actor, environment_id, limit, page)
+    return suite_runs.get_suite_runs_by_suite_id(
+        suite_id, actor, environment_id, limit, page, cursor, include_total, include_blobs, db_session=db_session
+    )
 
 
 @router.get("/{suite_id}/tests", response_model=ListTestReadResponse, response_model_exclude_none=True, tags=["Suites"])
-async def get_suites_id_tests(
+def get_suites_id_tests(
     suite_id: str,
     actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
     environment_id: str | None = None,
     limit: int = 10,
     page: int = 1,
+    cursor: PageCursorQuery | None = None,
+    include_total: bool = True,
 ):
-    return tests.get_tests_by_suite_id(suite_id, actor, environment_id, limit, page)
+    return tests.get_tests_by_suite_id(
+        suite_id, actor, environment_id, limit, page, cursor, include_total, db_session=db_session
+    )
 
 
 @router.post("/{suite_id}/copy", response_model=SuiteReadResponse, response_model_exclude_none=True, tags=["Suites"])
-async def post_suites_id_copy(suite_id: str, actor: dict = Depends(get_actor)):
-    return copy.copy_suite_by_id(suite_id, actor)
+def post_suites_id_copy(
+    suite_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    in_db: bool = False,
+):
+    # in_db copies the tests, variants and baselines inside the database, for suites with large baselines
+    return copy.copy_suite_by_id(suite_id, actor, in_db, db_session=db_session)
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends
+from sqlmodel.orm.session import Session
 
 from src.core import test_runs
+from src.db import get_db_session
 from src.models.api_schema import TestRunCreateRequest, TestRunReadResponse
 from src.utils import get_actor
 
@@ -8,8 +10,10 @@ router = APIRouter(prefix="/test_runs")
 
 
 @router.post("", response_model=TestRunReadResponse, response_model_exclude_none=True, tags=["Test Runs"])
-async def post_test_runs(request: TestRunCreateRequest, actor: dict = Depends(get_actor)):
-    return test_runs.create_test_run(request, actor)
+def post_test_runs(
+    request: TestRunCreateRequest, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
+):
+    return test_runs.create_test_run(request, actor, db_session=db_session)
 
 
 @router.post(
@@ -18,10 +22,17 @@ async def post_test_runs(request: TestRunCreateRequest, actor: dict = Depends(ge
     response_model_exclude_none=True,
     tags=["Test Runs"],
 )
-async def post_test_runs_id_stop(test_run_id: str, actor: dict = Depends(get_actor)):
-    return test_runs.test_run_stop_by_id(test_run_id, actor)
+def post_test_runs_id_stop(
+    test_run_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
+):
+    return test_runs.test_run_stop_by_id(test_run_id, actor, db_session=db_session)
 
 
 @router.get("/{test_run_id}", response_model=TestRunReadResponse, response_model_exclude_none=True, tags=["Test Runs"])
-async def get_test_runs_id(test_run_id: str, actor: dict = Depends(get_actor)):
-    return test_runs.get_test_run_by_id(test_run_id, actor)
+def get_test_runs_id(
+    test_run_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    include_blobs: bool = True,
+):
+    return test_runs.get_test_run_by_id(test_run_id, actor, include_blobs, db_session=db_session)
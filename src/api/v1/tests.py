@@ -1,32 +1,39 @@
-from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, Response
+from sqlmodel.orm.session import Session
 
 from src.core import baselines, test_runs, tests, variants
+from src.db import get_db_session
 from src.models.api_schema import (
     ListBaselineReadResponse,
     ListTestRunReadResponse,
     ListVariantReadResponse,
+    NotModifiedResponse,
+    PageCursorQuery,
     TestCreateRequest,
     TestReadResponse,
     TestUpdateRequest,
 )
-from src.utils import get_actor
+from src.utils import etag_matches, get_actor
 
 router = APIRouter(prefix="/tests")
 
 
 @router.post("", response_model=TestReadResponse, response_model_exclude_none=True, tags=["Tests"])
-async def post_tests(request: TestCreateRequest, actor: dict = Depends(get_actor)):
-    return tests.create_test(request, actor)
+def post_tests(
+    request: TestCreateRequest, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)
+):
+    return tests.create_test(request, actor, db_session=db_session)
 
 
 @router.patch("/{test_id}", response_model=TestReadResponse, response_model_exclude_none=True, tags=["Tests"])
-async def patch_tests_id(
+def patch_tests_id(
     request: TestUpdateRequest,
     test_id: str,
     background_tasks: BackgroundTasks,
     actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
 ):
-    response = tests.update_test_by_id(request, test_id, actor)
+    response = tests.update_test_by_id(request, test_id, actor, db_session=db_session)
 
     if not isinstance(response, TestReadResponse):
         return response
@@ -39,37 +46,79 @@ async def patch_tests_id(
 
 
 @router.get("/{test_id}", response_model=TestReadResponse, response_model_exclude_none=True, tags=["Tests"])
-async def get_tests_id(test_id: str, actor: dict = Depends(get_actor), environment_id: str | None = None):
-    return tests.get_test_by_id(test_id, actor, environment_id)
+def get_tests_id(
+    test_id: str,
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    environment_id: str | None = None,
+):
+    # Polling clients whose copy is current get a 304 without the test being serialized
+    etag = tests.get_test_etag(test_id, actor, environment_id, db_session=db_session)
+    if etag_matches(etag, if_none_match):
+        return NotModifiedResponse(etag)
+    if etag:
+        response.headers["ETag"] = etag
+
+    return tests.get_test_by_id(test_id, actor, environment_id, db_session=db_session)
 
 
 @router.delete("/{test_id}", tags=["Tests"])
-async def delete_tests_id(test_id: str, actor: dict = Depends(get_actor)):
-    return tests.delete_test_by_id(test_id, actor)
+def delete_tests_id(test_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)):
+    return tests.delete_test_by_id(test_id, actor, db_session=db_session)
 
 
 @router.get(
     "/{test_id}/test_runs", response_model=ListTestRunReadResponse, response_model_exclude_none=True, tags=["Tests"]
 )
-async def get_tests_id_test_runs(
+def get_tests_id_test_runs(
     test_id: str,
     actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
     environment_id: str | None = None,
     limit: int = 10,
     page: int = 1,
+    cursor: PageCursorQuery | None = None,
+    include_total: bool = True,
+    include_blobs: bool = True,
 ):
-    return test_runs.get_test_runs_by_test_id(test_id, actor, environment_id, limit, page)
+    return test_runs.get_test_runs_by_test_id(
+        test_id, actor, environment_id, limit, page, cursor, include_total, include_blobs, db_session=db_session
+    )
 
 
 @router.get(
     "/{test_id}/baselines", response_model=ListBaselineReadResponse, response_model_exclude_none=True, tags=["Tests"]
 )
-async def get_tests_id_baselines(test_id: str, actor: dict = Depends(get_actor), limit: int = 10, page: int = 1):
-    return baselines.get_baselines_by_test_id(test_id, actor, limit, page)
+def get_tests_id_baselines(
+    test_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    limit: int = 10,
+    page: int = 1,
+    cursor: PageCursorQuery | None = None,
+    include_total: bool = True,
+    include_blobs: bool = True,
+):
+    return baselines.get_baselines_by_test_id(
+        test_id, actor, limit, page, cursor, include_total, include_blobs, db_session=db_session
+    )
 
 
 @router.get(
     "/{test_id}/variants", response_model=ListVariantReadResponse, response_model_exclude_none=True, tags=["Tests"]
 )
-async def get_tests_id_variants(test_id: str, actor: dict = Depends(get_actor), limit: int = 10, page: int = 1):
-    return variants.get_variants_by_test_id(test_id, actor, limit, page)
+def get_tests_id_variants(
+    test_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    limit: int = 10,
+    page: int = 1,
+    cursor: PageCursorQuery | None = None,
+    include_total: bool = True,
+    include_blobs: bool = True,
+):
+    return variants.get_variants_by_test_id(
+        test_id, actor, limit, page, cursor, include_total, include_blobs, db_session=db_session
+    )
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends
+from sqlmodel.orm.session import Session
 
 from src.core import bots
-from src.models.api_schema import ListBotReadResponse
+from src.db import get_db_session
+from src.models.api_schema import ListBotReadResponse, PageCursorQuery
 from src.utils import get_actor
 
 router = APIRouter(prefix="/users")
@@ -13,5 +15,13 @@ router = APIRouter(prefix="/users")
     response_model_exclude_none=True,
     tags=["Users"],
 )
-async def get_users_id_bots(user_id: str, actor: dict = Depends(get_actor), limit: int = 10, page: int = 1):
-    return bots.get_bots_by_user_id(user_id, actor, limit, page)
+def get_users_id_bots(
+    user_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+    limit: int = 10,
+    page: int = 1,
+    cursor: PageCursorQuery | None = None,
+    include_total: bool = True,
+):
+    return bots.get_bots_by_user_id(user_id, actor, limit, page, cursor, include_total, db_session=db_session)
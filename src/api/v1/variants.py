@@ -1,6 +1,8 @@
 from fastapi import APIRouter, BackgroundTasks, Depends
+from sqlmodel.orm.session import Session
 
 from src.core import variants
+from src.db import get_db_session
 from src.models.api_schema import (
     InvalidPermissionsResponse,
     VariantCreateRequest,
@@ -13,10 +15,15 @@ router = APIRouter(prefix="/variants")
 
 
 @router.post("", response_model=VariantReadResponse, response_model_exclude_none=True, tags=["Variants"])
-async def post_variants(
-    request: VariantCreateRequest, background_tasks: BackgroundTasks, actor: dict = Depends(get_actor)
+def post_variants(
+    request: VariantCreateRequest,
+    background_tasks: BackgroundTasks,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
 ):
-    response: VariantReadResponse | InvalidPermissionsResponse = variants.create_variant(request, actor)
+    response: VariantReadResponse | InvalidPermissionsResponse = variants.create_variant(
+        request, actor, db_session=db_session
+    )
 
     if isinstance(response, InvalidPermissionsResponse):
         return response
@@ -28,15 +35,20 @@ async def post_variants(
 
 
 @router.get("/{variant_id}", response_model=VariantReadResponse, response_model_exclude_none=True, tags=["Variants"])
-async def get_variants_id(variant_id: str, actor: dict = Depends(get_actor)):
-    return variants.get_variant_by_id(variant_id, actor)
+def get_variants_id(variant_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)):
+    return variants.get_variant_by_id(variant_id, actor, db_session=db_session)
 
 
 @router.patch("/{variant_id}", response_model=VariantReadResponse, response_model_exclude_none=True, tags=["Variants"])
-async def patch_variants_id(request: VariantUpdateRequest, variant_id: str, actor: dict = Depends(get_actor)):
-    return variants.update_variant_by_id(request, variant_id, actor)
+def patch_variants_id(
+    request: VariantUpdateRequest,
+    variant_id: str,
+    actor: dict = Depends(get_actor),
+    db_session: Session = Depends(get_db_session),
+):
+    return variants.update_variant_by_id(request, variant_id, actor, db_session=db_session)
 
 
 @router.delete("/{variant_id}", tags=["Variants"])
-async def delete_variant_id(variant_id: str, actor: dict = Depends(get_actor)):
-    return variants.delete_variant_by_id(variant_id, actor)
+def delete_variant_id(variant_id: str, actor: dict = Depends(get_actor), db_session: Session = Depends(get_db_session)):
+    return variants.delete_variant_by_id(variant_id, actor, db_session=db_session)
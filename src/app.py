@@ -1,3 +1,6 @@
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
@@ -63,8 +66,16 @@ OPENAPI_TAGS = [
 ]
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The sync routes run in this threadpool so blocking database and HTTP calls never stall the event loop
+    to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
+    yield
+
+
 def create_app():
     app = FastAPI(
+        lifespan=lifespan,
         title="bottest.ai",
         version="1.0.0",
         description="Backend API Specs for bottest.ai",
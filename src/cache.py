@@ -0,0 +1,133 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Event, Lock
+from time import monotonic
+from typing import Any, Callable, Hashable
+
+
+# Thread-safe in-process LRU cache whose entries expire after a TTL
+# Concurrent misses for the same key are deduplicated: one caller loads the value while
+# the others wait for it, so a burst of requests results in a single load
+class TTLCache:
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict = OrderedDict()
+        self._loading: dict = {}
+        self._lock = Lock()
+
+    def _get_entry(self, key: Hashable):
+        # Must be called with the lock held
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at <= monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def _set_entry(self, key: Hashable, value: Any, ttl_seconds: float | None):
+        # Must be called with the lock held
+        self._entries[key] = (value, monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds))
+        self._entries.move_to_end(key)
+
+        # Evict the least recently used entries
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, key: Hashable, default: Any = None):
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float | None = None):
+        with self._lock:
+            self._set_entry(key, value, ttl_seconds)
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        get_ttl_seconds: Callable[[Any], float | None] | None = None,
+    ):
+        # get_ttl_seconds lets callers give some values (e.g. negative results) a different TTL
+        while True:
+            with self._lock:
+                entry = self._get_entry(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry[0]
+
+                loading = self._loading.get(key)
+                if loading is None:
+                    # This caller loads the value, the others wait on the event
+                    self.misses += 1
+                    loading = self._loading[key] = Event()
+                    break
+
+            loading.wait()
+
+        try:
+            value = loader()
+            with self._lock:
+                self._set_entry(key, value, get_ttl_seconds(value) if get_ttl_seconds else None)
+            return value
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# Interface for caches whose entries may be shared across processes (e.g. Redis or Memcached)
+# Values are strings so any backend can store them
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> str | None:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl_seconds: float):
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+
+# Default backend, entries are only shared within the process
+class InProcessCacheBackend(CacheBackend):
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.cache = TTLCache(max_size, ttl_seconds)
+
+    def get(self, key: str) -> str | None:
+        return self.cache.get(key)
+
+    def set(self, key: str, value: str, ttl_seconds: float):
+        self.cache.set(key, value, ttl_seconds)
+
+    def delete(self, key: str):
+        self.cache.invalidate(key)
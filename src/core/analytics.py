@@ -1,14 +1,14 @@
 from datetime import datetime
 from random import randrange
 
-from sqlmodel import and_, select
+from sqlalchemy.orm import selectinload
+from sqlmodel import and_, func, select
 from sqlmodel.orm.session import Session
 
-from src.core.utils import (
-    calculate_boxplot_points,
-    calculate_performance_buckets,
-    has_viewer_permissions,
-)
+from src.core.analytics_cache import get_cached_response
+from src.core.suite_run_stats import get_suite_run_stats
+from src.core.suite_runs import get_suite_run_version
+from src.core.utils import calculate_performance_buckets, has_viewer_permissions
 from src.db import with_db_session
 from src.models.api_schema import (
     InvalidPermissionsResponse,
@@ -28,8 +28,61 @@ from src.models.api_schema import (
     TrendingSuccessStatuses,
     TrendingUsage,
 )
-from src.models.db_schema import Environment, Suite, SuiteRun, Test, TestRun
+from src.models.db_schema import (
+    Baseline,
+    Environment,
+    Evaluation,
+    Suite,
+    SuiteRun,
+    Test,
+    TestRun,
+    Variant,
+    VariantRun,
+)
 from src.models.enums import BillingTierEnum, ReportingConfigurationEnum, RunStatusEnum
+from src.utils import get_weak_etag
+
+
+def get_suite_run_test_runs(suite_run_id: str, db_session: Session, with_tests: bool = False):
+    db_query = select(TestRun).where(TestRun.suite_run_id == suite_run_id)
+    if with_tests:
+        db_query = db_query.options(selectinload(TestRun.test))
+
+    return db_session.exec(db_query).all()
+
+
+def count_by_test_id(model: type[Baseline] | type[Variant], test_ids: list[str], db_session: Session):
+    return dict(
+        db_session.exec(
+            select(model.test_id, func.count(model.id)).where(model.test_id.in_(test_ids)).group_by(model.test_id)
+        ).all()
+    )
+
+
+def get_runtime_range_by_test_run(test_run_ids: list[str], db_session: Session):
+    # {test_run_id: (min, max)} of the evaluation runtimes in each test run
+    return {
+        test_run_id: (min_run_time, max_run_time)
+        for test_run_id, min_run_time, max_run_time in db_session.exec(
+            select(
+                VariantRun.test_run_id,
+                func.min(Evaluation.replayed_elapsed_seconds),
+                func.max(Evaluation.replayed_elapsed_seconds),
+            )
+            .join(Evaluation, Evaluation.variant_run_id == VariantRun.id)
+            .where(VariantRun.test_run_id.in_(test_run_ids))
+            .group_by(VariantRun.test_run_id)
+        )
+    }
+
+
+def is_any_running(suite_runs: list[SuiteRun]):
+    return any(suite_run.status == RunStatusEnum.RUNNING for suite_run in suite_runs)
+
+
+def get_suite_runs_cache_key(suite_runs: list[SuiteRun]):
+    # Read from the database, so runs completed by the worker process change the key in every API process
+    return [(suite_run.id, suite_run.status.value, suite_run.completed_at) for suite_run in suite_runs]
 
 
 @with_db_session
@@ -56,43 +109,52 @@ def get_success_data(suite_id: str, environment_id: str, actor: dict, db_session
         .limit(10)
     ).all()
 
+    # the chart only changes while one of the suite runs is running
+    if not is_any_running(get_suite_runs):
+        return get_cached_response(
+            suite_id,
+            [environment_id] + get_suite_runs_cache_key(get_suite_runs),
+            TrendingSuccess,
+            lambda: build_success_data(get_suite, get_environment, get_suite_runs, db_session),
+        )
+
+    return build_success_data(get_suite, get_environment, get_suite_runs, db_session)
+
+
+def build_success_data(
+    get_suite: Suite, get_environment: Environment, get_suite_runs: list[SuiteRun], db_session: Session
+):
+    # read the stats of all the suite runs at once
+    suite_run_ids = [suite_run.id for suite_run in get_suite_runs]
+    suite_run_stats = get_suite_run_stats(suite_run_ids, db_session)
+
     evaluations_performed = []
     # initialize test statuses (one for each status in enum) with 0s as their data
     test_statuses = [TrendingSuccessStatuses(name=name, data=[0 for _ in range(10)]) for name in RunStatusEnum]
     evaluation_pass_rates = []
 
-    for i, suite_run in enumerate(get_suite_runs):
-        # keep track of number of evaluations per suite_run
-        evaluation_count = 0
-        # keep track of evaluation pass rates
-        evaluation_passes = 0
-
-        for test_run in suite_run.test_runs:
-            for variant_run in test_run.variant_runs:
-                for evaluation in variant_run.evaluations:
-                    # increment passes counter
-                    if evaluation.status == RunStatusEnum.PASS:
-                        evaluation_passes += 1
+    for i, suite_run_id in enumerate(suite_run_ids):
+        stats = suite_run_stats[suite_run_id]
 
-                # add total number of evaluations
-                evaluation_count += len(variant_run.evaluations)
+        # number of evaluations and passes in the suite run
+        evaluation_count = stats.evaluation_count
+        evaluation_passes = stats.evaluation_status_counts.get(RunStatusEnum.PASS.value, 0)
 
-            # in each test run, mark which status it was
-            for status in test_statuses:
-                if status.name == test_run.status:
-                    status.data[i] += 1
+        # mark how many test runs had each status
+        for status in test_statuses:
+            status.data[i] += stats.test_run_status_counts.get(status.name.value, 0)
 
         # append the evaluation count for the suite run
         evaluations_performed.append(evaluation_count)
         # append the evaluation pass rates for the suite run
-        evaluation_pass_rates.append(evaluation_passes / evaluation_count * 100)
+        evaluation_pass_rates.append(evaluation_passes / evaluation_count * 100 if evaluation_count else 0)
 
     return TrendingSuccess(
-        suite_id=suite_id,
+        suite_id=get_suite.id,
         suite_name=get_suite.name,
-        environment_id=environment_id,
+        environment_id=get_environment.id,
         environment_name=get_environment.name,
-        suite_run_ids=[suite_run.id for suite_run in get_suite_runs],
+        suite_run_ids=suite_run_ids,
         suite_run_names=[suite_run.created_at.strftime("%Y-%m-%d %H:%M:%S") for suite_run in get_suite_runs],
         evaluations_performed=evaluations_performed,
         test_statuses=test_statuses,
@@ -125,19 +187,34 @@ def get_performance_data(suite_id: str, environment_id: str, actor: dict, db_ses
         .limit(10)
     ).all()
 
+    # the chart only changes while one of the suite runs is running
+    if not is_any_running(get_suite_runs):
+        return get_cached_response(
+            suite_id,
+            [environment_id] + get_suite_runs_cache_key(get_suite_runs),
+            TrendingPerformance,
+            lambda: build_performance_data(get_suite, get_environment, get_suite_runs, db_session),
+        )
+
+    return build_performance_data(get_suite, get_environment, get_suite_runs, db_session)
+
+
+def build_performance_data(
+    get_suite: Suite, get_environment: Environment, get_suite_runs: list[SuiteRun], db_session: Session
+):
     performance_boxes = []
 
+    # read the boxplot points of all the suite runs at once
+    suite_run_stats = get_suite_run_stats([suite_run.id for suite_run in get_suite_runs], db_session)
+
     for suite_run in get_suite_runs:
-        # store all runtimes
-        suite_runtimes = []
-        for test_run in suite_run.test_runs:
-            for variant_run in test_run.variant_runs:
-                for evaluation in variant_run.evaluations:
-                    # append elapsed time for each evaluation
-                    suite_runtimes.append(evaluation.replayed_elapsed_seconds)
+        stats = suite_run_stats[suite_run.id]
+
+        # suite runs without evaluations have nothing to plot
+        if not stats.runtime_boxplot:
+            continue
 
-        # calculate boxplot points
-        values, outliers = calculate_boxplot_points(suite_runtimes)
+        values, outliers = list(stats.runtime_boxplot), list(stats.runtime_outliers)
 
         # TODO: REMOVE THIS HARDCODING
         if len(outliers) == 0:
@@ -159,9 +236,9 @@ def get_performance_data(suite_id: str, environment_id: str, actor: dict, db_ses
         )
 
     return TrendingPerformance(
-        suite_id=suite_id,
+        suite_id=get_suite.id,
         suite_name=get_suite.name,
-        environment_id=environment_id,
+        environment_id=get_environment.id,
         environment_name=get_environment.name,
         boxes=performance_boxes,
         timestamps=[suite_run.created_at for suite_run in get_suite_runs],
@@ -221,21 +298,7 @@ def get_usage_data(suite_id: str, environment_id: str, actor: dict, db_session:
     )
 
 
-@with_db_session
-def get_report_data(suite_run_id: str, actor: dict, db_session: Session):
-    # get the suite run from request
-    get_suite_run = db_session.get(SuiteRun, suite_run_id)
-
-    if not get_suite_run:
-        return NotFoundResponse(SuiteRun)
-
-    get_suite: Suite = get_suite_run.suite
-
-    # check if actor has viewer permissions
-    if not has_viewer_permissions(actor, get_suite.bot):
-        return InvalidPermissionsResponse()
-
-    # get the comparison run
+def get_comparison_run_for_report(get_suite_run: SuiteRun, get_suite: Suite, db_session: Session):
     reporting_comparison_configuration = get_suite.reporting_comparison_configuration
 
     # most recent same environment
@@ -272,14 +335,106 @@ def get_report_data(suite_run_id: str, actor: dict, db_session: Session):
     else:
         raise Exception("reporting_comparison_configuration not implemented")
 
+    return get_comparison_run
+
+
+@with_db_session
+def get_report_etag(suite_run_id: str, actor: dict, db_session: Session):
+    get_suite_run = db_session.get(SuiteRun, suite_run_id)
+
+    # Missing resources and permission errors have no ETag, the full request reports them
+    if not get_suite_run or not has_viewer_permissions(actor, get_suite_run.suite.bot):
+        return None
+
+    get_suite: Suite = get_suite_run.suite
+    get_comparison_run = get_comparison_run_for_report(get_suite_run, get_suite, db_session)
+    if not get_comparison_run:
+        return None
+
+    return get_weak_etag(*get_report_version(get_suite_run, get_suite, get_comparison_run, db_session))
+
+
+def get_report_version(get_suite_run: SuiteRun, get_suite: Suite, get_comparison_run: SuiteRun, db_session: Session):
+    # Changes whenever anything shown in the report does
+    # The report also shows the suite's tests and their baseline and variant counts
+    tests_version = db_session.exec(
+        select(func.count(Test.id), func.max(Test.last_updated_at)).where(Test.suite_id == get_suite.id)
+    ).one()
+    baselines_version = db_session.exec(
+        select(func.count(Baseline.id), func.max(Baseline.created_at))
+        .join(Test, Test.id == Baseline.test_id)
+        .where(Test.suite_id == get_suite.id)
+    ).one()
+    variants_version = db_session.exec(
+        select(func.count(Variant.id), func.max(Variant.created_at))
+        .join(Test, Test.id == Variant.test_id)
+        .where(Test.suite_id == get_suite.id)
+    ).one()
+
+    return (
+        get_suite.last_updated_at,
+        get_suite_run_version(get_suite_run, db_session),
+        get_suite_run_version(get_comparison_run, db_session),
+        tuple(tests_version),
+        tuple(baselines_version),
+        tuple(variants_version),
+    )
+
+
+@with_db_session
+def get_report_data(suite_run_id: str, actor: dict, db_session: Session):
+    # get the suite run from request
+    get_suite_run = db_session.get(SuiteRun, suite_run_id)
+
+    if not get_suite_run:
+        return NotFoundResponse(SuiteRun)
+
+    get_suite: Suite = get_suite_run.suite
+
+    # check if actor has viewer permissions
+    if not has_viewer_permissions(actor, get_suite.bot):
+        return InvalidPermissionsResponse()
+
+    # get the comparison run
+    reporting_comparison_configuration = get_suite.reporting_comparison_configuration
+    get_comparison_run = get_comparison_run_for_report(get_suite_run, get_suite, db_session)
+
+    # the report only changes while either run is running
+    if not is_any_running([get_suite_run, get_comparison_run]):
+        return get_cached_response(
+            get_suite.id,
+            [
+                get_suite_run.id,
+                get_comparison_run.id,
+                reporting_comparison_configuration.value,
+                get_suite.reporting_comparison_environment_id,
+                get_suite.reporting_comparison_suite_run_id,
+                # Keyed on the same version as the report's ETag, so the two can't disagree
+                get_weak_etag(*get_report_version(get_suite_run, get_suite, get_comparison_run, db_session)),
+            ],
+            ReportResponse,
+            lambda: build_report_data(get_suite_run, get_suite, get_comparison_run, db_session),
+        )
+
+    return build_report_data(get_suite_run, get_suite, get_comparison_run, db_session)
+
+
+def build_report_data(get_suite_run: SuiteRun, get_suite: Suite, get_comparison_run: SuiteRun, db_session: Session):
+    suite_run_id = get_suite_run.id
+
     # store list of run statuses
     status_enum_values = [status.value for status in RunStatusEnum]
 
+    # read the evaluation stats of both runs at once
+    suite_run_stats = get_suite_run_stats([suite_run_id, get_comparison_run.id], db_session, with_runtimes=True)
+
     """ ----------------- COMPARISON SECTION -----------------"""
 
     # store the status counts for comparison run
     comparison_test_status_counts = [0 for _ in status_enum_values]
-    comparison_evaluation_status_counts = [0 for _ in status_enum_values]
+    comparison_evaluation_status_counts = [
+        suite_run_stats[get_comparison_run.id].evaluation_status_counts.get(status, 0) for status in status_enum_values
+    ]
 
     # store the comparison tests to pass rate
     comparison_test_id_to_pass_rate = {}
@@ -288,10 +443,10 @@ def get_report_data(suite_run_id: str, actor: dict, db_session: Session):
     comparison_test_id_to_runtime = {}
 
     # store the runtimes for evals
-    comparison_evaluation_runtimes = []
+    comparison_evaluation_runtimes = suite_run_stats[get_comparison_run.id].evaluation_runtimes
 
     # iterate through all test_runs in the comparison run
-    for test_run in get_comparison_run.test_runs:
+    for test_run in get_suite_run_test_runs(get_comparison_run.id, db_session):
         # store comparison test to pass rate and runtime
         comparison_test_id_to_pass_rate[test_run.test_id] = test_run.pass_rate
         comparison_test_id_to_runtime[test_run.test_id] = test_run.average_replayed_elapsed_seconds
@@ -299,14 +454,6 @@ def get_report_data(suite_run_id: str, actor: dict, db_session: Session):
         # increment the status count for corresponding status
         comparison_test_status_counts[status_enum_values.index(test_run.status)] += 1
 
-        for variant_run in test_run.variant_runs:
-            for evaluation in variant_run.evaluations:
-                # append runtime for evaluation
-                comparison_evaluation_runtimes.append(evaluation.replayed_elapsed_seconds)
-
-                # increment the status count for corresponding status
-                comparison_evaluation_status_counts[status_enum_values.index(evaluation.status)] += 1
-
     """ ----------------- MAIN SUITE RUN SECTION -----------------"""
 
     # track total values
@@ -325,19 +472,30 @@ def get_report_data(suite_run_id: str, actor: dict, db_session: Session):
 
     # test and evaluation statuses and their counts
     test_status_counts = [0 for _ in status_enum_values]
-    evaluation_status_counts = [0 for _ in status_enum_values]
+    evaluation_status_counts = [
+        suite_run_stats[suite_run_id].evaluation_status_counts.get(status, 0) for status in status_enum_values
+    ]
 
     # store the runtime for evals
-    evaluation_runtimes = []
+    evaluation_runtimes = suite_run_stats[suite_run_id].evaluation_runtimes
 
     # store the tests with worse performance
     test_worst_performance = []
 
+    # load the test runs with their tests, and the evaluation runtime range of each test run
+    get_test_runs = get_suite_run_test_runs(suite_run_id, db_session, with_tests=True)
+    test_ids = [test_run.test_id for test_run in get_test_runs]
+    test_id_to_baseline_count = count_by_test_id(Baseline, test_ids, db_session)
+    test_id_to_variant_count = count_by_test_id(Variant, test_ids, db_session)
+    test_run_id_to_runtime_range = get_runtime_range_by_test_run(
+        [test_run.id for test_run in get_test_runs], db_session
+    )
+
     # iterate through all test runs in suite run
-    for test_run in get_suite_run.test_runs:
+    for test_run in get_test_runs:
         test: Test = test_run.test
-        baseline_count = len(test.baselines)
-        variant_count = len(test.variants)
+        baseline_count = test_id_to_baseline_count.get(test.id, 0)
+        variant_count = test_id_to_variant_count.get(test.id, 0)
         evaluation_count = test.iteration_count * variant_count
 
         # increment total values
@@ -389,11 +547,8 @@ def get_report_data(suite_run_id: str, actor: dict, db_session: Session):
             test.id in comparison_test_id_to_runtime
             and test_run.average_replayed_elapsed_seconds > comparison_test_id_to_runtime[test.id] * 1.1
         ):
-            # store all runtimes for this test
-            runtimes = []
-            for variant_run in test_run.variant_runs:
-                for evaluation in variant_run.evaluations:
-                    runtimes.append(evaluation.replayed_elapsed_seconds)
+            # fastest and slowest runtimes for this test
+            min_run_time, max_run_time = test_run_id_to_runtime_range[test_run.id]
 
             test_worst_performance.append(
                 ReportPerformanceTest(
@@ -404,21 +559,11 @@ def get_report_data(suite_run_id: str, actor: dict, db_session: Session):
                     percent_slower=(
                         test_run.average_replayed_elapsed_seconds / comparison_test_id_to_runtime[test.id] - 1
                     ),
-                    min_run_time=min(runtimes),
-                    max_run_time=max(runtimes),
+                    min_run_time=min_run_time,
+                    max_run_time=max_run_time,
                 )
             )
 
-        # iterate through all variant runs
-        for variant_run in test_run.variant_runs:
-            # iterate through all evaluations
-            for evaluation in variant_run.evaluations:
-                # append runtime for evaluation
-                evaluation_runtimes.append(evaluation.replayed_elapsed_seconds)
-
-                # increment the status count for corresponding status
-                evaluation_status_counts[status_enum_values.index(evaluation.status)] += 1
-
     # calculate pass rates for overview section
     test_pass_rate = test_status_counts[status_enum_values.index(RunStatusEnum.PASS)] / sum(test_status_counts)
     comparison_test_pass_rate = comparison_test_status_counts[status_enum_values.index(RunStatusEnum.PASS)] / sum(
@@ -0,0 +1,46 @@
+from typing import Callable
+from uuid import uuid4
+
+from sqlmodel import SQLModel
+
+from src.cache import CacheBackend, InProcessCacheBackend
+from src.settings import settings
+
+# Swap in another CacheBackend to share the cached responses across processes
+analytics_cache: CacheBackend = InProcessCacheBackend(
+    settings.analytics_cache_size, settings.analytics_cache_ttl_seconds
+)
+
+
+def get_suite_cache_version(suite_id: str):
+    # Part of every cache key for the suite, so changing it invalidates all of the suite's cached responses
+    version_key = f"suite_version:{suite_id}"
+    version = analytics_cache.get(version_key)
+    if version is None:
+        # A missing (or evicted) version gets a new one, so older entries can't be read again
+        version = uuid4().hex
+        analytics_cache.set(version_key, version, settings.analytics_cache_ttl_seconds)
+
+    return version
+
+
+def invalidate_suite_analytics(suite_id: str):
+    # Called by the API's edits, and only reaches other processes with a shared CacheBackend
+    # Run progress made by the worker is part of the cache keys instead
+    analytics_cache.delete(f"suite_version:{suite_id}")
+
+
+def get_cached_response(suite_id: str, key_parts: list, response_model: type[SQLModel], load: Callable[[], SQLModel]):
+    key = ":".join(
+        [response_model.__name__, suite_id, get_suite_cache_version(suite_id)] + [str(part) for part in key_parts]
+    )
+
+    cached_response = analytics_cache.get(key)
+    if cached_response is not None:
+        return response_model.model_validate_json(cached_response)
+
+    response = load()
+    if isinstance(response, response_model):
+        analytics_cache.set(key, response.model_dump_json(), settings.analytics_cache_ttl_seconds)
+
+    return response
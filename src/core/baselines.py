@@ -1,10 +1,15 @@
+from sqlalchemy.orm import undefer, undefer_group
 from sqlmodel import select
 from sqlmodel.orm.session import Session
 
+from src.core.analytics_cache import invalidate_suite_analytics
+from src.core.jobs import enqueue_job
 from src.core.utils import (
+    get_page,
     has_editor_permissions,
     has_viewer_permissions,
     parse_conversation_dict_from_html,
+    skip_blobs,
 )
 from src.db import with_db_session
 from src.models.api_schema import (
@@ -13,9 +18,10 @@ from src.models.api_schema import (
     InvalidPermissionsResponse,
     ListBaselineReadResponse,
     NotFoundResponse,
-    PaginationData,
 )
-from src.models.db_schema import Baseline, Bot, Test
+from src.models.db_schema import BLOBS, Baseline, Bot, Test
+from src.models.enums import JobTypeEnum
+from src.utils import PageCursor
 
 
 @with_db_session
@@ -28,15 +34,22 @@ def create_baseline(request: BaselineCreateRequest, actor: dict, db_session: Ses
         request.model_dump() | {"created_by": actor.get("id", "unknown"), "last_updated_by": actor.get("id", "unknown")}
     )
     db_session.add(new_baseline)
+
+    # queue parsing the conversation json out of the html blob
+    if not new_baseline.conversation_json:
+        enqueue_job(JobTypeEnum.POPULATE_CONVERSATION_JSON, new_baseline.id, db_session)
     db_session.commit()
     db_session.refresh(new_baseline)
 
+    # The cached analytics show each test's baseline count
+    invalidate_suite_analytics(test.suite_id)
+
     return BaselineReadResponse.model_validate(new_baseline)
 
 
 @with_db_session
 def get_baseline_by_id(baseline_id: str, actor: dict, db_session: Session):
-    get_baseline = db_session.get(Baseline, baseline_id)
+    get_baseline = db_session.get(Baseline, baseline_id, options=[undefer_group(BLOBS)])
 
     if not get_baseline:
         return NotFoundResponse(Baseline)
@@ -57,14 +70,26 @@ def delete_baseline_by_id(baseline_id: str, actor: dict, db_session: Session):
     if not has_editor_permissions(actor, get_baseline.test.suite.bot):
         return InvalidPermissionsResponse()
 
+    suite_id = get_baseline.test.suite_id
     db_session.delete(get_baseline)
     db_session.commit()
 
+    invalidate_suite_analytics(suite_id)
+
     return {"status": "OK"}
 
 
 @with_db_session
-def get_baselines_by_test_id(test_id: str, actor: dict, limit: int, page: int, db_session: Session):
+def get_baselines_by_test_id(
+    test_id: str,
+    actor: dict,
+    limit: int,
+    page: int,
+    cursor: PageCursor | None,
+    include_total: bool,
+    include_blobs: bool,
+    db_session: Session,
+):
     get_test = db_session.get(Test, test_id)
 
     if not get_test:
@@ -73,24 +98,23 @@ def get_baselines_by_test_id(test_id: str, actor: dict, limit: int, page: int, d
     if not has_viewer_permissions(actor, get_test.suite.bot):
         return InvalidPermissionsResponse()
 
-    offset = (page - 1) * limit
-    get_baselines = db_session.exec(
-        select(Baseline)
-        .where(Baseline.test_id == test_id)
-        .order_by(Baseline.created_at.desc())
-        .limit(limit)
-        .offset(offset)
-    ).all()
+    db_query = select(Baseline).where(Baseline.test_id == test_id)
+    if include_blobs:
+        db_query = db_query.options(undefer_group(BLOBS))
+
+    get_baselines, pagination = get_page(db_query, Baseline, limit, page, cursor, include_total, db_session)
+    if not include_blobs:
+        skip_blobs(get_baselines)
 
     return ListBaselineReadResponse(
         data=[BaselineReadResponse.model_validate(baseline) for baseline in get_baselines],
-        pagination=PaginationData(items_len=len(get_test.baselines), limit=limit, page=page),
+        pagination=pagination,
     )
 
 
 @with_db_session
 def populate_conversation_json(baseline_id: str, db_session: Session):
-    get_baseline: Baseline = db_session.get(Baseline, baseline_id)
+    get_baseline: Baseline = db_session.get(Baseline, baseline_id, options=[undefer(Baseline.html_blob)])
     get_bot: Bot = get_baseline.test.suite.bot
 
     if not get_bot.query_selector:
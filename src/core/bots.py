@@ -1,7 +1,8 @@
-from sqlmodel import func, select
+from sqlmodel import select
 from sqlmodel.orm.session import Session
 
 from src.core.utils import (
+    get_page,
     has_admin_permissions,
     has_viewer_permissions,
     update_db_model_with_request,
@@ -14,9 +15,9 @@ from src.models.api_schema import (
     InvalidPermissionsResponse,
     ListBotReadResponse,
     NotFoundResponse,
-    PaginationData,
 )
 from src.models.db_schema import Bot
+from src.utils import PageCursor
 
 
 @with_db_session
@@ -82,38 +83,46 @@ def delete_bot_by_id(bot_id: str, actor: dict, db_session: Session):
 
 
 @with_db_session
-def get_bots_by_user_id(user_id: str, actor: dict, limit: int, page: int, db_session: Session):
+def get_bots_by_user_id(
+    user_id: str,
+    actor: dict,
+    limit: int,
+    page: int,
+    cursor: PageCursor | None,
+    include_total: bool,
+    db_session: Session,
+):
     # Check that actor is same as user
     if user_id != actor.get("id", "unknown"):
         return InvalidPermissionsResponse()
 
-    offset = (page - 1) * limit
-    get_bots = db_session.exec(
-        select(Bot).where(Bot.user_id == user_id).order_by(Bot.created_at.desc()).limit(limit).offset(offset)
-    ).all()
-    count = db_session.exec(select(func.count()).where(Bot.user_id == user_id)).one()
+    get_bots, pagination = get_page(
+        select(Bot).where(Bot.user_id == user_id), Bot, limit, page, cursor, include_total, db_session
+    )
     return ListBotReadResponse(
         data=[BotReadResponse.model_validate(bot) for bot in get_bots],
-        pagination=PaginationData(items_len=count, limit=limit, page=page),
+        pagination=pagination,
     )
 
 
 @with_db_session
-def get_bots_by_organization_id(organization_id: str, actor: dict, limit: int, page: int, db_session: Session):
+def get_bots_by_organization_id(
+    organization_id: str,
+    actor: dict,
+    limit: int,
+    page: int,
+    cursor: PageCursor | None,
+    include_total: bool,
+    db_session: Session,
+):
     # Check that actor is org member
     if organization_id != actor.get("org_id", "unknown"):
         return InvalidPermissionsResponse()
 
-    offset = (page - 1) * limit
-    get_bots = db_session.exec(
-        select(Bot)
-        .where(Bot.organization_id == organization_id)
-        .order_by(Bot.created_at.desc())
-        .limit(limit)
-        .offset(offset)
-    ).all()
-    count = db_session.exec(select(func.count()).where(Bot.organization_id == organization_id)).one()
+    get_bots, pagination = get_page(
+        select(Bot).where(Bot.organization_id == organization_id), Bot, limit, page, cursor, include_total, db_session
+    )
     return ListBotReadResponse(
         data=[BotReadResponse.model_validate(bot) for bot in get_bots],
-        pagination=PaginationData(items_len=count, limit=limit, page=page),
+        pagination=pagination,
     )
@@ -1,3 +1,8 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Connection, MetaData, String, Table, cast, literal
+from sqlalchemy.orm import undefer_group
+from sqlmodel import SQLModel, func, insert, select
 from sqlmodel.orm.session import Session
 
 from src.core.utils import has_admin_permissions, has_editor_permissions
@@ -8,76 +13,133 @@ from src.models.api_schema import (
     NotFoundResponse,
     SuiteReadResponse,
 )
-from src.models.db_schema import Baseline, Bot, Environment, Suite, Test, Variant
-
-
-def create_duplicate_suite(suite: Suite, name: str, actor: dict, db_session: Session) -> Suite:
-    new_suite = Suite(
-        name=name,
-        default_success_criteria=suite.default_success_criteria,
-        default_iteration_count=suite.default_iteration_count,
-        default_variant_count=suite.default_variant_count,
-        reporting_comparison_configuration=suite.reporting_comparison_configuration,
-        reporting_comparison_suite_run_id=suite.reporting_comparison_suite_run_id,
-        reporting_comparison_environment_id=suite.reporting_comparison_environment_id,
-        bot_id=suite.bot_id,
-        created_by=actor.get("id", "unknown"),
-        last_updated_by=actor.get("id", "unknown"),
+from src.models.db_schema import BLOBS, Baseline, Bot, Environment, Suite, Test, Variant
+
+# Regenerated for every copied row instead of being copied
+COPY_EXCLUDED_FIELDS = {"id", "created_at", "created_by", "last_updated_at", "last_updated_by"}
+
+
+def copy_row(row: SQLModel, actor: dict, **values) -> SQLModel:
+    # Built in memory only, the copy gets a new id from the model's generate_id default
+    return type(row).model_validate(
+        row.model_dump(exclude=COPY_EXCLUDED_FIELDS)
+        | values
+        | {"created_by": actor.get("id", "unknown"), "last_updated_by": actor.get("id", "unknown")}
     )
-    db_session.add(new_suite)
-    db_session.commit()
-    db_session.refresh(new_suite)
-
-    # for each test in suite, create a duplicate test
-    for test in suite.tests:
-        new_test = Test(
-            name=test.name,
-            suite_id=new_suite.id,
-            success_criteria=test.success_criteria,
-            use_default_success_criteria=test.use_default_success_criteria,
-            iteration_count=test.iteration_count,
-            use_default_iteration_count=test.use_default_iteration_count,
-            variant_count=test.variant_count,
-            use_default_variant_count=test.use_default_variant_count,
-            full_run_enabled=test.full_run_enabled,
-            created_by=actor.get("id", "unknown"),
-            last_updated_by=actor.get("id", "unknown"),
+
+
+def insert_rows(model: type[SQLModel], rows: list[SQLModel], db_session: Session):
+    # One bulk INSERT per table, committed by the caller so the whole copy is atomic
+    if rows:
+        db_session.execute(insert(model), [row.model_dump() for row in rows])
+
+
+def create_duplicate_suites(new_suites: dict[str, Suite], actor: dict, db_session: Session):
+    # new_suites maps each copied suite's id to its copy
+    # Their tests, variants and baselines are loaded with one query per table, large columns included, and copied
+    # in memory
+    get_tests = db_session.exec(
+        select(Test).where(Test.suite_id.in_(new_suites)).order_by(Test.created_at, Test.id)
+    ).all()
+    get_variants = db_session.exec(
+        select(Variant)
+        .join(Test, Test.id == Variant.test_id)
+        .where(Test.suite_id.in_(new_suites))
+        .order_by(Variant.created_at, Variant.id)
+        .options(undefer_group(BLOBS))
+    ).all()
+    get_baselines = db_session.exec(
+        select(Baseline)
+        .join(Test, Test.id == Baseline.test_id)
+        .where(Test.suite_id.in_(new_suites))
+        .order_by(Baseline.created_at, Baseline.id)
+        .options(undefer_group(BLOBS))
+    ).all()
+
+    new_tests = {test.id: copy_row(test, actor, suite_id=new_suites[test.suite_id].id) for test in get_tests}
+    new_variants = [copy_row(variant, actor, test_id=new_tests[variant.test_id].id) for variant in get_variants]
+    new_baselines = [copy_row(baseline, actor, test_id=new_tests[baseline.test_id].id) for baseline in get_baselines]
+
+    insert_rows(Suite, list(new_suites.values()), db_session)
+    insert_rows(Test, list(new_tests.values()), db_session)
+    insert_rows(Variant, new_variants, db_session)
+    insert_rows(Baseline, new_baselines, db_session)
+
+
+def get_id_expression(model: type[SQLModel], dialect_name: str):
+    # SQL equivalent of the model's generate_id default: its prefix and random characters, evaluated per row
+    prefix = model.model_fields["id"].default_factory.prefix
+    size = 32 - len(prefix)
+    if dialect_name == "postgresql":
+        random_characters = func.md5(cast(func.random(), String).concat(cast(func.clock_timestamp(), String)))
+    else:
+        random_characters = func.lower(func.hex(func.randomblob(size)))
+    return literal(f"{prefix}_").concat(func.substr(random_characters, 1, size))
+
+
+def copy_rows_in_db(
+    model: type[SQLModel], parent_column, id_map: Table, actor: dict, connection: Connection, map_ids: bool = False
+):
+    # Copy the children of every mapped row with a single INSERT ... SELECT that runs in the database
+    # Parent ids are swapped through the id map, and with map_ids the copies take the new ids already in it
+    # created_at is kept from the copied row so the copies list in the same order, only the other audit fields change
+    table = model.__table__
+    parent_ids = id_map.alias("parent_ids")
+    db_query = select().select_from(table).join(parent_ids, parent_ids.c.old_id == parent_column)
+
+    values = {
+        "id": get_id_expression(model, connection.dialect.name),
+        parent_column.name: parent_ids.c.new_id,
+        "created_by": literal(actor.get("id", "unknown")),
+        "last_updated_at": literal(datetime.utcnow()),
+        "last_updated_by": literal(actor.get("id", "unknown")),
+    }
+    if map_ids:
+        row_ids = id_map.alias("row_ids")
+        db_query = db_query.join(row_ids, row_ids.c.old_id == table.c.id)
+        values["id"] = row_ids.c.new_id
+
+    db_query = db_query.add_columns(*[values.get(column.name, column) for column in table.columns])
+    connection.execute(insert(table).from_select([column.name for column in table.columns], db_query))
+
+
+def create_duplicate_suites_in_db(new_suites: dict[str, Suite], actor: dict, db_session: Session):
+    # Same as create_duplicate_suites, but the tests, variants and baselines are copied by the database
+    # so large columns (Baseline.html_blob, Variant.replay_json) are never sent to us and back
+    if not new_suites:
+        return
+    insert_rows(Suite, list(new_suites.values()), db_session)
+
+    # The old to new ids of the suites and tests, in a temporary table only visible to this connection
+    # Rolling back the copy also drops it
+    connection = db_session.connection()
+    id_map = Table(
+        "copy_id_map",
+        MetaData(),
+        Column("old_id", String, primary_key=True),
+        Column("new_id", String, nullable=False),
+        prefixes=["TEMPORARY"],
+    )
+    id_map.create(connection)
+
+    connection.execute(
+        insert(id_map), [{"old_id": old_id, "new_id": new_suite.id} for old_id, new_suite in new_suites.items()]
+    )
+    connection.execute(
+        insert(id_map).from_select(
+            ["old_id", "new_id"],
+            select(Test.id, get_id_expression(Test, connection.dialect.name)).where(Test.suite_id.in_(new_suites)),
         )
-        db_session.add(new_test)
-        db_session.commit()
-        db_session.refresh(new_test)
-
-        # duplicate all variants
-        for variant in test.variants:
-            new_variant = Variant(
-                test_id=new_test.id,
-                replay_json=variant.replay_json,
-                created_by=actor.get("id", "unknown"),
-                last_updated_by=actor.get("id", "unknown"),
-            )
-            db_session.add(new_variant)
-            db_session.commit()
-            db_session.refresh(new_variant)
-
-        # duplicate all baselines
-        for baseline in test.baselines:
-            new_baseline = Baseline(
-                name=baseline.name,
-                html_blob=baseline.html_blob,
-                conversation_json=baseline.conversation_json,
-                test_id=new_test.id,
-                created_by=actor.get("id", "unknown"),
-                last_updated_by=actor.get("id", "unknown"),
-            )
-            db_session.add(new_baseline)
-            db_session.commit()
-            db_session.refresh(new_baseline)
-
-    return new_suite
+    )
+
+    copy_rows_in_db(Test, Test.suite_id, id_map, actor, connection, map_ids=True)
+    copy_rows_in_db(Variant, Variant.test_id, id_map, actor, connection)
+    copy_rows_in_db(Baseline, Baseline.test_id, id_map, actor, connection)
+    id_map.drop(connection)
 
 
 @with_db_session
-def copy_bot_by_id(bot_id: str, actor: dict, db_session: Session) -> BotReadResponse:
+def copy_bot_by_id(bot_id: str, actor: dict, in_db: bool, db_session: Session) -> BotReadResponse:
     get_bot = db_session.get(Bot, bot_id)
 
     if not get_bot:
@@ -94,47 +156,35 @@ def copy_bot_by_id(bot_id: str, actor: dict, db_session: Session) -> BotReadResp
         created_by=actor.get("id", "unknown"),
         last_updated_by=actor.get("id", "unknown"),
     )
-    db_session.add(new_bot)
-    db_session.commit()
-    db_session.refresh(new_bot)
-
-    # duplicate all environments
-    old_env_to_new_env = {}
-    for environment in get_bot.environments:
-        new_environment = Environment(
-            name=environment.name,
-            url=environment.url,
-            bot_id=new_bot.id,
-            created_by=actor.get("id", "unknown"),
-            last_updated_by=actor.get("id", "unknown"),
-        )
-        db_session.add(new_environment)
-        db_session.commit()
-        db_session.refresh(new_environment)
-
-        old_env_to_new_env[environment.id] = new_environment.id
 
-    # duplicate all suites
-    old_suite_to_new_suite = {}
-    for suite in get_bot.suites:
-        duplicated_suite = create_duplicate_suite(suite, f"{suite.name} (Copy)", actor, db_session)
-        duplicated_suite.bot_id = new_bot.id
-        db_session.commit()
-        old_suite_to_new_suite[suite.id] = duplicated_suite.id
+    # duplicate all environments and suites
+    old_env_to_new_env = {
+        environment.id: copy_row(environment, actor, bot_id=new_bot.id) for environment in get_bot.environments
+    }
+    old_suite_to_new_suite = {
+        suite.id: copy_row(suite, actor, name=f"{suite.name} (Copy)", bot_id=new_bot.id) for suite in get_bot.suites
+    }
 
     # update reporting_comparison_suite_run_id and reporting_comparison_environment_id references
-    for suite in new_bot.suites:
+    for suite in old_suite_to_new_suite.values():
         if suite.reporting_comparison_suite_run_id in old_suite_to_new_suite:
-            suite.reporting_comparison_suite_run_id = old_suite_to_new_suite[suite.reporting_comparison_suite_run_id]
+            suite.reporting_comparison_suite_run_id = old_suite_to_new_suite[suite.reporting_comparison_suite_run_id].id
         if suite.reporting_comparison_environment_id in old_env_to_new_env:
-            suite.reporting_comparison_environment_id = old_env_to_new_env[suite.reporting_comparison_environment_id]
-
+            suite.reporting_comparison_environment_id = old_env_to_new_env[suite.reporting_comparison_environment_id].id
+
+    insert_rows(Bot, [new_bot], db_session)
+    insert_rows(Environment, list(old_env_to_new_env.values()), db_session)
+    if in_db:
+        create_duplicate_suites_in_db(old_suite_to_new_suite, actor, db_session)
+    else:
+        create_duplicate_suites(old_suite_to_new_suite, actor, db_session)
     db_session.commit()
-    return BotReadResponse.model_validate(new_bot)
+
+    return BotReadResponse.model_validate(db_session.get(Bot, new_bot.id))
 
 
 @with_db_session
-def copy_suite_by_id(suite_id: str, actor: dict, db_session: Session) -> SuiteReadResponse:
+def copy_suite_by_id(suite_id: str, actor: dict, in_db: bool, db_session: Session) -> SuiteReadResponse:
     get_suite = db_session.get(Suite, suite_id)
 
     if not get_suite:
@@ -143,6 +193,11 @@ def copy_suite_by_id(suite_id: str, actor: dict, db_session: Session) -> SuiteRe
     if not has_editor_permissions(actor, get_suite.bot):
         return InvalidPermissionsResponse()
 
-    duplicated_suite = create_duplicate_suite(get_suite, f"{get_suite.name} (Copy)", actor, db_session)
+    new_suite = copy_row(get_suite, actor, name=f"{get_suite.name} (Copy)")
+    if in_db:
+        create_duplicate_suites_in_db({get_suite.id: new_suite}, actor, db_session)
+    else:
+        create_duplicate_suites({get_suite.id: new_suite}, actor, db_session)
+    db_session.commit()
 
-    return SuiteReadResponse.model_validate(duplicated_suite)
+    return SuiteReadResponse.model_validate(db_session.get(Suite, new_suite.id))
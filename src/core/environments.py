@@ -2,6 +2,7 @@ from sqlmodel import select
 from sqlmodel.orm.session import Session
 
 from src.core.utils import (
+    get_page,
     has_editor_permissions,
     has_viewer_permissions,
     update_db_model_with_request,
@@ -14,9 +15,9 @@ from src.models.api_schema import (
     InvalidPermissionsResponse,
     ListEnvironmentReadResponse,
     NotFoundResponse,
-    PaginationData,
 )
 from src.models.db_schema import Bot, Environment
+from src.utils import PageCursor
 
 
 @with_db_session
@@ -79,7 +80,9 @@ def delete_environment_by_id(environment_id: str, actor: dict, db_session: Sessi
 
 
 @with_db_session
-def get_environments_by_bot_id(bot_id: str, actor: dict, limit: int, page: int, db_session: Session):
+def get_environments_by_bot_id(
+    bot_id: str, actor: dict, limit: int, page: int, cursor: PageCursor | None, include_total: bool, db_session: Session
+):
     get_bot = db_session.get(Bot, bot_id)
 
     if not get_bot:
@@ -88,16 +91,17 @@ def get_environments_by_bot_id(bot_id: str, actor: dict, limit: int, page: int,
     if not has_viewer_permissions(actor, get_bot):
         return InvalidPermissionsResponse()
 
-    offset = (page - 1) * limit
-    get_environments = db_session.exec(
-        select(Environment)
-        .where(Environment.bot_id == bot_id)
-        .order_by(Environment.created_at.desc())
-        .limit(limit)
-        .offset(offset)
-    ).all()
+    get_environments, pagination = get_page(
+        select(Environment).where(Environment.bot_id == bot_id),
+        Environment,
+        limit,
+        page,
+        cursor,
+        include_total,
+        db_session,
+    )
 
     return ListEnvironmentReadResponse(
         data=[EnvironmentReadResponse.model_validate(environment) for environment in get_environments],
-        pagination=PaginationData(items_len=len(get_bot.environments), limit=limit, page=page),
+        pagination=pagination,
     )
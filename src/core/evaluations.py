@@ -1,7 +1,12 @@
 from datetime import datetime, timezone
+from typing import NamedTuple
 
+from sqlalchemy.orm import undefer, undefer_group
+from sqlmodel import func, insert, select, update
 from sqlmodel.orm.session import Session
 
+from src.core.jobs import enqueue_job, enqueue_jobs
+from src.core.suite_run_stats import save_suite_run_stats
 from src.core.utils import (
     has_viewer_permissions,
     make_json_openai_request,
@@ -9,13 +14,25 @@ from src.core.utils import (
 )
 from src.db import with_db_session
 from src.models.api_schema import (
+    EvaluationBatchCreateRequest,
+    EvaluationBatchReadResponse,
     EvaluationCreateRequest,
     EvaluationReadResponse,
     InvalidPermissionsResponse,
     NotFoundResponse,
 )
-from src.models.db_schema import Bot, Evaluation, SuiteRun, Test, TestRun, VariantRun
-from src.models.enums import RunStatusEnum
+from src.models.db_schema import (
+    BLOBS,
+    Baseline,
+    Bot,
+    Environment,
+    Evaluation,
+    SuiteRun,
+    Test,
+    TestRun,
+    VariantRun,
+)
+from src.models.enums import JobTypeEnum, RunStatusEnum
 from src.settings import logger
 
 
@@ -79,11 +96,107 @@ def evaluate_against_baseline(
     return make_json_openai_request(messages)
 
 
+class RunResult(NamedTuple):
+    status: RunStatusEnum
+    pass_rate: float | None
+    replayed_elapsed_seconds: float | None
+
+
+def get_run_result(run: SuiteRun | TestRun | VariantRun):
+    # A run only contributes to its parent's counters once it is no longer running
+    if run.status == RunStatusEnum.RUNNING:
+        return None
+    return RunResult(run.status, run.pass_rate, run.average_replayed_elapsed_seconds)
+
+
+def update_run_counters(
+    model: type[SuiteRun] | type[TestRun] | type[VariantRun],
+    run_id: str,
+    child_result: RunResult,
+    previous_child_result: RunResult | None,
+    db_session: Session,
+):
+    # Atomically add a completed child to the run's counters and return the new totals
+    # A single UPDATE ... RETURNING means concurrent evaluations can never lose an increment
+    # If the child was already complete, its previous result is swapped out instead of counted twice
+    def delta(get_value):
+        previous_value = get_value(previous_child_result) if previous_child_result else 0
+        return (get_value(child_result) or 0) - (previous_value or 0)
+
+    return db_session.execute(
+        update(model)
+        .where(model.id == run_id)
+        .values(
+            completed_count=model.completed_count + (0 if previous_child_result else 1),
+            pass_count=model.pass_count + delta(lambda result: result.status == RunStatusEnum.PASS),
+            fail_count=model.fail_count + delta(lambda result: result.status == RunStatusEnum.FAIL),
+            error_count=model.error_count + delta(lambda result: result.status == RunStatusEnum.ERROR),
+            pass_rate_sum=model.pass_rate_sum + delta(lambda result: result.pass_rate),
+            replayed_elapsed_seconds_sum=(
+                model.replayed_elapsed_seconds_sum + delta(lambda result: result.replayed_elapsed_seconds)
+            ),
+        )
+        .returning(
+            model.completed_count,
+            model.pass_count,
+            model.fail_count,
+            model.error_count,
+            model.pass_rate_sum,
+            model.replayed_elapsed_seconds_sum,
+        )
+        .execution_options(synchronize_session=False)
+    ).one()
+
+
+def is_run_complete(counters, expected_count: int, child_count_query, db_session: Session):
+    # Not enough children have completed yet
+    if counters.completed_count < expected_count:
+        return False
+
+    # All children created for the run must have completed, so only the last one bubbles up
+    return counters.completed_count == db_session.exec(child_count_query).one()
+
+
+def complete_run(
+    run: SuiteRun | TestRun | VariantRun,
+    counters,
+    failure_reasons_query,
+    error_info: str,
+    db_session: Session,
+):
+    # Mark a run as complete using only its aggregated counters
+    if counters.error_count:
+        run.status = RunStatusEnum.ERROR
+        run.status_info = error_info
+    else:
+        # Calculate pass rate and average res
+        run.pass_rate = counters.pass_rate_sum / counters.completed_count
+        run.average_replayed_elapsed_seconds = counters.replayed_elapsed_seconds_sum / counters.completed_count
+
+        # Perfect pass rate
+        if run.pass_rate == 1:
+            run.status = RunStatusEnum.PASS
+            run.status_info = None
+
+        else:
+            # Perfect fail rate
+            if run.pass_rate == 0:
+                run.status = RunStatusEnum.FAIL
+
+            # Mixed results
+            else:
+                run.status = RunStatusEnum.MIXED
+
+            # Failure reasons are only read once the run is complete and has failures
+            run.status_info = summarize_failure_reasons(db_session.exec(failure_reasons_query).all())
+    run.completed_at = datetime.now(timezone.utc)
+
+
 @with_db_session
 def evaluate_conversation(evaluation_id: str, db_session: Session):
     logger.info(f"Starting evaluation for evaluation_id: {evaluation_id}")
 
-    get_evaluation: Evaluation = db_session.get(Evaluation, evaluation_id)
+    get_evaluation: Evaluation = db_session.get(Evaluation, evaluation_id, options=[undefer(Evaluation.html_blob)])
     get_variant_run: VariantRun = get_evaluation.variant_run
     get_test_run: TestRun = get_variant_run.test_run
     get_test: Test = get_test_run.test
@@ -92,120 +205,100 @@ def evaluate_conversation(evaluation_id: str, db_session: Session):
     if get_test_run.status == RunStatusEnum.STOPPED:
         return
 
+    # If already evaluated, its result has already been counted in the runs above it
+    if get_evaluation.status != RunStatusEnum.RUNNING:
+        return
+
     # This inner function stores all logic for actual evaluation
-    inner_evaluate_conversation(get_evaluation, db_session)
+    # Nothing is written until it is done, so no rows are locked while waiting on the AI
+    with db_session.no_autoflush:
+        inner_evaluate_conversation(get_evaluation, db_session)
+
+        # The test run may have been stopped while evaluating, its result is then discarded
+        test_run_status = db_session.exec(select(TestRun.status).where(TestRun.id == get_test_run.id)).one()
+    if test_run_status == RunStatusEnum.STOPPED:
+        db_session.rollback()
+        return
+
+    # Every outcome, errors included, completes the evaluation and so changes its suite run's version (ETag)
+    get_evaluation.completed_at = get_evaluation.last_updated_at = datetime.now(timezone.utc)
+
+    # The evaluation's result and every level it completes are committed together, so a job retried after a
+    # crash either finds nothing written and evaluates again, or finds every level already updated
+    # The cached analytics are keyed on the suite runs' completion, so they don't need invalidating from here
+    bubble_up_evaluation(get_evaluation, get_variant_run, get_test_run, get_test, db_session)
     db_session.commit()
 
+
+def bubble_up_evaluation(
+    get_evaluation: Evaluation, get_variant_run: VariantRun, get_test_run: TestRun, get_test: Test, db_session: Session
+):
     # It is structured in this way to allow for post-processing below
     # Where we can update/bubble up completed runs and check if a full test/suite run is complete
-    error_flag = False
+    # Each level only updates its parent's counters, so no level rescans its children
 
     # ----- Bubble up evaluation ----- #
-    evaluation_pr_dist = []  # pr_dist = pass rate distrubution
-    evaluation_res_dist = []  # res_dist = replayed elapsed seconds distribution
-    evaluation_failure_reasons = []
-
-    completed_evals = 0
-    for evaluation in get_variant_run.evaluations:
-        if evaluation.status == RunStatusEnum.RUNNING:
-            # Return early if any evaluation is still running, can't bubble up yet
-            return
-        elif evaluation.status == RunStatusEnum.PASS:
-            evaluation_pr_dist.append(1)
-        elif evaluation.status == RunStatusEnum.FAIL:
-            evaluation_pr_dist.append(0)
-            evaluation_failure_reasons.append(evaluation.status_info)
-        elif evaluation.status == RunStatusEnum.ERROR:
-            error_flag = True
-        evaluation_res_dist.append(evaluation.replayed_elapsed_seconds)
-        completed_evals += 1
-
-    # If not all evals completed, return early
-    if completed_evals < get_test.iteration_count:
+    variant_run_counters = update_run_counters(
+        VariantRun,
+        get_variant_run.id,
+        RunResult(
+            get_evaluation.status,
+            1 if get_evaluation.status == RunStatusEnum.PASS else 0,
+            get_evaluation.replayed_elapsed_seconds,
+        ),
+        None,
+        db_session,
+    )
+
+    # Return early if any evaluation is still running, can't bubble up yet
+    if not is_run_complete(
+        variant_run_counters,
+        get_test.iteration_count,
+        select(func.count()).where(Evaluation.variant_run_id == get_variant_run.id),
+        db_session,
+    ):
         return
 
     # If here, means all evaluations are complete
     # We can update variant_run as complete with information
-    if error_flag:
-        get_variant_run.status = RunStatusEnum.ERROR
-        get_variant_run.status_info = "One or more evaluations contained an error."
-    else:
-        # Calculate pass rate and average res
-        get_variant_run.pass_rate = sum(evaluation_pr_dist) / len(evaluation_pr_dist)
-        get_variant_run.average_replayed_elapsed_seconds = sum(evaluation_res_dist) / len(evaluation_res_dist)
-
-        # All evaluations passed for this variant
-        if get_variant_run.pass_rate == 1:
-            get_variant_run.status = RunStatusEnum.PASS
-            get_variant_run.status_info = None
-
-        else:
-            # All evaluations failed for this variant
-            if get_variant_run.pass_rate == 0:
-                get_variant_run.status = RunStatusEnum.FAIL
-
-            # Mixed results
-            else:
-                get_variant_run.status = RunStatusEnum.MIXED
-
-            get_variant_run.status_info = summarize_failure_reasons(evaluation_failure_reasons)
-    get_variant_run.completed_at = datetime.now(timezone.utc)
-    db_session.commit()
+    previous_variant_run_result = get_run_result(get_variant_run)
+    complete_run(
+        get_variant_run,
+        variant_run_counters,
+        select(Evaluation.status_info).where(
+            Evaluation.variant_run_id == get_variant_run.id, Evaluation.status == RunStatusEnum.FAIL
+        ),
+        "One or more evaluations contained an error.",
+        db_session,
+    )
 
     # ----- Bubble up variant run ----- #
-    variant_runs_pr_dist = []  # pr_dist = pass rate distrubution
-    variant_runs_res_dist = []  # res_dist = replayed elapsed seconds distribution
-    variant_runs_failure_reasons = []
-
-    completed_variants = 0
-    for variant_run in get_test_run.variant_runs:
-        if variant_run.status == RunStatusEnum.RUNNING:
-            # Return early if any variant run is still running, can't bubble up yet
-            return
-        elif variant_run.status == RunStatusEnum.PASS:
-            variant_runs_pr_dist.append(1)
-        elif variant_run.status == RunStatusEnum.FAIL:
-            variant_runs_pr_dist.append(0)
-            variant_runs_failure_reasons.append(variant_run.status_info)
-        elif variant_run.status == RunStatusEnum.MIXED:
-            variant_runs_pr_dist.append(variant_run.pass_rate)
-            variant_runs_failure_reasons.append(variant_run.status_info)
-        elif variant_run.status == RunStatusEnum.ERROR:
-            error_flag = True
-        variant_runs_res_dist.append(variant_run.average_replayed_elapsed_seconds)
-        completed_variants += 1
-
-    # If not all variants completed, return early
-    if completed_variants < get_test.variant_count:
+    test_run_counters = update_run_counters(
+        TestRun, get_test_run.id, get_run_result(get_variant_run), previous_variant_run_result, db_session
+    )
+
+    # Return early if any variant run is still running, can't bubble up yet
+    if not is_run_complete(
+        test_run_counters,
+        get_test.variant_count,
+        select(func.count()).where(VariantRun.test_run_id == get_test_run.id),
+        db_session,
+    ):
         return
 
     # If here, means all variant runs are complete
     # We can update test_run as complete with information
-    if error_flag:
-        get_test_run.status = RunStatusEnum.ERROR
-        get_test_run.status_info = "One or more variant runs contained an error."
-    else:
-        # Calculate pass rate and average res
-        get_test_run.pass_rate = sum(variant_runs_pr_dist) / len(variant_runs_pr_dist)
-        get_test_run.average_replayed_elapsed_seconds = sum(variant_runs_res_dist) / len(variant_runs_res_dist)
-
-        # Perfect pass rate
-        if get_test_run.pass_rate == 1:
-            get_test_run.status = RunStatusEnum.PASS
-            get_test_run.status_info = None
-
-        else:
-            # Perfect fail rate
-            if get_test_run.pass_rate == 0:
-                get_test_run.status = RunStatusEnum.FAIL
-
-            # Mixed results
-            else:
-                get_test_run.status = RunStatusEnum.MIXED
-
-            get_test_run.status_info = summarize_failure_reasons(variant_runs_failure_reasons)
-    get_test_run.completed_at = datetime.now(timezone.utc)
-    db_session.commit()
+    previous_test_run_result = get_run_result(get_test_run)
+    complete_run(
+        get_test_run,
+        test_run_counters,
+        select(VariantRun.status_info).where(
+            VariantRun.test_run_id == get_test_run.id,
+            VariantRun.status.in_([RunStatusEnum.FAIL, RunStatusEnum.MIXED]),
+        ),
+        "One or more variant runs contained an error.",
+        db_session,
+    )
 
     # ----- Bubble up test run ----- #
     get_suite_run: SuiteRun = get_test_run.suite_run
@@ -213,60 +306,39 @@ def evaluate_conversation(evaluation_id: str, db_session: Session):
     if not get_suite_run:
         return
 
-    test_runs_pr_dist = []  # pr_dist = pass rate distrubution
-    test_runs_res_dist = []  # res_dist = replayed elapsed seconds distribution
-    test_runs_failure_reasons = []
+    suite_run_counters = update_run_counters(
+        SuiteRun, get_suite_run.id, get_run_result(get_test_run), previous_test_run_result, db_session
+    )
 
-    completed_tests = 0
-    for test_run in get_suite_run.test_runs:
-        if test_run.status == RunStatusEnum.RUNNING:
-            # Return early if any test run is still running, can't bubble up yet
-            return
-        elif test_run.status == RunStatusEnum.PASS:
-            test_runs_pr_dist.append(1)
-        elif test_run.status == RunStatusEnum.FAIL:
-            test_runs_pr_dist.append(0)
-            test_runs_failure_reasons.append(test_run.status_info)
-        elif test_run.status == RunStatusEnum.MIXED:
-            test_runs_pr_dist.append(test_run.pass_rate)
-            test_runs_failure_reasons.append(test_run.status_info)
-        elif test_run.status == RunStatusEnum.ERROR:
-            error_flag = True
-        test_runs_res_dist.append(test_run.average_replayed_elapsed_seconds)
-        completed_tests += 1
-
-    # If not all tests completed, return early
-    # FIXME: fix for when disabling tests to run
-    if completed_tests < len(get_suite_run.suite.tests):
+    # Return early if any test run is still running, can't bubble up yet
+    # Only enabled tests with at least one variant are run as part of a suite run
+    if not is_run_complete(
+        suite_run_counters,
+        db_session.exec(
+            select(func.count()).where(
+                Test.suite_id == get_suite_run.suite_id, Test.full_run_enabled, Test.variants.any()
+            )
+        ).one(),
+        select(func.count()).where(TestRun.suite_run_id == get_suite_run.id),
+        db_session,
+    ):
         return
 
     # If here, means all test runs are complete
     # We can update suite run as complete with information
-    if error_flag:
-        get_suite_run.status = RunStatusEnum.ERROR
-        get_suite_run.status_info = "One or more test runs contained an error."
-    else:
-        # Calculate pass rate and average res
-        get_suite_run.pass_rate = sum(test_runs_pr_dist) / len(test_runs_pr_dist)
-        get_suite_run.average_replayed_elapsed_seconds = sum(test_runs_res_dist) / len(test_runs_res_dist)
-
-        # Perfect pass rate
-        if get_suite_run.pass_rate == 1:
-            get_suite_run.status = RunStatusEnum.PASS
-            get_suite_run.status_info = None
-
-        else:
-            # Perfect fail rate
-            if get_suite_run.pass_rate == 0:
-                get_suite_run.status = RunStatusEnum.FAIL
-
-            # Mixed results
-            else:
-                get_suite_run.status = RunStatusEnum.MIXED
+    complete_run(
+        get_suite_run,
+        suite_run_counters,
+        select(TestRun.status_info).where(
+            TestRun.suite_run_id == get_suite_run.id,
+            TestRun.status.in_([RunStatusEnum.FAIL, RunStatusEnum.MIXED]),
+        ),
+        "One or more test runs contained an error.",
+        db_session,
+    )
 
-            get_suite_run.status_info = summarize_failure_reasons(test_runs_failure_reasons)
-    get_suite_run.completed_at = datetime.now(timezone.utc)
-    db_session.commit()
+    # Save the suite run's stats for the analytics now that they won't change
+    save_suite_run_stats(get_suite_run.id, db_session)
 
 
 def inner_evaluate_conversation(get_evaluation: Evaluation, db_session: Session):
@@ -294,7 +366,10 @@ def inner_evaluate_conversation(get_evaluation: Evaluation, db_session: Session)
     get_evaluation.conversation_json = conversation_dict
 
     # get required information for evaluation
-    get_baselines = get_test.baselines
+    # Only the baselines' parsed conversations are compared, not their html
+    get_baselines = db_session.exec(
+        select(Baseline).where(Baseline.test_id == get_test.id).options(undefer(Baseline.conversation_json))
+    ).all()
     if get_test.success_criteria:
         get_success_criteria = get_test.success_criteria
     else:
@@ -325,7 +400,6 @@ def inner_evaluate_conversation(get_evaluation: Evaluation, db_session: Session)
         elif did_pass:
             get_evaluation.pass_baseline_id = baseline.id
             get_evaluation.status = RunStatusEnum.PASS
-            get_evaluation.completed_at = datetime.now(timezone.utc)
             return
 
         # Otherwise, store failure reason
@@ -338,7 +412,6 @@ def inner_evaluate_conversation(get_evaluation: Evaluation, db_session: Session)
         get_evaluation.status_info = summarize_failure_reasons(baseline_failure_reasons)
     else:
         get_evaluation.status_info = baseline_failure_reasons[0]
-    get_evaluation.completed_at = datetime.now(timezone.utc)
 
 
 @with_db_session
@@ -358,15 +431,57 @@ def create_evaluation(request: EvaluationCreateRequest, actor: dict, db_session:
 
     new_evaluation = Evaluation.model_validate(request.model_dump() | create_dict)
     db_session.add(new_evaluation)
+
+    # Queue the evaluation in the same transaction so a worker picks it up even if this process dies
+    enqueue_job(JobTypeEnum.EVALUATE_CONVERSATION, new_evaluation.id, db_session)
     db_session.commit()
     db_session.refresh(new_evaluation)
 
     return EvaluationReadResponse.model_validate(new_evaluation)
 
 
+@with_db_session
+def create_evaluations(request: EvaluationBatchCreateRequest, actor: dict, db_session: Session):
+    # Look up the bot of every variant run in the batch with one query
+    variant_run_ids = {evaluation.variant_run_id for evaluation in request.evaluations}
+    get_variant_run_bots = db_session.exec(
+        select(VariantRun.id, Bot)
+        .join(TestRun, TestRun.id == VariantRun.test_run_id)
+        .join(Environment, Environment.id == TestRun.environment_id)
+        .join(Bot, Bot.id == Environment.bot_id)
+        .where(VariantRun.id.in_(variant_run_ids))
+    ).all()
+
+    if len(get_variant_run_bots) != len(variant_run_ids):
+        return NotFoundResponse(VariantRun)
+
+    # Check that actor has permission to read each distinct bot once
+    for bot in {bot.id: bot for _, bot in get_variant_run_bots}.values():
+        if not has_viewer_permissions(actor, bot):
+            return InvalidPermissionsResponse()
+
+    create_dict = {
+        "created_by": actor.get("id", "unknown"),
+        "last_updated_by": actor.get("id", "unknown"),
+        "status": RunStatusEnum.RUNNING,
+    }
+    new_evaluations = [
+        Evaluation.model_validate(evaluation.model_dump() | create_dict) for evaluation in request.evaluations
+    ]
+
+    # Insert the evaluations and queue their jobs with one bulk INSERT each, in a single transaction
+    db_session.execute(insert(Evaluation), [evaluation.model_dump() for evaluation in new_evaluations])
+    enqueue_jobs(JobTypeEnum.EVALUATE_CONVERSATION, [evaluation.id for evaluation in new_evaluations], db_session)
+    db_session.commit()
+
+    return EvaluationBatchReadResponse(
+        data=[EvaluationReadResponse.model_validate(evaluation) for evaluation in new_evaluations]
+    )
+
+
 @with_db_session
 def get_evaluation_by_id(evaluation_id: str, actor: dict, db_session: Session):
-    get_evaluation = db_session.get(Evaluation, evaluation_id)
+    get_evaluation = db_session.get(Evaluation, evaluation_id, options=[undefer_group(BLOBS)])
 
     if not get_evaluation:
         return NotFoundResponse(Evaluation)
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+
+from sqlmodel import and_, insert, or_, select, update
+from sqlmodel.orm.session import Session
+
+from src.db import with_db_session
+from src.models.db_schema import Job
+from src.models.enums import JobStatusEnum, JobTypeEnum
+from src.settings import settings
+
+
+def enqueue_job(job_type: JobTypeEnum, target_id: str, db_session: Session):
+    # Added to the caller's session so the job is committed atomically with the row it processes
+    new_job = Job(job_type=job_type, target_id=target_id)
+    db_session.add(new_job)
+
+    return new_job
+
+
+def enqueue_jobs(job_type: JobTypeEnum, target_ids: list[str], db_session: Session):
+    # Queues many jobs with one bulk INSERT, committed with the caller's transaction like enqueue_job
+    if target_ids:
+        db_session.execute(
+            insert(Job), [Job(job_type=job_type, target_id=target_id).model_dump() for target_id in target_ids]
+        )
+
+
+def cancel_jobs(job_type: JobTypeEnum, target_ids, db_session: Session):
+    # Cancelled jobs are never claimed, and jobs already running keep their cancelled status when they finish
+    db_session.execute(
+        update(Job)
+        .where(
+            Job.job_type == job_type,
+            Job.target_id.in_(target_ids),
+            Job.status.in_([JobStatusEnum.QUEUED, JobStatusEnum.RUNNING]),
+        )
+        .values(status=JobStatusEnum.CANCELLED, locked_at=None, completed_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+@with_db_session
+def claim_job(db_session: Session):
+    now = datetime.utcnow()
+    locked_before = now - timedelta(seconds=settings.job_visibility_timeout_seconds)
+
+    # Running jobs whose worker stopped responding on their last attempt are failed instead of reclaimed
+    failed = db_session.execute(
+        update(Job)
+        .where(
+            Job.status == JobStatusEnum.RUNNING,
+            Job.locked_at < locked_before,
+            Job.attempts >= settings.job_max_attempts,
+        )
+        .values(
+            status=JobStatusEnum.FAILED,
+            locked_at=None,
+            completed_at=now,
+            last_error="Worker stopped responding on the last attempt",
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if failed.rowcount:
+        db_session.commit()
+
+    # Queued jobs that are due, or running jobs whose worker stopped responding with attempts left
+    db_query = (
+        select(Job)
+        .where(
+            or_(
+                and_(Job.status == JobStatusEnum.QUEUED, Job.available_at <= now),
+                and_(
+                    Job.status == JobStatusEnum.RUNNING,
+                    Job.locked_at < locked_before,
+                    Job.attempts < settings.job_max_attempts,
+                ),
+            )
+        )
+        .order_by(Job.available_at)
+        .limit(1)
+    )
+
+    if db_session.get_bind().dialect.name == "sqlite":
+        # SQLite has no row locks, so claim with a compare-and-set UPDATE instead
+        get_job = db_session.exec(db_query).first()
+        if not get_job:
+            return None
+
+        claimed = db_session.execute(
+            update(Job)
+            .where(Job.id == get_job.id, Job.status == get_job.status, Job.attempts == get_job.attempts)
+            .values(status=JobStatusEnum.RUNNING, locked_at=now, attempts=Job.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if claimed.rowcount != 1:
+            # Another worker claimed it first
+            db_session.rollback()
+            return None
+    else:
+        # Skip rows locked by other workers so concurrent workers never wait on each other
+        get_job = db_session.exec(db_query.with_for_update(skip_locked=True)).first()
+        if not get_job:
+            return None
+
+        get_job.status = JobStatusEnum.RUNNING
+        get_job.locked_at = now
+        get_job.attempts += 1
+
+    db_session.commit()
+    db_session.refresh(get_job)
+    db_session.expunge(get_job)
+
+    return get_job
+
+
+@with_db_session
+def complete_job(job_id: str, db_session: Session):
+    get_job = db_session.get(Job, job_id)
+
+    if get_job.status == JobStatusEnum.CANCELLED:
+        return
+
+    get_job.status = JobStatusEnum.COMPLETED
+    get_job.completed_at = datetime.utcnow()
+    db_session.commit()
+
+
+@with_db_session
+def fail_job(job_id: str, error: str, db_session: Session):
+    get_job = db_session.get(Job, job_id)
+
+    get_job.last_error = error
+    if get_job.status == JobStatusEnum.CANCELLED:
+        db_session.commit()
+        return
+
+    get_job.locked_at = None
+
+    # Retry with a linear backoff until the attempts run out
+    if get_job.attempts < settings.job_max_attempts:
+        get_job.status = JobStatusEnum.QUEUED
+        get_job.available_at = datetime.utcnow() + timedelta(seconds=30 * get_job.attempts)
+    else:
+        get_job.status = JobStatusEnum.FAILED
+        get_job.completed_at = datetime.utcnow()
+    db_session.commit()
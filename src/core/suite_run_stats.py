@@ -0,0 +1,190 @@
+import argparse
+from collections import defaultdict
+
+from sqlalchemy.orm import defer
+from sqlmodel import func, not_, or_, select
+from sqlmodel.orm.session import Session
+
+from src.core.utils import calculate_boxplot_points
+from src.db import with_db_session
+from src.models.db_schema import (
+    Evaluation,
+    SuiteRun,
+    SuiteRunStats,
+    TestRun,
+    VariantRun,
+)
+from src.models.enums import RunStatusEnum
+from src.settings import logger
+
+
+def select_suite_run_evaluations(*columns, suite_run_ids: list[str]):
+    # Only the columns needed are selected, in one query instead of walking the relationships
+    return (
+        select(*columns)
+        .select_from(Evaluation)
+        .join(VariantRun, VariantRun.id == Evaluation.variant_run_id)
+        .join(TestRun, TestRun.id == VariantRun.test_run_id)
+        .where(TestRun.suite_run_id.in_(suite_run_ids))
+    )
+
+
+def count_statuses_by_suite_run(suite_run_ids: list[str], db_session: Session):
+    # {suite_run_id: {status: count}} of the test runs and of the evaluations in each suite run
+    test_run_status_counts = defaultdict(dict)
+    for suite_run_id, status, count in db_session.exec(
+        select(TestRun.suite_run_id, TestRun.status, func.count(TestRun.id))
+        .where(TestRun.suite_run_id.in_(suite_run_ids))
+        .group_by(TestRun.suite_run_id, TestRun.status)
+    ):
+        test_run_status_counts[suite_run_id][status] = count
+
+    evaluation_status_counts = defaultdict(dict)
+    for suite_run_id, status, count in db_session.exec(
+        select_suite_run_evaluations(
+            TestRun.suite_run_id, Evaluation.status, func.count(Evaluation.id), suite_run_ids=suite_run_ids
+        ).group_by(TestRun.suite_run_id, Evaluation.status)
+    ):
+        evaluation_status_counts[suite_run_id][status] = count
+
+    return test_run_status_counts, evaluation_status_counts
+
+
+def get_runtime_boxplots_by_suite_run(suite_run_ids: list[str], db_session: Session):
+    # {suite_run_id: (boxplot values, outliers)} of the evaluation runtimes in each suite run
+    if db_session.get_bind().dialect.name != "postgresql":
+        # Without percentile_cont, fetch the runtimes in one query and compute the boxplots in Python
+        suite_run_id_to_runtimes = defaultdict(list)
+        for suite_run_id, replayed_elapsed_seconds in db_session.exec(
+            select_suite_run_evaluations(
+                TestRun.suite_run_id, Evaluation.replayed_elapsed_seconds, suite_run_ids=suite_run_ids
+            )
+        ):
+            suite_run_id_to_runtimes[suite_run_id].append(replayed_elapsed_seconds)
+
+        return {
+            suite_run_id: calculate_boxplot_points(runtimes)
+            for suite_run_id, runtimes in suite_run_id_to_runtimes.items()
+        }
+
+    runtimes = select_suite_run_evaluations(
+        TestRun.suite_run_id, Evaluation.replayed_elapsed_seconds.label("runtime"), suite_run_ids=suite_run_ids
+    ).cte("runtimes")
+    quartiles = (
+        select(
+            runtimes.c.suite_run_id,
+            func.percentile_cont(0.25).within_group(runtimes.c.runtime).label("q1"),
+            func.percentile_cont(0.5).within_group(runtimes.c.runtime).label("median"),
+            func.percentile_cont(0.75).within_group(runtimes.c.runtime).label("q3"),
+        )
+        .group_by(runtimes.c.suite_run_id)
+        .cte("quartiles")
+    )
+
+    # Outliers are more than 1.5 IQR outside of the quartiles
+    iqr = quartiles.c.q3 - quartiles.c.q1
+    is_outlier = or_(runtimes.c.runtime < quartiles.c.q1 - 1.5 * iqr, runtimes.c.runtime > quartiles.c.q3 + 1.5 * iqr)
+
+    boxplots = {}
+    for suite_run_id, q1, median, q3, minimum, maximum, outliers in db_session.exec(
+        select(
+            quartiles.c.suite_run_id,
+            quartiles.c.q1,
+            quartiles.c.median,
+            quartiles.c.q3,
+            func.min(runtimes.c.runtime).filter(not_(is_outlier)),
+            func.max(runtimes.c.runtime).filter(not_(is_outlier)),
+            func.array_agg(runtimes.c.runtime).filter(is_outlier),
+        )
+        .join(runtimes, runtimes.c.suite_run_id == quartiles.c.suite_run_id)
+        .group_by(quartiles.c.suite_run_id, quartiles.c.q1, quartiles.c.median, quartiles.c.q3)
+    ):
+        boxplots[suite_run_id] = ([minimum, q1, median, q3, maximum], sorted(outliers or []))
+
+    return boxplots
+
+
+def build_suite_run_stats(suite_run_ids: list[str], db_session: Session, with_runtimes: bool = True):
+    # Compute the stats of the suite runs from their test runs and evaluations, without saving them
+    test_run_status_counts, evaluation_status_counts = count_statuses_by_suite_run(suite_run_ids, db_session)
+    boxplots = get_runtime_boxplots_by_suite_run(suite_run_ids, db_session)
+
+    suite_run_id_to_runtimes = defaultdict(list)
+    if with_runtimes:
+        for suite_run_id, replayed_elapsed_seconds in db_session.exec(
+            select_suite_run_evaluations(
+                TestRun.suite_run_id, Evaluation.replayed_elapsed_seconds, suite_run_ids=suite_run_ids
+            )
+        ):
+            suite_run_id_to_runtimes[suite_run_id].append(replayed_elapsed_seconds)
+
+    suite_run_stats = {}
+    for suite_run_id in suite_run_ids:
+        runtime_boxplot, runtime_outliers = boxplots.get(suite_run_id, (None, []))
+        suite_run_stats[suite_run_id] = SuiteRunStats(
+            suite_run_id=suite_run_id,
+            test_run_status_counts={
+                status.value: count for status, count in test_run_status_counts[suite_run_id].items()
+            },
+            evaluation_status_counts={
+                status.value: count for status, count in evaluation_status_counts[suite_run_id].items()
+            },
+            evaluation_count=sum(evaluation_status_counts[suite_run_id].values()),
+            runtime_boxplot=runtime_boxplot,
+            runtime_outliers=runtime_outliers,
+            evaluation_runtimes=suite_run_id_to_runtimes[suite_run_id],
+        )
+
+    return suite_run_stats
+
+
+def save_suite_run_stats(suite_run_id: str, db_session: Session):
+    # Called once the suite run completes, replacing the stats if it is completed again
+    db_session.merge(build_suite_run_stats([suite_run_id], db_session)[suite_run_id])
+
+
+def get_suite_run_stats(suite_run_ids: list[str], db_session: Session, with_runtimes: bool = False):
+    # {suite_run_id: stats}, read from the saved stats and computed on the fly for suite runs without them
+    # (still running, stopped, or not backfilled yet)
+    db_query = select(SuiteRunStats).where(SuiteRunStats.suite_run_id.in_(suite_run_ids))
+    if not with_runtimes:
+        db_query = db_query.options(defer(SuiteRunStats.evaluation_runtimes))
+
+    suite_run_stats = {stats.suite_run_id: stats for stats in db_session.exec(db_query).all()}
+
+    missing_suite_run_ids = [suite_run_id for suite_run_id in suite_run_ids if suite_run_id not in suite_run_stats]
+    if missing_suite_run_ids:
+        suite_run_stats.update(build_suite_run_stats(missing_suite_run_ids, db_session, with_runtimes))
+
+    return suite_run_stats
+
+
+@with_db_session
+def backfill_suite_run_stats(batch_size: int, db_session: Session):
+    # Save the stats of finished suite runs from before the stats were saved on completion
+    backfilled_count = 0
+    while True:
+        suite_run_ids = db_session.exec(
+            select(SuiteRun.id)
+            .outerjoin(SuiteRunStats, SuiteRunStats.suite_run_id == SuiteRun.id)
+            .where(SuiteRun.status != RunStatusEnum.RUNNING, SuiteRunStats.suite_run_id.is_(None))
+            .limit(batch_size)
+        ).all()
+        if not suite_run_ids:
+            break
+
+        db_session.add_all(build_suite_run_stats(suite_run_ids, db_session).values())
+        db_session.commit()
+
+        backfilled_count += len(suite_run_ids)
+        logger.info(f"Backfilled stats for {backfilled_count} suite runs")
+
+    return backfilled_count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the stats of finished suite runs.")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    backfill_suite_run_stats(args.batch_size)
@@ -1,46 +1,187 @@
 from datetime import datetime, timezone
 
-from sqlmodel import select
+from sqlmodel import func, insert, select
 from sqlmodel.orm.session import Session
 
-from src.core.utils import has_editor_permissions, has_viewer_permissions
+from src.cache import TTLCache
+from src.core.test_runs import stop_test_runs
+from src.core.utils import (
+    get_page,
+    get_run_tree_option,
+    has_editor_permissions,
+    has_viewer_permissions,
+    skip_run_tree_blobs,
+)
 from src.db import with_db_session
 from src.models.api_schema import (
     InvalidPermissionsResponse,
     ListSuiteRunReadResponse,
     NotFoundResponse,
-    PaginationData,
     SuiteRunCreateRequest,
     SuiteRunReadResponse,
 )
-from src.models.db_schema import Environment, Suite, SuiteRun
+from src.models.db_schema import (
+    Environment,
+    Evaluation,
+    Suite,
+    SuiteRun,
+    Test,
+    TestRun,
+    Variant,
+    VariantRun,
+)
 from src.models.enums import RunStatusEnum
+from src.settings import settings
+from src.utils import PageCursor, get_weak_etag
 
 
 @with_db_session
 def create_suite_run(request: SuiteRunCreateRequest, actor: dict, db_session: Session):
     environment = db_session.get(Environment, request.environment_id)
+    if not environment:
+        return NotFoundResponse(Environment)
 
     if not has_editor_permissions(actor, environment.bot):
         return InvalidPermissionsResponse()
 
-    new_suite_run = SuiteRun.model_validate(
-        request.model_dump()
-        | {
-            "status": RunStatusEnum.RUNNING,
-            "created_by": actor.get("id", "unknown"),
-            "last_updated_by": actor.get("id", "unknown"),
-        }
-    )
+    # The suite must belong to the environment's bot, it is required when its test runs are materialized
+    get_suite = db_session.get(Suite, request.suite_id)
+    if get_suite and get_suite.bot_id != environment.bot_id:
+        return InvalidPermissionsResponse()
+    if not get_suite and request.materialize_runs:
+        return NotFoundResponse(Suite)
+
+    create_dict = {
+        "status": RunStatusEnum.RUNNING,
+        "created_by": actor.get("id", "unknown"),
+        "last_updated_by": actor.get("id", "unknown"),
+    }
+    new_suite_run = SuiteRun.model_validate(request.model_dump(exclude={"materialize_runs"}) | create_dict)
     db_session.add(new_suite_run)
+
+    if request.materialize_runs:
+        # Flush first so the suite run exists for the bulk inserted test runs' foreign keys
+        db_session.flush()
+        create_suite_run_runs(new_suite_run, create_dict, db_session)
+
     db_session.commit()
-    db_session.refresh(new_suite_run)
 
-    return SuiteRunReadResponse.model_validate(new_suite_run)
+    # Load the run tree in a fixed number of queries
+    get_suite_run = db_session.exec(
+        select(SuiteRun)
+        .where(SuiteRun.id == new_suite_run.id)
+        .options(get_run_tree_option(SuiteRun, include_blobs=True))
+        .execution_options(populate_existing=True)
+    ).one()
+
+    return SuiteRunReadResponse.model_validate(get_suite_run)
+
+
+def create_suite_run_runs(suite_run: SuiteRun, create_dict: dict, db_session: Session):
+    # A test run for each enabled test, and a variant run for each of its variants, with one bulk INSERT each
+    # Tests without variants are skipped, their test runs would have nothing to evaluate and never complete
+    get_test_variants = db_session.exec(
+        select(Test.id, Variant.id)
+        .join(Variant, Variant.test_id == Test.id)
+        .where(Test.suite_id == suite_run.suite_id, Test.full_run_enabled)
+        .order_by(Test.created_at, Test.id, Variant.created_at, Variant.id)
+    ).all()
+
+    new_test_runs = {}
+    new_variant_runs = []
+    for test_id, variant_id in get_test_variants:
+        if test_id not in new_test_runs:
+            new_test_runs[test_id] = TestRun.model_validate(
+                {
+                    "environment_id": suite_run.environment_id,
+                    "test_id": test_id,
+                    "suite_run_id": suite_run.id,
+                    "initiation_type": suite_run.initiation_type,
+                }
+                | create_dict
+            )
+
+        new_variant_runs.append(
+            VariantRun.model_validate(
+                {
+                    "test_run_id": new_test_runs[test_id].id,
+                    "variant_id": variant_id,
+                    "initiation_type": suite_run.initiation_type,
+                }
+                | create_dict
+            )
+        )
+
+    if new_test_runs:
+        db_session.execute(insert(TestRun), [test_run.model_dump() for test_run in new_test_runs.values()])
+    if new_variant_runs:
+        db_session.execute(insert(VariantRun), [variant_run.model_dump() for variant_run in new_variant_runs])
+
+
+def get_suite_run_version(suite_run: SuiteRun, db_session: Session):
+    # Changes whenever the suite run, or any run or evaluation in it, is created, completed or updated
+    test_run_version = db_session.exec(
+        select(func.count(TestRun.id), func.max(TestRun.completed_at), func.max(TestRun.last_updated_at)).where(
+            TestRun.suite_run_id == suite_run.id
+        )
+    ).one()
+    # The variant runs' counters also change with every evaluation result, whatever its timestamps
+    variant_run_version = db_session.exec(
+        select(
+            func.count(VariantRun.id),
+            func.max(VariantRun.completed_at),
+            func.max(VariantRun.last_updated_at),
+            func.sum(VariantRun.completed_count),
+            func.sum(VariantRun.pass_count),
+            func.sum(VariantRun.fail_count),
+            func.sum(VariantRun.error_count),
+        )
+        .join(TestRun, TestRun.id == VariantRun.test_run_id)
+        .where(TestRun.suite_run_id == suite_run.id)
+    ).one()
+    evaluation_version = db_session.exec(
+        select(func.count(Evaluation.id), func.max(Evaluation.completed_at), func.max(Evaluation.last_updated_at))
+        .join(VariantRun, VariantRun.id == Evaluation.variant_run_id)
+        .join(TestRun, TestRun.id == VariantRun.test_run_id)
+        .where(TestRun.suite_run_id == suite_run.id)
+    ).one()
+
+    return (
+        suite_run.id,
+        suite_run.status,
+        suite_run.completed_at,
+        suite_run.last_updated_at,
+        tuple(test_run_version),
+        tuple(variant_run_version),
+        tuple(evaluation_version),
+    )
+
+
+@with_db_session
+def get_suite_run_etag(suite_run_id: str, actor: dict, db_session: Session):
+    get_suite_run = db_session.get(SuiteRun, suite_run_id)
+
+    # Missing resources and permission errors have no ETag, the full request reports them
+    if not get_suite_run or not has_viewer_permissions(actor, get_suite_run.environment.bot):
+        return None
+
+    return get_weak_etag(*get_suite_run_version(get_suite_run, db_session))
+
+
+def read_suite_run_progress(suite_run: SuiteRun, db_session: Session):
+    return {
+        "suite_run_id": suite_run.id,
+        "status": suite_run.status.value,
+        "completed_count": suite_run.completed_count,
+        "pass_count": suite_run.pass_count,
+        "fail_count": suite_run.fail_count,
+        "error_count": suite_run.error_count,
+        "version": get_weak_etag(*get_suite_run_version(suite_run, db_session)),
+    }
 
 
 @with_db_session
-def get_suite_run_by_id(suite_run_id: str, actor: dict, db_session: Session):
+def get_suite_run_progress(suite_run_id: str, actor: dict, db_session: Session):
     get_suite_run = db_session.get(SuiteRun, suite_run_id)
 
     if not get_suite_run:
@@ -49,12 +190,54 @@ def get_suite_run_by_id(suite_run_id: str, actor: dict, db_session: Session):
     if not has_viewer_permissions(actor, get_suite_run.environment.bot):
         return InvalidPermissionsResponse()
 
+    return read_suite_run_progress(get_suite_run, db_session)
+
+
+# Progress polled by the event streams, so all the streams of a suite run are served by one read per interval
+suite_run_progress_cache = TTLCache(settings.run_events_progress_cache_size, settings.run_events_poll_interval_seconds)
+
+
+@with_db_session
+def read_polled_suite_run_progress(suite_run_id: str, db_session: Session):
+    return read_suite_run_progress(db_session.get(SuiteRun, suite_run_id), db_session)
+
+
+def poll_suite_run_progress(suite_run_id: str):
+    # Only for event streams whose permissions were checked when they were opened
+    return suite_run_progress_cache.get_or_load(
+        suite_run_id,
+        lambda: read_polled_suite_run_progress(suite_run_id),
+        lambda _: settings.run_events_poll_interval_seconds,
+    )
+
+
+@with_db_session
+def get_suite_run_by_id(suite_run_id: str, actor: dict, include_blobs: bool, db_session: Session):
+    get_suite_run = db_session.get(SuiteRun, suite_run_id, options=[get_run_tree_option(SuiteRun, include_blobs)])
+
+    if not get_suite_run:
+        return NotFoundResponse(SuiteRun)
+
+    if not has_viewer_permissions(actor, get_suite_run.environment.bot):
+        return InvalidPermissionsResponse()
+
+    if not include_blobs:
+        skip_run_tree_blobs([get_suite_run])
+
     return SuiteRunReadResponse.model_validate(get_suite_run)
 
 
 @with_db_session
 def get_suite_runs_by_suite_id(
-    suite_id: str, actor: dict, environment_id: str | None, limit: int, page: int, db_session: Session
+    suite_id: str,
+    actor: dict,
+    environment_id: str | None,
+    limit: int,
+    page: int,
+    cursor: PageCursor | None,
+    include_total: bool,
+    include_blobs: bool,
+    db_session: Session,
 ):
     get_suite = db_session.get(Suite, suite_id)
 
@@ -64,21 +247,34 @@ def get_suite_runs_by_suite_id(
     if not has_viewer_permissions(actor, get_suite.bot):
         return InvalidPermissionsResponse()
 
-    db_query = select(SuiteRun).where(SuiteRun.suite_id == suite_id)
+    db_query = (
+        select(SuiteRun).where(SuiteRun.suite_id == suite_id).options(get_run_tree_option(SuiteRun, include_blobs))
+    )
 
     if environment_id:
         db_query = db_query.where(SuiteRun.environment_id == environment_id)
 
-    offset = (page - 1) * limit
-    get_suite_runs = db_session.exec(db_query.order_by(SuiteRun.created_at.desc()).limit(limit).offset(offset)).all()
+    get_suite_runs, pagination = get_page(db_query, SuiteRun, limit, page, cursor, include_total, db_session)
+    if not include_blobs:
+        skip_run_tree_blobs(get_suite_runs)
+
     return ListSuiteRunReadResponse(
         data=[SuiteRunReadResponse.model_validate(suite_run) for suite_run in get_suite_runs],
-        pagination=PaginationData(items_len=len(get_suite_runs), page=page, limit=limit),
+        pagination=pagination,
     )
 
 
 @with_db_session
-def get_suite_runs_by_environment_id(environment_id: str, actor: dict, limit: int, page: int, db_session: Session):
+def get_suite_runs_by_environment_id(
+    environment_id: str,
+    actor: dict,
+    limit: int,
+    page: int,
+    cursor: PageCursor | None,
+    include_total: bool,
+    include_blobs: bool,
+    db_session: Session,
+):
     get_environment = db_session.get(Environment, environment_id)
 
     if not get_environment:
@@ -87,17 +283,23 @@ def get_suite_runs_by_environment_id(environment_id: str, actor: dict, limit: in
     if not has_viewer_permissions(actor, get_environment.bot):
         return InvalidPermissionsResponse()
 
-    offset = (page - 1) * limit
-    get_suite_runs = db_session.exec(
+    get_suite_runs, pagination = get_page(
         select(SuiteRun)
         .where(SuiteRun.environment_id == environment_id)
-        .order_by(SuiteRun.created_at.desc())
-        .limit(limit)
-        .offset(offset)
-    ).all()
+        .options(get_run_tree_option(SuiteRun, include_blobs)),
+        SuiteRun,
+        limit,
+        page,
+        cursor,
+        include_total,
+        db_session,
+    )
+    if not include_blobs:
+        skip_run_tree_blobs(get_suite_runs)
+
     return ListSuiteRunReadResponse(
         data=[SuiteRunReadResponse.model_validate(suite_run) for suite_run in get_suite_runs],
-        pagination=PaginationData(items_len=len(get_environment.suite_runs), page=page, limit=limit),
+        pagination=pagination,
     )
 
 
@@ -116,12 +318,11 @@ def suite_run_stop_by_id(suite_run_id: str, actor: dict, db_session: Session):
     get_suite_run.last_updated_at = datetime.now(timezone.utc)
     get_suite_run.last_updated_by = actor.get("id", "unknown")
 
-    # update all test runs
-    for test_run in get_suite_run.test_runs:
-        test_run.status = RunStatusEnum.STOPPED
-        test_run.status_info = "Stopped by user."
-        test_run.last_updated_at = datetime.now(timezone.utc)
-        test_run.last_updated_by = actor.get("id", "unknown")
-
+    # stop all running test runs and everything under them
+    stop_test_runs(select(TestRun.id).where(TestRun.suite_run_id == suite_run_id), actor, db_session)
     db_session.commit()
+
+    get_suite_run = db_session.get(
+        SuiteRun, suite_run_id, options=[get_run_tree_option(SuiteRun, include_blobs=True)], populate_existing=True
+    )
     return SuiteRunReadResponse.model_validate(get_suite_run)
@@ -1,7 +1,9 @@
 from sqlmodel import select
 from sqlmodel.orm.session import Session
 
+from src.core.analytics_cache import invalidate_suite_analytics
 from src.core.utils import (
+    get_page,
     has_editor_permissions,
     has_viewer_permissions,
     update_db_model_with_request,
@@ -11,12 +13,12 @@ from src.models.api_schema import (
     InvalidPermissionsResponse,
     ListSuiteReadResponse,
     NotFoundResponse,
-    PaginationData,
     SuiteCreateRequest,
     SuiteReadResponse,
     SuiteUpdateRequest,
 )
 from src.models.db_schema import Bot, Suite
+from src.utils import PageCursor
 
 
 @with_db_session
@@ -50,6 +52,9 @@ def update_suite_by_id(request: SuiteUpdateRequest, suite_id: str, actor: dict,
 
     get_suite = update_db_model_with_request(get_suite, request, db_session, actor)
 
+    # The cached analytics may show the old name or comparison settings
+    invalidate_suite_analytics(suite_id)
+
     return SuiteReadResponse.model_validate(get_suite)
 
 
@@ -83,7 +88,9 @@ def delete_suite_by_id(suite_id: str, actor: dict, db_session: Session):
 
 
 @with_db_session
-def get_suites_by_bot_id(bot_id: str, actor: dict, limit: int, page: int, db_session: Session):
+def get_suites_by_bot_id(
+    bot_id: str, actor: dict, limit: int, page: int, cursor: PageCursor | None, include_total: bool, db_session: Session
+):
     get_bot = db_session.get(Bot, bot_id)
 
     if not get_bot:
@@ -92,12 +99,11 @@ def get_suites_by_bot_id(bot_id: str, actor: dict, limit: int, page: int, db_ses
     if not has_editor_permissions(actor, get_bot):
         return InvalidPermissionsResponse()
 
-    offset = (page - 1) * limit
-    get_suites = db_session.exec(
-        select(Suite).where(Suite.bot_id == bot_id).order_by(Suite.created_at.desc()).limit(limit).offset(offset)
-    ).all()
+    get_suites, pagination = get_page(
+        select(Suite).where(Suite.bot_id == bot_id), Suite, limit, page, cursor, include_total, db_session
+    )
 
     return ListSuiteReadResponse(
         data=[SuiteReadResponse.model_validate(suite) for suite in get_suites],
-        pagination=PaginationData(items_len=len(get_bot.suites), limit=limit, page=page),
+        pagination=pagination,
     )
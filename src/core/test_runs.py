@@ -1,20 +1,33 @@
 from datetime import datetime, timezone
 
-from sqlmodel import select
+from sqlmodel import select, update
 from sqlmodel.orm.session import Session
 
-from src.core.utils import has_viewer_permissions
+from src.core.jobs import cancel_jobs
+from src.core.utils import (
+    get_page,
+    get_run_tree_option,
+    has_viewer_permissions,
+    skip_run_tree_blobs,
+)
 from src.db import with_db_session
 from src.models.api_schema import (
     InvalidPermissionsResponse,
     ListTestRunReadResponse,
     NotFoundResponse,
-    PaginationData,
     TestRunCreateRequest,
     TestRunReadResponse,
 )
-from src.models.db_schema import Environment, SuiteRun, Test, TestRun
-from src.models.enums import RunStatusEnum
+from src.models.db_schema import (
+    Environment,
+    Evaluation,
+    SuiteRun,
+    Test,
+    TestRun,
+    VariantRun,
+)
+from src.models.enums import JobTypeEnum, RunStatusEnum
+from src.utils import PageCursor
 
 
 @with_db_session
@@ -41,8 +54,8 @@ def create_test_run(request: TestRunCreateRequest, actor: dict, db_session: Sess
 
 
 @with_db_session
-def get_test_run_by_id(test_run_id: str, actor: dict, db_session: Session):
-    get_test_run = db_session.get(TestRun, test_run_id)
+def get_test_run_by_id(test_run_id: str, actor: dict, include_blobs: bool, db_session: Session):
+    get_test_run = db_session.get(TestRun, test_run_id, options=[get_run_tree_option(TestRun, include_blobs)])
 
     if not get_test_run:
         return NotFoundResponse(TestRun)
@@ -50,12 +63,23 @@ def get_test_run_by_id(test_run_id: str, actor: dict, db_session: Session):
     if not has_viewer_permissions(actor, get_test_run.environment.bot):
         return InvalidPermissionsResponse()
 
+    if not include_blobs:
+        skip_run_tree_blobs([get_test_run])
+
     return TestRunReadResponse.model_validate(get_test_run)
 
 
 @with_db_session
 def get_test_runs_by_test_id(
-    test_id: str, actor: dict, environment_id: str | None, limit: int, page: int, db_session: Session
+    test_id: str,
+    actor: dict,
+    environment_id: str | None,
+    limit: int,
+    page: int,
+    cursor: PageCursor | None,
+    include_total: bool,
+    include_blobs: bool,
+    db_session: Session,
 ):
     get_test = db_session.get(Test, test_id)
 
@@ -65,21 +89,32 @@ def get_test_runs_by_test_id(
     if not has_viewer_permissions(actor, get_test.suite.bot):
         return InvalidPermissionsResponse()
 
-    db_query = select(TestRun).where(TestRun.test_id == test_id)
+    db_query = select(TestRun).where(TestRun.test_id == test_id).options(get_run_tree_option(TestRun, include_blobs))
 
     if environment_id:
         db_query = db_query.where(TestRun.environment_id == environment_id)
 
-    offset = (page - 1) * limit
-    get_test_runs = db_session.exec(db_query.order_by(TestRun.created_at.desc()).limit(limit).offset(offset)).all()
+    get_test_runs, pagination = get_page(db_query, TestRun, limit, page, cursor, include_total, db_session)
+    if not include_blobs:
+        skip_run_tree_blobs(get_test_runs)
+
     return ListTestRunReadResponse(
         data=[TestRunReadResponse.model_validate(test_run) for test_run in get_test_runs],
-        pagination=PaginationData(items_len=len(get_test_runs), limit=limit, page=page),
+        pagination=pagination,
     )
 
 
 @with_db_session
-def get_test_runs_by_suite_run_id(suite_run_id: str, actor: dict, limit: int, page: int, db_session: Session):
+def get_test_runs_by_suite_run_id(
+    suite_run_id: str,
+    actor: dict,
+    limit: int,
+    page: int,
+    cursor: PageCursor | None,
+    include_total: bool,
+    include_blobs: bool,
+    db_session: Session,
+):
     get_suite_run = db_session.get(SuiteRun, suite_run_id)
 
     if not get_suite_run:
@@ -88,22 +123,37 @@ def get_test_runs_by_suite_run_id(suite_run_id: str, actor: dict, limit: int, pa
     if not has_viewer_permissions(actor, get_suite_run.environment.bot):
         return InvalidPermissionsResponse()
 
-    offset = (page - 1) * limit
-    get_test_runs = db_session.exec(
+    get_test_runs, pagination = get_page(
         select(TestRun)
         .where(TestRun.suite_run_id == suite_run_id)
-        .order_by(TestRun.created_at.desc())
-        .limit(limit)
-        .offset(offset)
-    ).all()
+        .options(get_run_tree_option(TestRun, include_blobs)),
+        TestRun,
+        limit,
+        page,
+        cursor,
+        include_total,
+        db_session,
+    )
+    if not include_blobs:
+        skip_run_tree_blobs(get_test_runs)
+
     return ListTestRunReadResponse(
         data=[TestRunReadResponse.model_validate(test_run) for test_run in get_test_runs],
-        pagination=PaginationData(items_len=len(get_suite_run.test_runs), limit=limit, page=page),
+        pagination=pagination,
     )
 
 
 @with_db_session
-def get_test_runs_by_environment_id(environment_id: str, actor: dict, limit: int, page: int, db_session: Session):
+def get_test_runs_by_environment_id(
+    environment_id: str,
+    actor: dict,
+    limit: int,
+    page: int,
+    cursor: PageCursor | None,
+    include_total: bool,
+    include_blobs: bool,
+    db_session: Session,
+):
     get_environment = db_session.get(Environment, environment_id)
 
     if not get_environment:
@@ -112,17 +162,23 @@ def get_test_runs_by_environment_id(environment_id: str, actor: dict, limit: int
     if not has_viewer_permissions(actor, get_environment.bot):
         return InvalidPermissionsResponse()
 
-    offset = (page - 1) * limit
-    get_test_runs = db_session.exec(
+    get_test_runs, pagination = get_page(
         select(TestRun)
         .where(TestRun.environment_id == environment_id)
-        .order_by(TestRun.created_at.desc())
-        .limit(limit)
-        .offset(offset)
-    ).all()
+        .options(get_run_tree_option(TestRun, include_blobs)),
+        TestRun,
+        limit,
+        page,
+        cursor,
+        include_total,
+        db_session,
+    )
+    if not include_blobs:
+        skip_run_tree_blobs(get_test_runs)
+
     return ListTestRunReadResponse(
         data=[TestRunReadResponse.model_validate(test_run) for test_run in get_test_runs],
-        pagination=PaginationData(items_len=len(get_environment.test_runs), limit=limit, page=page),
+        pagination=pagination,
     )
 
 
@@ -136,10 +192,36 @@ def test_run_stop_by_id(test_run_id: str, actor: dict, db_session: Session):
     if not has_viewer_permissions(actor, get_test_run.environment.bot):
         return InvalidPermissionsResponse()
 
-    get_test_run.status = RunStatusEnum.STOPPED
-    get_test_run.status_info = "Stopped by user."
-    get_test_run.last_updated_at = datetime.now(timezone.utc)
-    get_test_run.last_updated_by = actor.get("id", "unknown")
+    stop_test_runs(select(TestRun.id).where(TestRun.id == test_run_id), actor, db_session)
     db_session.commit()
 
+    get_test_run = db_session.get(
+        TestRun, test_run_id, options=[get_run_tree_option(TestRun, include_blobs=True)], populate_existing=True
+    )
     return TestRunReadResponse.model_validate(get_test_run)
+
+
+def stop_test_runs(test_run_ids, actor: dict, db_session: Session):
+    # Stop the running test runs, variant runs and evaluations under test_run_ids (a subquery) and cancel
+    # their evaluation jobs, with one UPDATE per table however large the runs are
+    variant_run_ids = select(VariantRun.id).where(VariantRun.test_run_id.in_(test_run_ids))
+    evaluation_ids = select(Evaluation.id).where(Evaluation.variant_run_id.in_(variant_run_ids))
+
+    for model, db_filter in [
+        (TestRun, TestRun.id.in_(test_run_ids)),
+        (VariantRun, VariantRun.test_run_id.in_(test_run_ids)),
+        (Evaluation, Evaluation.variant_run_id.in_(variant_run_ids)),
+    ]:
+        db_session.execute(
+            update(model)
+            .where(db_filter, model.status == RunStatusEnum.RUNNING)
+            .values(
+                status=RunStatusEnum.STOPPED,
+                status_info="Stopped by user.",
+                last_updated_at=datetime.now(timezone.utc),
+                last_updated_by=actor.get("id", "unknown"),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    cancel_jobs(JobTypeEnum.EVALUATE_CONVERSATION, evaluation_ids, db_session)
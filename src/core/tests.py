@@ -1,7 +1,11 @@
-from sqlmodel import select
+from sqlalchemy import true
+from sqlalchemy.orm import aliased
+from sqlmodel import func, select
 from sqlmodel.orm.session import Session
 
+from src.core.analytics_cache import invalidate_suite_analytics
 from src.core.utils import (
+    get_page,
     has_editor_permissions,
     has_viewer_permissions,
     update_db_model_with_request,
@@ -11,13 +15,51 @@ from src.models.api_schema import (
     InvalidPermissionsResponse,
     ListTestReadResponse,
     NotFoundResponse,
-    PaginationData,
     RecentTestRuns,
     TestCreateRequest,
     TestReadResponse,
     TestUpdateRequest,
 )
 from src.models.db_schema import Suite, Test, TestRun
+from src.utils import PageCursor, get_weak_etag
+
+RECENT_TEST_RUN_COUNT = 11
+
+
+def get_recent_test_runs(test_ids: list[str], environment_id: str, db_session: Session):
+    # {test_id: most recent test runs of the test in the environment}
+    if db_session.get_bind().dialect.name == "postgresql":
+        # Lateral join, each test reads only its newest runs from the (test_id, created_at) index
+        recent_test_runs = (
+            select(TestRun)
+            .where(TestRun.test_id == Test.id, TestRun.environment_id == environment_id)
+            .order_by(TestRun.created_at.desc())
+            .limit(RECENT_TEST_RUN_COUNT)
+            .subquery()
+            .lateral()
+        )
+        db_query = select(aliased(TestRun, recent_test_runs)).select_from(Test).join(recent_test_runs, true())
+        db_query = db_query.where(Test.id.in_(test_ids))
+    else:
+        row_number = func.row_number().over(partition_by=TestRun.test_id, order_by=TestRun.created_at.desc())
+        ranked_test_runs = (
+            select(TestRun, row_number.label("row_number"))
+            .where(TestRun.test_id.in_(test_ids), TestRun.environment_id == environment_id)
+            .subquery()
+        )
+        db_query = select(aliased(TestRun, ranked_test_runs)).where(
+            ranked_test_runs.c.row_number <= RECENT_TEST_RUN_COUNT
+        )
+
+    test_id_to_recent_test_runs = {test_id: [] for test_id in test_ids}
+    for test_run in db_session.exec(db_query).all():
+        test_id_to_recent_test_runs[test_run.test_id].append(RecentTestRuns.model_validate(test_run))
+
+    # Rows of a subquery come back in no particular order
+    for recent_test_runs in test_id_to_recent_test_runs.values():
+        recent_test_runs.sort(key=lambda test_run: test_run.created_at, reverse=True)
+
+    return test_id_to_recent_test_runs
 
 
 @with_db_session
@@ -49,6 +91,9 @@ def create_test(request: TestCreateRequest, actor: dict, db_session: Session):
     db_session.commit()
     db_session.refresh(new_test)
 
+    # The cached analytics list the suite's tests
+    invalidate_suite_analytics(new_test.suite_id)
+
     return TestReadResponse.model_validate(new_test)
 
 
@@ -71,9 +116,31 @@ def update_test_by_id(request: TestUpdateRequest, test_id: str, actor: dict, db_
     if request.use_default_variant_count:
         get_test.variant_count = get_test.suite.default_variant_count
 
+    # The cached analytics may show the old test name
+    invalidate_suite_analytics(get_test.suite_id)
+
     return TestReadResponse.model_validate(get_test)
 
 
+@with_db_session
+def get_test_etag(test_id: str, actor: dict, environment_id: str | None, db_session: Session):
+    get_test = db_session.get(Test, test_id)
+
+    # Missing resources and permission errors have no ETag, the full request reports them
+    if not get_test or not has_viewer_permissions(actor, get_test.suite.bot):
+        return None
+
+    # The recent test runs change as they complete or are stopped, read with the same query as the response
+    test_run_versions = []
+    if environment_id:
+        test_run_versions = [
+            (test_run.id, test_run.status, test_run.completed_at, test_run.last_updated_at)
+            for test_run in get_recent_test_runs([test_id], environment_id, db_session)[test_id]
+        ]
+
+    return get_weak_etag(test_id, get_test.last_updated_at, environment_id, test_run_versions)
+
+
 @with_db_session
 def get_test_by_id(test_id: str, actor: dict, environment_id: str | None, db_session: Session):
     get_test = db_session.get(Test, test_id)
@@ -88,14 +155,7 @@ def get_test_by_id(test_id: str, actor: dict, environment_id: str | None, db_ses
 
     if environment_id:
         # Get the test runs for the test in the environment
-        get_test_runs = db_session.exec(
-            select(TestRun)
-            .where(TestRun.test_id == test_id)
-            .where(TestRun.environment_id == environment_id)
-            .order_by(TestRun.created_at.desc())
-            .limit(11)
-        ).all()
-        response.recent_test_runs = [RecentTestRuns.model_validate(test_run) for test_run in get_test_runs]
+        response.recent_test_runs = get_recent_test_runs([test_id], environment_id, db_session)[test_id]
 
     return response
 
@@ -110,9 +170,12 @@ def delete_test_by_id(test_id: str, actor: dict, db_session: Session):
     if not has_editor_permissions(actor, get_test.suite.bot):
         return InvalidPermissionsResponse()
 
+    suite_id = get_test.suite_id
     db_session.delete(get_test)
     db_session.commit()
 
+    invalidate_suite_analytics(suite_id)
+
     return {"status": "OK"}
 
 
@@ -123,6 +186,8 @@ def get_tests_by_suite_id(
     environment_id: str | None,
     limit: int,
     page: int,
+    cursor: PageCursor | None,
+    include_total: bool,
     db_session: Session,
 ):
     get_suite = db_session.get(Suite, suite_id)
@@ -133,25 +198,18 @@ def get_tests_by_suite_id(
     if not has_viewer_permissions(actor, get_suite.bot):
         return InvalidPermissionsResponse()
 
-    offset = (page - 1) * limit
-    get_tests = db_session.exec(
-        select(Test).where(Test.suite_id == suite_id).order_by(Test.created_at.desc()).limit(limit).offset(offset)
-    ).all()
+    get_tests, pagination = get_page(
+        select(Test).where(Test.suite_id == suite_id), Test, limit, page, cursor, include_total, db_session
+    )
     get_tests = [TestReadResponse.model_validate(test) for test in get_tests]
 
-    # if environment passed, populate the recent test runs
+    # if environment passed, populate the recent test runs of the whole page in one query
     if environment_id:
+        test_id_to_recent_test_runs = get_recent_test_runs([test.id for test in get_tests], environment_id, db_session)
         for test in get_tests:
-            get_test_runs = db_session.exec(
-                select(TestRun)
-                .where(TestRun.test_id == test.id)
-                .where(TestRun.environment_id == environment_id)
-                .order_by(TestRun.created_at.desc())
-                .limit(11)
-            ).all()
-            test.recent_test_runs = [RecentTestRuns.model_validate(test_run) for test_run in get_test_runs]
+            test.recent_test_runs = test_id_to_recent_test_runs[test.id]
 
     return ListTestReadResponse(
         data=get_tests,
-        pagination=PaginationData(items_len=len(get_suite.tests), limit=limit, page=page),
+        pagination=pagination,
     )
@@ -3,18 +3,27 @@ from datetime import datetime, timezone
 from statistics import median
 from typing import List
 
+import httpx
 import openai
-import requests
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
-from sqlmodel import SQLModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import SQLModel, func, select, tuple_
 from sqlmodel.orm.session import Session
 
-from src.models.db_schema import Bot
+from src.cache import TTLCache
+from src.models.api_schema import PaginationData
+from src.models.db_schema import BLOBS, Bot, SuiteRun, TestRun, VariantRun
 from src.settings import logger, settings
+from src.utils import PageCursor, encode_page_cursor, http_client
 
 openai.api_key = settings.openai_api_key
 
+# actor_id -> {organization_id: role}, a None value is a cached failed lookup
+org_memberships_cache = TTLCache(settings.clerk_membership_cache_size, settings.clerk_membership_cache_ttl_seconds)
+
 
 def send_slack_alert(content: str):
     client = WebClient(token=settings.slack_token)
@@ -134,20 +143,45 @@ def _generic_has_permissions(actor: dict, bot: Bot, permissions: List[str]):
     if not org_id and bot.user_id == actor_id:
         return True
 
-    # get org memberships
-    org_memberships = requests.get(
-        f"https://api.clerk.com/v1/users/{actor_id}/organization_memberships",
-        headers={"Authorization": f"Bearer {settings.clerk_api_key}"},
-    ).json()
+    # Otherwise the bot must belong to the actor's active organization
+    if not org_id or bot.organization_id != org_id:
+        return False
+
+    # the verified session token already carries the role in the active organization
+    org_role = actor.get("org_role")
+    if org_role and actor.get("org_role_verified") and settings.use_org_role_claim:
+        # older session tokens omit the "org:" prefix on roles
+        return (org_role if org_role.startswith("org:") else f"org:{org_role}") in permissions
+
+    # otherwise fall back to the org memberships from Clerk
+    org_roles = get_org_roles(actor_id)
+
+    # find correct membership and return if permissions exist
+    return (org_roles or {}).get(org_id) in permissions
 
-    for membership in org_memberships.get("data", {}):
-        if not (membership["organization"]["id"] == bot.organization_id == org_id):
-            continue
 
-        # find correct membership and return if permissions exist
-        return membership["role"] in permissions
+def fetch_org_roles(actor_id: str):
+    try:
+        response = http_client.get(
+            f"https://api.clerk.com/v1/users/{actor_id}/organization_memberships",
+            headers={"Authorization": f"Bearer {settings.clerk_api_key}"},
+        )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        logger.exception(f"Error fetching organization memberships for {actor_id}: {e}")
+        return None
 
-    return False
+    return {membership["organization"]["id"]: membership["role"] for membership in response.json().get("data", [])}
+
+
+def get_org_roles(actor_id: str):
+    # Cached so repeated permission checks don't each make a round trip to Clerk
+    # Failed lookups are cached briefly so an outage doesn't turn into a burst of retries
+    return org_memberships_cache.get_or_load(
+        actor_id,
+        lambda: fetch_org_roles(actor_id),
+        lambda org_roles: settings.clerk_membership_negative_cache_ttl_seconds if org_roles is None else None,
+    )
 
 
 def has_editor_permissions(actor: dict, bot: Bot):
@@ -162,6 +196,83 @@ def has_admin_permissions(actor: dict, bot: Bot):
     return _generic_has_permissions(actor, bot, permissions=["org:admin"])
 
 
+def get_page_query(db_query, model: type[SQLModel], limit: int, page: int, cursor: PageCursor | None):
+    # Newest first, with the id as a tie breaker so every row has a unique position
+    # The list indexes end with (created_at, id), so they return the rows in this order without a sort
+    page_query = db_query.order_by(model.created_at.desc(), model.id.desc())
+
+    if cursor:
+        # Seek straight past the previous page through the same index, instead of OFFSET which
+        # reads and discards every row before the page
+        page_query = page_query.where(tuple_(model.created_at, model.id) < tuple_(cursor.created_at, cursor.id))
+    else:
+        page_query = page_query.offset((page - 1) * limit)
+
+    # One extra row tells if there is a next page
+    return page_query.limit(limit + 1)
+
+
+def get_page(
+    db_query,
+    model: type[SQLModel],
+    limit: int,
+    page: int,
+    cursor: PageCursor | None,
+    include_total: bool,
+    db_session: Session,
+):
+    get_rows = db_session.exec(get_page_query(db_query, model, limit, page, cursor)).all()
+    next_cursor = (
+        encode_page_cursor(get_rows[limit - 1].created_at, get_rows[limit - 1].id) if len(get_rows) > limit else None
+    )
+
+    # The total is counted by the database rather than by loading every row, and can be skipped entirely
+    total = db_session.exec(select(func.count()).select_from(db_query.subquery())).one() if include_total else None
+
+    return get_rows[:limit], PaginationData(
+        items_len=total, limit=limit, page=None if cursor else page, next_cursor=next_cursor
+    )
+
+
+# Relationships from each kind of run down to its evaluations
+RUN_TREE_RELATIONSHIPS = {
+    SuiteRun: [SuiteRun.test_runs, TestRun.variant_runs, VariantRun.evaluations],
+    TestRun: [TestRun.variant_runs, VariantRun.evaluations],
+    VariantRun: [VariantRun.evaluations],
+}
+
+
+def get_run_tree_option(model: type[SuiteRun] | type[TestRun] | type[VariantRun], include_blobs: bool):
+    # Loads the runs under each run one level per query, rather than one query per run, and the evaluations'
+    # large columns only when they're included
+    relationships = RUN_TREE_RELATIONSHIPS[model]
+    option = selectinload(relationships[0])
+    for relationship in relationships[1:]:
+        option = option.selectinload(relationship)
+
+    return option.undefer_group(BLOBS) if include_blobs else option
+
+
+def skip_blobs(rows: list[SQLModel]):
+    # Sets the deferred large columns that weren't loaded to None, so serializing the rows leaves them out
+    # (response_model_exclude_none) instead of loading them one row at a time
+    for row in rows:
+        state = inspect(row)
+        for column in state.mapper.column_attrs:
+            if column.deferred and column.key in state.unloaded:
+                set_committed_value(row, column.key, None)
+
+
+def skip_run_tree_blobs(runs: list[SuiteRun] | list[TestRun] | list[VariantRun]):
+    # skip_blobs for the evaluations under runs loaded with get_run_tree_option(include_blobs=False)
+    for run in runs:
+        children = getattr(run, RUN_TREE_RELATIONSHIPS[type(run)][0].key)
+        if isinstance(run, VariantRun):
+            skip_blobs(children)
+        else:
+            skip_run_tree_blobs(children)
+
+
 def update_db_model_with_request(model: SQLModel, request: SQLModel, db_session: Session, actor: dict):
     request_data = request.model_dump()
     for key, value in request_data.items():
@@ -1,6 +1,6 @@
 from sqlmodel.orm.session import Session
 
-from src.core.utils import has_viewer_permissions
+from src.core.utils import get_run_tree_option, has_viewer_permissions
 from src.db import with_db_session
 from src.models.api_schema import (
     InvalidPermissionsResponse,
@@ -36,7 +36,9 @@ def create_variant_run(request: VariantRunCreateRequest, actor: dict, db_session
 
 @with_db_session
 def get_variant_run_by_id(variant_run_id: str, actor: dict, db_session: Session):
-    get_variant_run = db_session.get(VariantRun, variant_run_id)
+    get_variant_run = db_session.get(
+        VariantRun, variant_run_id, options=[get_run_tree_option(VariantRun, include_blobs=True)]
+    )
 
     if not get_variant_run:
         return NotFoundResponse(VariantRun)
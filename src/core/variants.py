@@ -1,9 +1,13 @@
+from sqlalchemy.orm import undefer_group
 from sqlmodel import select
 from sqlmodel.orm.session import Session
 
+from src.core.analytics_cache import invalidate_suite_analytics
 from src.core.utils import (
+    get_page,
     has_editor_permissions,
     has_viewer_permissions,
+    skip_blobs,
     update_db_model_with_request,
 )
 from src.db import with_db_session
@@ -11,12 +15,12 @@ from src.models.api_schema import (
     InvalidPermissionsResponse,
     ListVariantReadResponse,
     NotFoundResponse,
-    PaginationData,
     VariantCreateRequest,
     VariantReadResponse,
     VariantUpdateRequest,
 )
-from src.models.db_schema import Test, Variant
+from src.models.db_schema import BLOBS, Test, Variant
+from src.utils import PageCursor
 
 
 @with_db_session
@@ -33,12 +37,15 @@ def create_variant(request: VariantCreateRequest, actor: dict, db_session: Sessi
     db_session.commit()
     db_session.refresh(new_variant)
 
+    # The cached analytics show each test's variant count
+    invalidate_suite_analytics(test.suite_id)
+
     return VariantReadResponse.model_validate(new_variant)
 
 
 @with_db_session
 def get_variant_by_id(variant_id: str, actor: dict, db_session: Session):
-    get_variant = db_session.get(Variant, variant_id)
+    get_variant = db_session.get(Variant, variant_id, options=[undefer_group(BLOBS)])
 
     if not get_variant:
         return NotFoundResponse(Variant)
@@ -74,14 +81,26 @@ def delete_variant_by_id(variant_id: str, actor: dict, db_session: Session):
     if not has_editor_permissions(actor, get_variant.test.suite.bot):
         return InvalidPermissionsResponse()
 
+    suite_id = get_variant.test.suite_id
     db_session.delete(get_variant)
     db_session.commit()
 
+    invalidate_suite_analytics(suite_id)
+
     return {"status": "OK"}
 
 
 @with_db_session
-def get_variants_by_test_id(test_id: str, actor: dict, limit: int, page: int, db_session: Session):
+def get_variants_by_test_id(
+    test_id: str,
+    actor: dict,
+    limit: int,
+    page: int,
+    cursor: PageCursor | None,
+    include_total: bool,
+    include_blobs: bool,
+    db_session: Session,
+):
     get_test = db_session.get(Test, test_id)
 
     if not get_test:
@@ -90,18 +109,17 @@ def get_variants_by_test_id(test_id: str, actor: dict, limit: int, page: int, db
     if not has_viewer_permissions(actor, get_test.suite.bot):
         return InvalidPermissionsResponse()
 
-    offset = (page - 1) * limit
-    get_variants = db_session.exec(
-        select(Variant)
-        .where(Variant.test_id == test_id)
-        .order_by(Variant.created_at.desc())
-        .limit(limit)
-        .offset(offset)
-    ).all()
+    db_query = select(Variant).where(Variant.test_id == test_id)
+    if include_blobs:
+        db_query = db_query.options(undefer_group(BLOBS))
+
+    get_variants, pagination = get_page(db_query, Variant, limit, page, cursor, include_total, db_session)
+    if not include_blobs:
+        skip_blobs(get_variants)
 
     return ListVariantReadResponse(
         data=[VariantReadResponse.model_validate(variant) for variant in get_variants],
-        pagination=PaginationData(items_len=len(get_test.variants), limit=limit, page=page),
+        pagination=pagination,
     )
 
 
@@ -141,3 +159,6 @@ def manage_additional_variants(test_id: str, db_session: Session):
         for variant in extra_variants:
             db_session.delete(variant)
         db_session.commit()
+
+    if need_to_generate:
+        invalidate_suite_analytics(get_test.suite_id)
@@ -1,8 +1,51 @@
+from sqlalchemy.pool import NullPool
 from sqlmodel import Session, SQLModel, create_engine
 
 from src.settings import settings
 
-engine = create_engine(settings.database_uri)
+
+def get_engine_options(database_uri: str, pool_profile: str):
+    options = {"pool_pre_ping": settings.db_pool_pre_ping}
+
+    if database_uri.startswith("postgresql"):
+        options["connect_args"] = {
+            # Notice connections dropped while idle (NAT and proxy timeouts) instead of hanging on them
+            "keepalives": 1,
+            "keepalives_idle": 30,
+            "keepalives_interval": 10,
+            "keepalives_count": 3,
+        }
+        # RDS Proxy rejects or pins connections with startup options (and SET statements), so behind it the
+        # timeout belongs in the proxy's initialization query instead
+        if settings.db_statement_timeout_ms and pool_profile != "rds_proxy":
+            options["connect_args"]["options"] = f"-c statement_timeout={settings.db_statement_timeout_ms}"
+
+    if pool_profile == "rds_proxy":
+        # RDS Proxy already pools connections, so hand each one back to it as soon as the session closes
+        options["poolclass"] = NullPool
+    elif pool_profile == "lambda":
+        # A container serves one invocation at a time, so keep one connection warm between invocations
+        # Connections the database closed while the container was frozen are replaced by the pre-ping
+        options.update(
+            pool_size=1,
+            max_overflow=2,
+            pool_recycle=settings.db_pool_recycle_seconds,
+            pool_pre_ping=True,
+        )
+    elif pool_profile == "server":
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout_seconds,
+            pool_recycle=settings.db_pool_recycle_seconds,
+        )
+    else:
+        raise ValueError(f"Unknown database pool profile: {pool_profile}")
+
+    return options
+
+
+engine = create_engine(settings.database_uri, **get_engine_options(settings.database_uri, settings.db_pool_profile))
 
 
 def create_all():
@@ -13,10 +56,20 @@ def drop_all():
     SQLModel.metadata.drop_all(engine)
 
 
+def get_db_session():
+    # One session per request, so the core functions called by a route share a single connection checkout
+    # and an identity map, loading each row at most once
+    with Session(engine) as session:
+        yield session
+
+
 def with_db_session(fn):
-    def db_session_wrapper(*args, **kwargs):
+    def db_session_wrapper(*args, db_session: Session | None = None, **kwargs):
+        # Join the caller's session when given one (e.g. the request's), otherwise open a new one
+        if db_session is not None:
+            return fn(*args, db_session=db_session, **kwargs)
+
         with Session(engine) as session:
-            kwargs["db_session"] = session
-            return fn(*args, **kwargs)
+            return fn(*args, db_session=session, **kwargs)
 
     return db_session_wrapper
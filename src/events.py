@@ -0,0 +1,6 @@
+import json
+
+
+def format_event(event_type: str, data: dict):
+    # Server-sent event wire format
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
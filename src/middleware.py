@@ -1,24 +1,140 @@
-from time import time
+from hashlib import sha256
+from threading import Lock, Thread
+from time import monotonic, thread_time, time
 
-import requests
 from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from jose import jwt
-from jose.exceptions import ExpiredSignatureError
+from jose import jwk, jwt
+from jose.exceptions import ExpiredSignatureError, JWTError
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_500_INTERNAL_SERVER_ERROR
 
+from src.cache import TTLCache
 from src.settings import logger, settings
+from src.utils import http_client
 
 
 def get_public_key():
     jwks_url = f"https://{settings.jwks_url}/.well-known/jwks.json"
-    jwks = requests.get(jwks_url).json()
+    response = http_client.get(jwks_url)
+    response.raise_for_status()
+    jwks = response.json()
     return {key["kid"]: key for key in jwks["keys"]}
 
 
-PUBLIC_KEYS = get_public_key()
+class PublicKeyCache:
+    # Lazily fetched on first use rather than at import, so cold starts don't wait on the JWKS endpoint
+    # Keys are refreshed in the background once the TTL passes, and right away when a token is signed
+    # with an unknown key id (Clerk rotated its keys), at most once per min_refresh_interval_seconds
+    def __init__(self, ttl_seconds: float, min_refresh_interval_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_interval_seconds = min_refresh_interval_seconds
+
+        self._keys = {}
+        self._fetched_at = None
+        self._lock = Lock()
+
+    def _seconds_since_fetch(self):
+        return float("inf") if self._fetched_at is None else monotonic() - self._fetched_at
+
+    def _refresh(self, is_needed):
+        # Single flight: concurrent callers wait for one fetch instead of each fetching
+        with self._lock:
+            if not is_needed():
+                return
+
+            # Parse the JWKs once here so jwt.decode doesn't re-parse them on every request
+            self._keys = {key_id: jwk.construct(key, "RS256") for key_id, key in get_public_key().items()}
+            self._fetched_at = monotonic()
+
+    def _background_refresh(self):
+        try:
+            self._refresh(lambda: self._seconds_since_fetch() > self.ttl_seconds)
+        except Exception as e:
+            # Keep serving the current keys, the next request past the TTL tries again
+            logger.exception(e)
+
+    def get(self, key_id: str):
+        if self._fetched_at is None:
+            self._refresh(lambda: self._fetched_at is None)
+        elif self._seconds_since_fetch() > self.ttl_seconds and not self._lock.locked():
+            Thread(target=self._background_refresh, daemon=True).start()
+
+        if key_id not in self._keys:
+            self._refresh(
+                lambda: key_id not in self._keys and self._seconds_since_fetch() > self.min_refresh_interval_seconds
+            )
+
+        return self._keys.get(key_id)
+
+
+public_keys = PublicKeyCache(settings.jwks_cache_ttl_seconds, settings.jwks_min_refresh_interval_seconds)
+
+
+def decode_token(token: str):
+    header = jwt.get_unverified_header(token)
+    key_id = header["kid"]
+    public_key = public_keys.get(key_id)
+    if public_key is None:
+        raise JWTError(f"Unknown key id: {key_id}")
+
+    return jwt.decode(
+        token,
+        public_key,
+        algorithms=["RS256"],
+    )
+
+
+class VerifiedTokenCache:
+    # Claims of already verified tokens, keyed by a hash of the token and kept until the token expires
+    # so the same bearer token sent repeatedly is only verified with RS256 once
+    def __init__(self, max_size: int, max_ttl_seconds: float):
+        self._cache = TTLCache(max_size, max_ttl_seconds)
+        self.verifications = 0
+        self.verification_cpu_seconds = 0.0
+
+    def get(self, token: str):
+        payload = self._cache.get(sha256(token.encode()).hexdigest())
+
+        # Periodically report how much verification the cache is saving
+        if (self._cache.hits + self._cache.misses) % 1000 == 0:
+            logger.info(f"Verified token cache: {self.stats()}")
+
+        return payload
+
+    def verify(self, token: str):
+        payload = self.get(token)
+        if payload is not None:
+            return payload
+
+        return self.verify_uncached(token)
+
+    def verify_uncached(self, token: str):
+        token_hash = sha256(token.encode()).hexdigest()
+        start_time = thread_time()
+        payload = decode_token(token)
+        self.verifications += 1
+        self.verification_cpu_seconds += thread_time() - start_time
+
+        # Never keep claims past the token's expiry
+        ttl_seconds = min(payload.get("exp", float("inf")) - time(), self._cache.ttl_seconds)
+        if ttl_seconds > 0:
+            self._cache.set(token_hash, payload, ttl_seconds)
+
+        return payload
+
+    def stats(self):
+        average_cpu_seconds = self.verification_cpu_seconds / self.verifications if self.verifications else 0
+        return self._cache.stats() | {
+            "verifications": self.verifications,
+            "verification_cpu_seconds": self.verification_cpu_seconds,
+            "saved_cpu_seconds": self._cache.hits * average_cpu_seconds,
+        }
+
+
+verified_tokens = VerifiedTokenCache(settings.verified_token_cache_size, settings.verified_token_cache_max_ttl_seconds)
 
 
 class AuthorizationHeaderMiddleware(BaseHTTPMiddleware):
@@ -47,15 +163,11 @@ class AuthorizationHeaderMiddleware(BaseHTTPMiddleware):
             credentials: HTTPAuthorizationCredentials = await self.auth_scheme(request)
             token = credentials.credentials
 
-            # Validate token
-            header = jwt.get_unverified_header(token)
-            key_id = header["kid"]
-            public_key = PUBLIC_KEYS[key_id]
-            payload = jwt.decode(
-                token,
-                public_key,
-                algorithms=["RS256"],
-            )
+            # Validate token, a cache miss is verified in the threadpool as the RS256 verification and a
+            # public key fetch would block the event loop
+            payload = verified_tokens.get(token)
+            if payload is None:
+                payload = await run_in_threadpool(verified_tokens.verify_uncached, token)
             # Check JWT claims
             # SKIP FOR NOW
             """
@@ -65,10 +177,14 @@ class AuthorizationHeaderMiddleware(BaseHTTPMiddleware):
                 return JSONResponse(content={"status:": "Invalid issuer."}, status_code=HTTP_401_UNAUTHORIZED)
             """
 
-            # Add JWT user_id and org_id (optional) to request state
+            # Add JWT user_id, org_id (optional) and org_role (optional) to request state
             request.state.actor = {"id": payload["sub"]}
             if payload.get("org_id", None):
                 request.state.actor["org_id"] = payload["org_id"]
+            if payload.get("org_role", None):
+                # Only a role from a verified token is trusted without checking Clerk
+                request.state.actor["org_role"] = payload["org_role"]
+                request.state.actor["org_role_verified"] = True
 
         except ExpiredSignatureError as e:
             logger.exception(e)
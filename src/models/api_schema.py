@@ -1,8 +1,9 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Annotated, List, Optional
 
-from fastapi.responses import JSONResponse
-from sqlmodel import SQLModel
+from fastapi.responses import JSONResponse, Response
+from pydantic import AfterValidator
+from sqlmodel import Field, SQLModel
 
 from src.models.base import (
     BaselineBase,
@@ -18,6 +19,7 @@ from src.models.base import (
     VariantRunBase,
 )
 from src.models.enums import BillingTierEnum, ReportingConfigurationEnum, RunStatusEnum
+from src.utils import decode_page_cursor
 
 
 class ContactFormRequest(SQLModel):
@@ -38,23 +40,46 @@ class InvalidPermissionsResponse(JSONResponse):
         super().__init__(content={"message": "You do not have permission to perform this action."}, status_code=403)
 
 
+class NotModifiedResponse(Response):
+    def __init__(self, etag: str):
+        super().__init__(status_code=304, headers={"ETag": etag})
+
+
+# Query parameter of an opaque cursor from a previous page's next_cursor, decoded into a PageCursor
+PageCursorQuery = Annotated[str, AfterValidator(decode_page_cursor)]
+
+
 class PaginationData(SQLModel):
-    def __init__(self, items_len: int, limit: int, page: int):
+    def __init__(self, items_len: int | None, limit: int, page: int | None, next_cursor: str | None = None):
+        self.next_cursor = next_cursor
+
+        if items_len is not None:
+            self.total_items = items_len
+            self.total_pages = items_len // limit + 1
+
+        # Pages read by cursor (no page) only link to the next one with its cursor, so clients keep seeking
+        if page is None:
+            return
         self.current_page = page
-        self.total_items = items_len
-        self.total_pages = items_len // limit + 1
 
-        if self.current_page < self.total_pages:
+        # Without a total (include_total=false) the next page is known from the extra row fetched for the cursor
+        if items_len is None:
+            has_next_page = next_cursor is not None
+        else:
+            has_next_page = self.current_page < self.total_pages
+
+        if has_next_page:
             self.next_page = f"?page={self.current_page + 1}&limit={limit}"
 
         if self.current_page > 1:
             self.previous_page = f"?page={self.current_page - 1}&limit={limit}"
 
-    current_page: int
-    total_pages: int
-    total_items: int
+    current_page: Optional[int] = None
+    total_pages: Optional[int] = None
+    total_items: Optional[int] = None
     next_page: Optional[str] = None
     previous_page: Optional[str] = None
+    next_cursor: Optional[str] = None
 
 
 """---------- BOT ----------"""
@@ -192,6 +217,8 @@ class VariantUpdateRequest(SQLModel):
 
 class VariantReadResponse(VariantBase, TimestampModelBase):
     id: str
+    # Left out of lists with include_blobs=false
+    replay_json: Optional[dict] = None
 
 
 class ListVariantReadResponse(SQLModel):
@@ -208,6 +235,8 @@ class EvaluationCreateRequest(EvaluationBase):
 
 class EvaluationReadResponse(EvaluationBase, TimestampModelBase):
     id: str
+    # Left out of lists with include_blobs=false
+    html_blob: Optional[str] = None
     conversation_json: Optional[dict] = None
     status: RunStatusEnum
     status_info: Optional[str] = None
@@ -216,6 +245,14 @@ class EvaluationReadResponse(EvaluationBase, TimestampModelBase):
     completed_at: Optional[datetime] = None
 
 
+class EvaluationBatchCreateRequest(SQLModel):
+    evaluations: List[EvaluationCreateRequest] = Field(min_length=1, max_length=5000)
+
+
+class EvaluationBatchReadResponse(SQLModel):
+    data: List[EvaluationReadResponse]
+
+
 """---------- VARIANT RUN ----------"""
 
 
@@ -261,7 +298,8 @@ class ListTestRunReadResponse(SQLModel):
 
 
 class SuiteRunCreateRequest(SuiteRunBase):
-    pass
+    # Also create the test runs and variant runs of the suite's enabled tests
+    materialize_runs: bool = False
 
 
 class ShortenedTestRunReadResponse(TestRunReadResponse):
@@ -299,6 +337,8 @@ class BaselineUpdateRequest(SQLModel):
 class BaselineReadResponse(BaselineBase, TimestampModelBase):
     id: str
     name: str
+    # Left out of lists with include_blobs=false
+    html_blob: Optional[str] = None
 
 
 class ListBaselineReadResponse(SQLModel):
@@ -13,6 +13,16 @@ class TimestampModelBase(SQLModel):
     last_updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class RunCountersModelBase(SQLModel):
+    # Aggregates of the completed child runs, incremented atomically as each child finishes
+    completed_count: int = Field(default=0)
+    pass_count: int = Field(default=0)
+    fail_count: int = Field(default=0)
+    error_count: int = Field(default=0)
+    pass_rate_sum: float = Field(default=0)
+    replayed_elapsed_seconds_sum: float = Field(default=0)
+
+
 class BotBase(SQLModel):
     name: str
     organization_id: Optional[str] = None
@@ -1,13 +1,16 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlmodel import JSON, Column, Field, Relationship
+from sqlalchemy import Index
+from sqlalchemy.orm import declared_attr, deferred
+from sqlmodel import JSON, Column, Field, Relationship, SQLModel
 
 from src.models.base import (
     BaselineBase,
     BotBase,
     EnvironmentBase,
     EvaluationBase,
+    RunCountersModelBase,
     SuiteBase,
     SuiteRunBase,
     TestBase,
@@ -16,12 +19,33 @@ from src.models.base import (
     VariantBase,
     VariantRunBase,
 )
-from src.models.enums import ReportingConfigurationEnum, RunStatusEnum
+from src.models.enums import (
+    JobStatusEnum,
+    JobTypeEnum,
+    ReportingConfigurationEnum,
+    RunStatusEnum,
+)
 from src.utils import generate_id, get_default_success_criteria
 
+# Large columns are deferred in this group, so they're only loaded when accessed or with undefer_group(BLOBS)
+BLOBS = "blobs"
+
+
+def deferred_blobs(*names: str):
+    # __mapper_args__ deferring the named columns, which only exist once the table is built
+    @declared_attr
+    def __mapper_args__(cls):
+        return {"properties": {name: deferred(cls.__table__.c[name], group=BLOBS) for name in names}}
+
+    return __mapper_args__
+
 
 class Bot(BotBase, TimestampModelBase, table=True):
     __tablename__ = "bot"
+    __table_args__ = (
+        Index("ix_bot_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_bot_organization_id_created_at_id", "organization_id", "created_at", "id"),
+    )
     id: str = Field(primary_key=True, default_factory=generate_id("bot"))
 
     query_selector: Optional[str] = None
@@ -32,6 +56,9 @@ class Bot(BotBase, TimestampModelBase, table=True):
 
 class Environment(EnvironmentBase, TimestampModelBase, table=True):
     __tablename__ = "environment"
+    __table_args__ = (
+        Index("ix_environment_bot_id_created_at_id", "bot_id", "created_at", "id"),
+    )
     id: str = Field(primary_key=True, default_factory=generate_id("env"))
 
     bot: Bot = Relationship(back_populates="environments")
@@ -45,6 +72,9 @@ class Environment(EnvironmentBase, TimestampModelBase, table=True):
 
 class Suite(SuiteBase, TimestampModelBase, table=True):
     __tablename__ = "suite"
+    __table_args__ = (
+        Index("ix_suite_bot_id_created_at_id", "bot_id", "created_at", "id"),
+    )
     id: str = Field(primary_key=True, default_factory=generate_id("swt"))
 
     default_success_criteria: str = Field(default=get_default_success_criteria())
@@ -60,8 +90,13 @@ class Suite(SuiteBase, TimestampModelBase, table=True):
     tests: List["Test"] = Relationship(back_populates="suite", sa_relationship_kwargs={"cascade": "delete"})
 
 
-class SuiteRun(SuiteRunBase, TimestampModelBase, table=True):
+class SuiteRun(SuiteRunBase, TimestampModelBase, RunCountersModelBase, table=True):
     __tablename__ = "suite_run"
+    __table_args__ = (
+        Index("ix_suite_run_suite_id_created_at_id", "suite_id", "created_at", "id"),
+        Index("ix_suite_run_suite_id_environment_id_created_at_id", "suite_id", "environment_id", "created_at", "id"),
+        Index("ix_suite_run_environment_id_created_at_id", "environment_id", "created_at", "id"),
+    )
     id: str = Field(primary_key=True, default_factory=generate_id("srn"))
 
     status: RunStatusEnum
@@ -73,10 +108,14 @@ class SuiteRun(SuiteRunBase, TimestampModelBase, table=True):
     suite: Suite = Relationship(back_populates="suite_runs")
     environment: Environment = Relationship(back_populates="suite_runs")
     test_runs: List["TestRun"] = Relationship(back_populates="suite_run")
+    stats: Optional["SuiteRunStats"] = Relationship(sa_relationship_kwargs={"cascade": "delete", "uselist": False})
 
 
 class Test(TestBase, TimestampModelBase, table=True):
     __tablename__ = "test"
+    __table_args__ = (
+        Index("ix_test_suite_id_created_at_id", "suite_id", "created_at", "id"),
+    )
     id: str = Field(primary_key=True, default_factory=generate_id("tst"))
 
     success_criteria: str
@@ -94,8 +133,14 @@ class Test(TestBase, TimestampModelBase, table=True):
     variants: List["Variant"] = Relationship(back_populates="test", sa_relationship_kwargs={"cascade": "delete"})
 
 
-class TestRun(TestRunBase, TimestampModelBase, table=True):
+class TestRun(TestRunBase, TimestampModelBase, RunCountersModelBase, table=True):
     __tablename__ = "test_run"
+    __table_args__ = (
+        Index("ix_test_run_test_id_created_at_id", "test_id", "created_at", "id"),
+        Index("ix_test_run_test_id_environment_id_created_at_id", "test_id", "environment_id", "created_at", "id"),
+        Index("ix_test_run_environment_id_created_at_id", "environment_id", "created_at", "id"),
+        Index("ix_test_run_suite_run_id_created_at_id", "suite_run_id", "created_at", "id"),
+    )
     id: str = Field(primary_key=True, default_factory=generate_id("trn"))
     status: RunStatusEnum
     status_info: Optional[str] = None
@@ -113,6 +158,10 @@ class TestRun(TestRunBase, TimestampModelBase, table=True):
 
 class Baseline(BaselineBase, TimestampModelBase, table=True):
     __tablename__ = "baseline"
+    __table_args__ = (
+        Index("ix_baseline_test_id_created_at_id", "test_id", "created_at", "id"),
+    )
+    __mapper_args__ = deferred_blobs("html_blob", "conversation_json")
     id: str = Field(primary_key=True, default_factory=generate_id("bln"))
 
     conversation_json: Optional[dict] = Field(default=None, sa_column=Column(JSON, nullable=True))
@@ -122,6 +171,10 @@ class Baseline(BaselineBase, TimestampModelBase, table=True):
 
 class Variant(VariantBase, TimestampModelBase, table=True):
     __tablename__ = "variant"
+    __table_args__ = (
+        Index("ix_variant_test_id_created_at_id", "test_id", "created_at", "id"),
+    )
+    __mapper_args__ = deferred_blobs("replay_json")
 
     id: str = Field(primary_key=True, default_factory=generate_id("var"))
 
@@ -131,8 +184,11 @@ class Variant(VariantBase, TimestampModelBase, table=True):
     )
 
 
-class VariantRun(VariantRunBase, TimestampModelBase, table=True):
+class VariantRun(VariantRunBase, TimestampModelBase, RunCountersModelBase, table=True):
     __tablename__ = "variant_run"
+    __table_args__ = (
+        Index("ix_variant_run_test_run_id", "test_run_id"),
+    )
 
     id: str = Field(primary_key=True, default_factory=generate_id("vrn"))
 
@@ -151,6 +207,10 @@ class VariantRun(VariantRunBase, TimestampModelBase, table=True):
 
 class Evaluation(EvaluationBase, TimestampModelBase, table=True):
     __tablename__ = "evaluation"
+    __table_args__ = (
+        Index("ix_evaluation_variant_run_id", "variant_run_id"),
+    )
+    __mapper_args__ = deferred_blobs("html_blob", "conversation_json")
 
     id: str = Field(primary_key=True, default_factory=generate_id("evl"))
     conversation_json: Optional[dict] = Field(default=None, sa_column=Column(JSON, nullable=True))
@@ -161,3 +221,43 @@ class Evaluation(EvaluationBase, TimestampModelBase, table=True):
     completed_at: Optional[datetime] = None
 
     variant_run: VariantRun = Relationship(back_populates="evaluations")
+
+
+class Job(SQLModel, table=True):
+    __tablename__ = "job"
+    __table_args__ = (
+        Index("ix_job_status_available_at", "status", "available_at"),
+        Index("ix_job_target_id", "target_id"),
+    )
+
+    id: str = Field(primary_key=True, default_factory=generate_id("job"))
+    job_type: JobTypeEnum
+    target_id: str
+
+    status: JobStatusEnum = Field(default=JobStatusEnum.QUEUED)
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = None
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    available_at: datetime = Field(default_factory=datetime.utcnow)
+    locked_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+
+class SuiteRunStats(SQLModel, table=True):
+    # Aggregates of a completed suite run read by the analytics, so they aren't recomputed on every request
+    __tablename__ = "suite_run_stats"
+
+    suite_run_id: str = Field(primary_key=True, foreign_key="suite_run.id")
+
+    # Keyed by status, e.g. {"Pass": 3, "Fail": 1}
+    test_run_status_counts: dict = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))
+    evaluation_status_counts: dict = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))
+    evaluation_count: int = Field(default=0)
+
+    # [min, q1, median, q3, max] of the evaluation runtimes, excluding the outliers
+    runtime_boxplot: Optional[list] = Field(default=None, sa_column=Column(JSON, nullable=True))
+    runtime_outliers: list = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    evaluation_runtimes: list = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
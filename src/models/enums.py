@@ -25,3 +25,16 @@ class ReportingConfigurationEnum(str, Enum):
     MRSE = "most_recent_same_environment"
     MRDE = "most_recent_different_environment"
     SSR = "specific_suite_run"
+
+
+class JobTypeEnum(str, Enum):
+    EVALUATE_CONVERSATION = "evaluate_conversation"
+    POPULATE_CONVERSATION_JSON = "populate_conversation_json"
+
+
+class JobStatusEnum(str, Enum):
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    COMPLETED = "Completed"
+    FAILED = "Failed"
+    CANCELLED = "Cancelled"
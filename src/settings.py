@@ -14,6 +14,60 @@ class Settings(BaseSettings):
     openai_api_key: str = os.environ.get("OPENAI_API_KEY")
     slack_token: str = os.environ.get("SLACK_TOKEN")
 
+    # Database connection pool profile: "server" for a long running uvicorn process, "lambda" for a single
+    # warm connection per Lambda container, or "rds_proxy" to leave the pooling to RDS Proxy
+    db_pool_profile: str = os.environ.get(
+        "DB_POOL_PROFILE", "lambda" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else "server"
+    )
+    db_pool_size: int = int(os.environ.get("DB_POOL_SIZE", 10))
+    db_max_overflow: int = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+    db_pool_timeout_seconds: float = float(os.environ.get("DB_POOL_TIMEOUT_SECONDS", 30))
+    db_pool_recycle_seconds: int = int(os.environ.get("DB_POOL_RECYCLE_SECONDS", 1800))
+    db_pool_pre_ping: bool = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+    # Not sent with the rds_proxy profile, set it with the proxy's init query (SET statement_timeout = ...)
+    db_statement_timeout_ms: int = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 30000))
+
+    # Routes are sync and run in the server threadpool, its size bounds the requests handled concurrently
+    threadpool_size: int = int(os.environ.get("THREADPOOL_SIZE", 40))
+
+    # Timeout for outbound HTTP calls, so a slow dependency can't hold a worker thread indefinitely
+    http_timeout_seconds: float = float(os.environ.get("HTTP_TIMEOUT_SECONDS", 10))
+
+    # JWKS public keys used to verify session tokens
+    jwks_cache_ttl_seconds: float = float(os.environ.get("JWKS_CACHE_TTL_SECONDS", 3600))
+    jwks_min_refresh_interval_seconds: float = float(os.environ.get("JWKS_MIN_REFRESH_INTERVAL_SECONDS", 30))
+
+    # Claims of verified session tokens, reused until the token expires
+    verified_token_cache_size: int = int(os.environ.get("VERIFIED_TOKEN_CACHE_SIZE", 4096))
+    verified_token_cache_max_ttl_seconds: float = float(os.environ.get("VERIFIED_TOKEN_CACHE_MAX_TTL_SECONDS", 300))
+
+    # Authorize with the org_role claim of the session token when present instead of calling Clerk
+    use_org_role_claim: bool = os.environ.get("USE_ORG_ROLE_CLAIM", "true").lower() == "true"
+
+    # Clerk organization membership cache, role changes take up to the TTL to apply
+    clerk_membership_cache_size: int = int(os.environ.get("CLERK_MEMBERSHIP_CACHE_SIZE", 1024))
+    clerk_membership_cache_ttl_seconds: float = float(os.environ.get("CLERK_MEMBERSHIP_CACHE_TTL_SECONDS", 60))
+    clerk_membership_negative_cache_ttl_seconds: float = float(
+        os.environ.get("CLERK_MEMBERSHIP_NEGATIVE_CACHE_TTL_SECONDS", 5)
+    )
+
+    # Analytics responses of finished suite runs
+    analytics_cache_size: int = int(os.environ.get("ANALYTICS_CACHE_SIZE", 256))
+    analytics_cache_ttl_seconds: float = float(os.environ.get("ANALYTICS_CACHE_TTL_SECONDS", 3600))
+
+    # Suite run event streams poll the database for progress made by the worker, backing off while nothing changes
+    # Streams of the same suite run in a process share each poll
+    run_events_poll_interval_seconds: float = float(os.environ.get("RUN_EVENTS_POLL_INTERVAL_SECONDS", 2))
+    run_events_max_poll_interval_seconds: float = float(os.environ.get("RUN_EVENTS_MAX_POLL_INTERVAL_SECONDS", 10))
+    run_events_progress_cache_size: int = int(os.environ.get("RUN_EVENTS_PROGRESS_CACHE_SIZE", 1024))
+    run_events_keepalive_seconds: float = float(os.environ.get("RUN_EVENTS_KEEPALIVE_SECONDS", 15))
+
+    # Evaluation job queue and worker
+    worker_concurrency: int = int(os.environ.get("WORKER_CONCURRENCY", 4))
+    job_poll_interval_seconds: float = float(os.environ.get("JOB_POLL_INTERVAL_SECONDS", 1))
+    job_max_attempts: int = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+    job_visibility_timeout_seconds: int = int(os.environ.get("JOB_VISIBILITY_TIMEOUT_SECONDS", 900))
+
     valid_origins: list = [
         "http://localhost:3000",
         "http://localhost",
@@ -1,13 +1,28 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from hashlib import sha256
+from typing import NamedTuple
+
+import httpx
 from fastapi import Request
 from nanoid import generate as nanoid_generate
 
+from src.settings import settings
+
 NANOID_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
 
+# Shared across requests so outbound calls (Clerk, JWKS) reuse pooled keep-alive connections
+# instead of paying a TCP and TLS handshake each time
+http_client = httpx.Client(timeout=settings.http_timeout_seconds)
+
 
 def generate_id(prefix: str):
     def generate_id_wrapper():
         return prefix + "_" + nanoid_generate(alphabet=NANOID_ALPHABET, size=32 - len(prefix))
 
+    # Lets ids also be generated in SQL (see src/core/copy.py)
+    generate_id_wrapper.prefix = prefix
     return generate_id_wrapper
 
 
@@ -15,6 +30,40 @@ def get_actor(request: Request):
     return request.state.actor if hasattr(request.state, "actor") else {"id": "unknown"}
 
 
+def get_weak_etag(*version):
+    # Weak since it is derived from the version of the resource rather than the exact response bytes
+    return f'W/"{sha256(repr(version).encode()).hexdigest()[:32]}"'
+
+
+def etag_matches(etag: str | None, if_none_match: str | None):
+    if not etag or not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    # Weak comparison ignores the W/ prefix
+    return etag.removeprefix("W/") in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+class PageCursor(NamedTuple):
+    # The sort key of the last row of a page, the next page starts after it
+    created_at: datetime
+    id: str
+
+
+def encode_page_cursor(created_at: datetime, id: str):
+    return urlsafe_b64encode(json.dumps([created_at.isoformat(), id]).encode()).decode()
+
+
+def decode_page_cursor(cursor: str):
+    try:
+        created_at, id = json.loads(urlsafe_b64decode(cursor.encode()))
+        return PageCursor(datetime.fromisoformat(created_at), id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor.")
+
+
 def get_default_success_criteria():
     return (
         "Evaluate whether the REPLAYED response to each question matches the BASELINE"
@@ -0,0 +1,70 @@
+import argparse
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+from src.core.baselines import populate_conversation_json
+from src.core.evaluations import evaluate_conversation
+from src.core.jobs import claim_job, complete_job, fail_job
+from src.models.enums import JobTypeEnum
+from src.settings import logger, settings
+
+JOB_HANDLERS = {
+    JobTypeEnum.EVALUATE_CONVERSATION: evaluate_conversation,
+    JobTypeEnum.POPULATE_CONVERSATION_JSON: populate_conversation_json,
+}
+
+
+def run_next_job():
+    # Claim and run a single job, returns False when the queue is empty
+    job = claim_job()
+    if not job:
+        return False
+
+    logger.info(f"Running job={job.id} type={job.job_type} target={job.target_id} attempt={job.attempts}")
+    try:
+        JOB_HANDLERS[job.job_type](job.target_id)
+    except Exception as e:
+        logger.exception(e)
+        fail_job(job.id, str(e))
+    else:
+        complete_job(job.id)
+
+    return True
+
+
+def work(stop_event: Event, poll_interval_seconds: float):
+    while not stop_event.is_set():
+        try:
+            if run_next_job():
+                continue
+        except Exception as e:
+            # Never let a database hiccup kill the worker thread
+            logger.exception(e)
+
+        stop_event.wait(poll_interval_seconds)
+
+
+def run_worker(concurrency: int, poll_interval_seconds: float):
+    stop_event = Event()
+
+    def stop(signum, frame):
+        logger.info("Stopping worker after in-flight jobs finish")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    logger.info(f"Starting worker with concurrency={concurrency}")
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(work, stop_event, poll_interval_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run evaluation jobs from the job queue.")
+    parser.add_argument("--concurrency", type=int, default=settings.worker_concurrency)
+    parser.add_argument("--poll-interval", type=float, default=settings.job_poll_interval_seconds)
+    args = parser.parse_args()
+
+    run_worker(args.concurrency, args.poll_interval)
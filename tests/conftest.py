@@ -3,9 +3,14 @@ from fastapi.testclient import TestClient
 from unittest.mock import patch
 from src.middleware import AuthorizationHeaderMiddleware
 from src.core.utils import _generic_has_permissions
+from src.worker import run_next_job
 import pytest
 
 
+# Kept for the tests of the middleware itself
+real_dispatch = AuthorizationHeaderMiddleware.dispatch
+
+
 async def mocked_dispatch(self, request, call_next):
     return await call_next(request)
 
@@ -25,3 +30,9 @@ def mock_has_permissions():
 
 app = create_app()
 client = TestClient(app)
+
+
+def run_queued_jobs():
+    # Stand in for the worker process by draining the job queue
+    while run_next_job():
+        pass
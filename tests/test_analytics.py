@@ -0,0 +1,244 @@
+from tests.conftest import client
+from datetime import datetime
+from sqlmodel import Session
+from src.db import engine
+from src.models.db_schema import (
+    Baseline,
+    Bot,
+    Environment,
+    Evaluation,
+    Suite,
+    SuiteRun,
+    Variant,
+    VariantRun,
+)
+from unittest.mock import patch
+from src.core.analytics import build_report_data
+from src.core.analytics_cache import invalidate_suite_analytics
+from src.core.suite_run_stats import backfill_suite_run_stats, save_suite_run_stats
+from src.models import db_schema
+from src.models.enums import RunStatusEnum
+
+# (test name, variant count, iteration count, baseline count)
+TESTS = [("Greeting", 2, 2, 1), ("Refund", 1, 3, 2), ("Handoff", 2, 1, 0)]
+
+# runtimes of each test's evaluations, the statuses cycle through pass and fail
+COMPARISON_RUNTIMES = {
+    "Greeting": [1.0, 1.2, 1.1, 1.3],
+    "Refund": [2.0, 2.2, 2.1],
+    "Handoff": [0.5, 40.0],
+}
+SUITE_RUN_RUNTIMES = {
+    "Greeting": [1.0, 1.1, 1.2, 1.1],
+    "Refund": [3.0, 3.3, 3.6],
+    "Handoff": [0.4, 41.0],
+}
+
+
+def create_suite_run(db_session: Session, suite: Suite, environment: Environment, runtimes: dict, created_at):
+    suite_run = SuiteRun(
+        suite_id=suite.id,
+        environment_id=environment.id,
+        initiation_type="Manual",
+        status=RunStatusEnum.RUNNING,
+        created_by="unknown",
+        created_at=created_at,
+    )
+    db_session.add(suite_run)
+
+    suite_passes = 0
+    suite_evaluations = 0
+    for test in suite.tests:
+        test_runtimes = list(runtimes[test.name])
+        statuses = [RunStatusEnum.PASS, RunStatusEnum.FAIL] * len(test_runtimes)
+        passes = 0
+
+        test_run = db_schema.TestRun(
+            test_id=test.id,
+            environment_id=environment.id,
+            suite_run_id=suite_run.id,
+            initiation_type="Manual",
+            status=RunStatusEnum.RUNNING,
+            created_by="unknown",
+        )
+        db_session.add(test_run)
+
+        for variant in test.variants:
+            variant_run = VariantRun(
+                test_run_id=test_run.id,
+                variant_id=variant.id,
+                initiation_type="Manual",
+                status=RunStatusEnum.MIXED,
+                created_by="unknown",
+            )
+            db_session.add(variant_run)
+
+            for _ in range(test.iteration_count):
+                status = statuses.pop(0)
+                passes += status == RunStatusEnum.PASS
+                db_session.add(
+                    Evaluation(
+                        variant_run_id=variant_run.id,
+                        html_blob="<></>",
+                        replayed_elapsed_seconds=test_runtimes.pop(0),
+                        initiation_type="Manual",
+                        status=status,
+                        created_by="unknown",
+                    )
+                )
+
+        evaluation_count = len(runtimes[test.name])
+        test_run.pass_rate = passes / evaluation_count
+        test_run.status = RunStatusEnum.PASS if passes == evaluation_count else RunStatusEnum.MIXED
+        test_run.status_info = None if passes == evaluation_count else "Some conversations failed"
+        test_run.average_replayed_elapsed_seconds = sum(runtimes[test.name]) / evaluation_count
+        suite_passes += passes
+        suite_evaluations += evaluation_count
+
+    suite_run.status = RunStatusEnum.MIXED
+    suite_run.pass_rate = suite_passes / suite_evaluations
+    db_session.commit()
+
+    return suite_run.id
+
+
+def create_analytics_data():
+    with Session(engine) as db_session:
+        bot = Bot(name="Analytics Bot", user_id="unknown", created_by="unknown")
+        environment = Environment(name="Analytics Env", url="http://localhost", bot_id=bot.id, created_by="unknown")
+        suite = Suite(name="Analytics Suite", bot_id=bot.id, created_by="unknown")
+        db_session.add_all([bot, environment, suite])
+
+        for name, variant_count, iteration_count, baseline_count in TESTS:
+            test = db_schema.Test(
+                name=name,
+                suite_id=suite.id,
+                success_criteria="criteria",
+                variant_count=variant_count,
+                iteration_count=iteration_count,
+                created_by="unknown",
+            )
+            db_session.add(test)
+            for i in range(variant_count):
+                db_session.add(Variant(test_id=test.id, replay_json={}, created_by="unknown"))
+            for i in range(baseline_count):
+                db_session.add(Baseline(test_id=test.id, name=f"Baseline {i}", html_blob="<></>", created_by="unknown"))
+        db_session.commit()
+
+        comparison_run_id = create_suite_run(
+            db_session, suite, environment, COMPARISON_RUNTIMES, datetime(2024, 1, 1, 12, 0, 0)
+        )
+        suite_run_id = create_suite_run(
+            db_session, suite, environment, SUITE_RUN_RUNTIMES, datetime(2024, 1, 2, 12, 0, 0)
+        )
+
+        return suite.id, environment.id, comparison_run_id, suite_run_id
+
+
+def test_analytics():
+    SWT_ID, ENV_ID, COMPARISON_SRN_ID, SRN_ID = create_analytics_data()
+
+    # Computed from the runs while the suite runs have no saved stats, then read from the saved stats
+    check_analytics(SWT_ID, ENV_ID, COMPARISON_SRN_ID, SRN_ID)
+
+    assert backfill_suite_run_stats(100) >= 2
+    with Session(engine) as db_session:
+        stats = db_session.get(db_schema.SuiteRunStats, SRN_ID)
+        assert stats.evaluation_count == 9
+        assert stats.evaluation_status_counts == {"Pass": 5, "Fail": 4}
+        assert stats.test_run_status_counts == {"Mixed": 3}
+    invalidate_suite_analytics(SWT_ID)
+    check_analytics(SWT_ID, ENV_ID, COMPARISON_SRN_ID, SRN_ID)
+
+
+def check_analytics(SWT_ID, ENV_ID, COMPARISON_SRN_ID, SRN_ID):
+    # Report
+    response = client.get(f"/v1/analytics/report?suite_run_id={SRN_ID}")
+    assert response.status_code == 200
+    report = response.json()
+    assert report["comparison_run_id"] == COMPARISON_SRN_ID
+
+    tests = {test["test_name"]: test for test in report["tests"]}
+    assert tests["Greeting"]["baseline_count"] == 1
+    assert tests["Greeting"]["evaluation_count"] == 4
+    assert tests["Refund"]["baseline_count"] == 2
+    assert tests["Refund"]["evaluation_count"] == 3
+    assert tests["Handoff"]["baseline_count"] == 0
+
+    overview = report["overview"]
+    assert overview["total_test_count"] == 3
+    assert overview["total_variant_count"] == 5
+    assert overview["total_evaluation_count"] == 9
+    assert overview["evaluation_status_counts"] == [0, 5, 0, 4, 0, 0, 0]
+    assert overview["comparison_evaluation_status_counts"] == [0, 5, 0, 4, 0, 0, 0]
+    assert overview["test_status_counts"] == [0, 0, 3, 0, 0, 0, 0]
+
+    assert len(report["failures"]["test_failures"]) == 3
+
+    # Refund got >10% slower
+    performances = report["performance"]["test_performances"]
+    assert [test["test_name"] for test in performances] == ["Refund"]
+    assert performances[0]["min_run_time"] == 3.0
+    assert performances[0]["max_run_time"] == 3.6
+    assert report["performance"]["average_run_time"] == sum(sum(r) for r in SUITE_RUN_RUNTIMES.values()) / 9
+
+    # Trending success, most recent suite run first
+    response = client.get(f"/v1/analytics/trending/success?suite_id={SWT_ID}&environment_id={ENV_ID}")
+    assert response.status_code == 200
+    success = response.json()
+    assert success["suite_run_ids"] == [SRN_ID, COMPARISON_SRN_ID]
+    assert success["evaluations_performed"] == [9, 9]
+    assert success["evaluation_pass_rates"] == [500 / 9, 500 / 9]
+    statuses = {status["name"]: status["data"] for status in success["test_statuses"]}
+    assert statuses["Mixed"][:2] == [3, 3]
+    assert statuses["Pass"][:2] == [0, 0]
+
+    # Trending performance
+    response = client.get(f"/v1/analytics/trending/performance?suite_id={SWT_ID}&environment_id={ENV_ID}")
+    assert response.status_code == 200
+    boxes = response.json()["boxes"]
+    assert [box["suite_run_id"] for box in boxes] == [SRN_ID, COMPARISON_SRN_ID]
+    assert boxes[0]["values"] == [0.4, 1.05, 1.2, 3.45, 3.6]
+    assert boxes[0]["outliers"] == [41.0]
+
+
+def test_analytics_cache():
+    SWT_ID, ENV_ID, COMPARISON_SRN_ID, SRN_ID = create_analytics_data()
+
+    with patch("src.core.analytics.build_report_data", wraps=build_report_data) as build_mock:
+        # Reopening the report of finished suite runs is served from the cache
+        first_response = client.get(f"/v1/analytics/report?suite_run_id={SRN_ID}")
+        second_response = client.get(f"/v1/analytics/report?suite_run_id={SRN_ID}")
+        assert second_response.json() == first_response.json()
+        assert build_mock.call_count == 1
+
+        # Updating the suite invalidates it
+        client.patch(f"/v1/suites/{SWT_ID}", json={"name": "Renamed Suite"})
+        response = client.get(f"/v1/analytics/report?suite_run_id={SRN_ID}")
+        assert response.json()["suite_name"] == "Renamed Suite"
+        assert build_mock.call_count == 2
+
+        # Adding a baseline changes the report and its ETag
+        report_etag = response.headers["ETag"]
+        TST_ID = {test["name"]: test["id"] for test in client.get(f"/v1/suites/{SWT_ID}/tests").json()["data"]}["Handoff"]
+        response = client.post("/v1/baselines", json={"test_id": TST_ID, "name": "Baseline", "html_blob": "<></>"})
+        BSL_ID = response.json()["id"]
+        response = client.get(f"/v1/analytics/report?suite_run_id={SRN_ID}", headers={"If-None-Match": report_etag})
+        assert response.status_code == 200
+        assert {test["test_name"]: test for test in response.json()["tests"]}["Handoff"]["baseline_count"] == 1
+
+        # And so does deleting it
+        client.delete(f"/v1/baselines/{BSL_ID}")
+        response = client.get(f"/v1/analytics/report?suite_run_id={SRN_ID}")
+        assert {test["test_name"]: test for test in response.json()["tests"]}["Handoff"]["baseline_count"] == 0
+
+    # A suite run completed by the worker changes the trending charts without invalidating this process's cache
+    response = client.get(f"/v1/analytics/trending/success?suite_id={SWT_ID}&environment_id={ENV_ID}")
+    assert response.json()["evaluations_performed"][0] == 9
+    with Session(engine) as db_session:
+        save_suite_run_stats(SRN_ID, db_session)
+        db_session.get(db_schema.SuiteRunStats, SRN_ID).evaluation_count = 10
+        db_session.get(SuiteRun, SRN_ID).completed_at = datetime(2024, 1, 2, 13, 0, 0)
+        db_session.commit()
+    response = client.get(f"/v1/analytics/trending/success?suite_id={SWT_ID}&environment_id={ENV_ID}")
+    assert response.json()["evaluations_performed"][0] == 10
@@ -0,0 +1,48 @@
+from threading import Event, Thread
+from unittest.mock import patch
+from src.cache import TTLCache
+
+
+def test_ttl_cache():
+    cache = TTLCache(max_size=2, ttl_seconds=10)
+
+    # Least recently used entry is evicted
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1}
+
+    # Entries expire after their TTL
+    with patch("src.cache.monotonic", return_value=10**9):
+        assert cache.get("a") is None
+
+    # Per-value TTLs, e.g. for negative results
+    cache.get_or_load("d", lambda: None, lambda value: 0 if value is None else None)
+    assert cache.get("d", "missing") == "missing"
+
+
+def test_ttl_cache_single_flight():
+    cache = TTLCache(max_size=10, ttl_seconds=10)
+    release = Event()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        release.wait(5)
+        return "value"
+
+    results = []
+    threads = [Thread(target=lambda: results.append(cache.get_or_load("key", loader))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    # Concurrent misses share a single load
+    assert results == ["value"] * 5
+    assert len(loads) == 1
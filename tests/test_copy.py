@@ -1,8 +1,12 @@
 from tests.conftest import client
 from random import choice
+from unittest.mock import patch
+from src.core import copy
+import pytest
 
 
-def test_copy_suite():
+@pytest.mark.parametrize("in_db", [False, True])
+def test_copy_suite(in_db):
     # Create bot
     response = client.post("/v1/bots", json={"name": "My Bot", "user_id": "unknown"})
     assert response.status_code == 200
@@ -54,19 +58,47 @@ def test_copy_suite():
     assert response.status_code == 200
 
     # Copy suite
-    response = client.post(f"/v1/suites/{SWT_ID}/copy")
+    response = client.post(f"/v1/suites/{SWT_ID}/copy?in_db={in_db}")
     assert response.json()["name"] == "My Suite (Copy)"
     assert response.json()["reporting_comparison_configuration"] == "specific_suite_run"
     assert response.json()["reporting_comparison_suite_run_id"] == "original"
 
     NEW_SWT_ID = response.json()["id"]
 
-    # Check new suite has 3 tests
+    # Check new suite has 3 tests, listed in the same order as the copied ones
     response = client.get(f"/v1/suites/{NEW_SWT_ID}/tests")
     assert len(response.json()["data"]) == 3
-
-
-def test_copy_bot():
+    assert [test["name"] for test in response.json()["data"]] == ["Test 2", "Test 1", "Test 0"]
+
+    # Check each new test has copies of the variant and baseline
+    for test in response.json()["data"]:
+        assert test["id"].startswith("tst_") and len(test["id"]) == 33
+        variants = client.get(f"/v1/tests/{test['id']}/variants").json()["data"]
+        assert [variant["replay_json"] for variant in variants] == [{"0": {"action": "foo"}, "1": {"action": "bar"}}]
+        baselines = client.get(f"/v1/tests/{test['id']}/baselines").json()["data"]
+        assert [baseline["html_blob"] for baseline in baselines] == ["html"]
+        assert baselines[0]["id"].startswith("bln_") and len(baselines[0]["id"]) == 33
+
+    # A copy that fails part way leaves nothing behind
+    copy_function_name = "copy_rows_in_db" if in_db else "insert_rows"
+    copy_function = getattr(copy, copy_function_name)
+
+    def failing_copy_function(model, *args, **kwargs):
+        if model.__name__ == "Baseline":
+            raise Exception("Database unavailable")
+        return copy_function(model, *args, **kwargs)
+
+    with patch(f"src.core.copy.{copy_function_name}", side_effect=failing_copy_function):
+        try:
+            client.post(f"/v1/suites/{SWT_ID}/copy?in_db={in_db}")
+        except Exception:
+            pass
+    response = client.get(f"/v1/bots/{BOT_ID}/suites")
+    assert len(response.json()["data"]) == 2
+
+
+@pytest.mark.parametrize("in_db", [False, True])
+def test_copy_bot(in_db):
     # Create bot
     response = client.post("/v1/bots", json={"name": "My Bot", "user_id": "unknown"})
     assert response.status_code == 200
@@ -133,7 +165,7 @@ def test_copy_bot():
             assert response.status_code == 200
 
     # Copy bot
-    response = client.post(f"/v1/bots/{BOT_ID}/copy")
+    response = client.post(f"/v1/bots/{BOT_ID}/copy?in_db={in_db}")
     NEW_BOT_ID = response.json()["id"]
     assert response.json()["name"] == "My Bot (Copy)"
 
@@ -143,6 +175,10 @@ def test_copy_bot():
         assert suite["id"] not in old_suite_ids
         assert suite["reporting_comparison_suite_run_id"] not in old_suite_ids
 
+        # check the suites' tests were copied
+        response = client.get(f"/v1/suites/{suite['id']}/tests")
+        assert sorted(test["name"] for test in response.json()["data"]) == ["Test 0", "Test 1"]
+
     # check new envs were created
     response = client.get(f"/v1/bots/{NEW_BOT_ID}/environments")
     for env in response.json()["data"]:
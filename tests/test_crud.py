@@ -1,4 +1,6 @@
-from tests.conftest import client
+from tests.conftest import client, run_queued_jobs
+from sqlalchemy import event
+from src.db import engine
 
 
 def test_bot():
@@ -70,6 +72,33 @@ def test_environment():
         assert response.status_code == 200
     response = client.get(f"/v1/environments/{ENV_ID}/test_runs")
     assert len(response.json()["data"]) == 3
+    TRN_IDS = [test_run["id"] for test_run in response.json()["data"]]
+
+    # Page through test runs in environment with cursors
+    response = client.get(f"/v1/environments/{ENV_ID}/test_runs?limit=2")
+    assert [test_run["id"] for test_run in response.json()["data"]] == TRN_IDS[:2]
+    cursor = response.json()["pagination"]["next_cursor"]
+    response = client.get(f"/v1/environments/{ENV_ID}/test_runs?limit=2&cursor={cursor}")
+    assert [test_run["id"] for test_run in response.json()["data"]] == TRN_IDS[2:]
+    assert response.json()["pagination"] == {"total_items": 3, "total_pages": 2}
+
+    # Cursor pages only link to the next page by cursor
+    response = client.get(f"/v1/environments/{ENV_ID}/test_runs?limit=1")
+    cursor = response.json()["pagination"]["next_cursor"]
+    response = client.get(f"/v1/environments/{ENV_ID}/test_runs?limit=1&cursor={cursor}&include_total=false")
+    assert [test_run["id"] for test_run in response.json()["data"]] == TRN_IDS[1:2]
+    assert list(response.json()["pagination"]) == ["next_cursor"]
+
+    response = client.get(f"/v1/environments/{ENV_ID}/test_runs?cursor=invalid")
+    assert response.status_code == 422
+
+    # Totals are counted, or skipped with include_total=false
+    response = client.get(f"/v1/environments/{ENV_ID}/test_runs?limit=2")
+    assert response.json()["pagination"]["total_items"] == 3
+    assert response.json()["pagination"]["total_pages"] == 2
+    response = client.get(f"/v1/environments/{ENV_ID}/test_runs?limit=2&include_total=false")
+    assert "total_items" not in response.json()["pagination"]
+    assert response.json()["pagination"]["next_page"] == "?page=2&limit=2"
 
     # Get environment
     response = client.get(f"/v1/environments/{ENV_ID}")
@@ -229,6 +258,34 @@ def test_test():
     response = client.get(f"/v1/tests/{TST_ID}/baselines")
     assert len(response.json()["data"]) == 3
 
+    # Get tests in suite with their recent test runs, the most recent 11 runs per test
+    response = client.post("/v1/tests", json={"suite_id": SWT_ID, "name": "My Other Test"})
+    OTHER_TST_ID = response.json()["id"]
+    for i in range(10):
+        client.post("/v1/test_runs", json={"test_id": TST_ID, "environment_id": ENV_ID, "initiation_type": "Manual"})
+    client.post("/v1/test_runs", json={"test_id": OTHER_TST_ID, "environment_id": ENV_ID, "initiation_type": "Manual"})
+
+    statements = []
+
+    def record_statement(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        response = client.get(f"/v1/suites/{SWT_ID}/tests?environment_id={ENV_ID}")
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+    tests = {test["id"]: test for test in response.json()["data"]}
+    recent_test_runs = tests[TST_ID]["recent_test_runs"]
+    assert len(recent_test_runs) == 11
+    assert [test_run["created_at"] for test_run in recent_test_runs] == sorted(
+        [test_run["created_at"] for test_run in recent_test_runs], reverse=True
+    )
+    assert len(tests[OTHER_TST_ID]["recent_test_runs"]) == 1
+
+    # The suite and its bot, the page of tests, the total and the recent runs of every test on the page
+    assert len([statement for statement in statements if statement.lstrip().startswith("SELECT")]) == 5
+
     # Get test
     response = client.get(f"/v1/tests/{TST_ID}")
     assert len(response.json()) == 14
@@ -295,10 +352,21 @@ def test_baseline():
     assert len(response.json()) == 8
     BSL_ID = response.json()["id"]
 
+    # Parse conversation json
+    run_queued_jobs()
+
     # Get baseline
     response = client.get(f"/v1/baselines/{BSL_ID}")
     assert len(response.json()) == 9
 
+    # Get baselines in test, with and without their large columns
+    response = client.get(f"/v1/tests/{TST_ID}/baselines")
+    assert response.json()["data"][0]["html_blob"] == "<></>"
+    assert response.json()["data"][0]["conversation_json"]
+    response = client.get(f"/v1/tests/{TST_ID}/baselines?include_blobs=false")
+    assert len(response.json()["data"][0]) == 7
+    assert "html_blob" not in response.json()["data"][0]
+
     # Delete baseline
     response = client.delete(f"/v1/baselines/{BSL_ID}")
     assert response.json() == {"status": "OK"}
@@ -0,0 +1,96 @@
+from tests.conftest import client, run_queued_jobs
+from unittest.mock import patch
+from tests.test_analytics import create_analytics_data
+from src.utils import etag_matches
+
+
+def test_etag_matches():
+    assert etag_matches('W/"abc"', 'W/"abc"')
+    assert etag_matches('W/"abc"', '"xyz", "abc"')
+    assert etag_matches('W/"abc"', "*")
+    assert not etag_matches('W/"abc"', 'W/"xyz"')
+    assert not etag_matches('W/"abc"', None)
+    assert not etag_matches(None, "*")
+
+
+def test_conditional_get():
+    SWT_ID, ENV_ID, COMPARISON_SRN_ID, SRN_ID = create_analytics_data()
+
+    for url in [
+        f"/v1/suite_runs/{SRN_ID}",
+        f"/v1/analytics/report?suite_run_id={SRN_ID}",
+    ]:
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert etag.startswith('W/"')
+
+        # Unchanged resources are answered with an empty 304
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+
+    # Updating the test changes its ETag
+    response = client.get(f"/v1/suites/{SWT_ID}/tests")
+    TST_ID = response.json()["data"][0]["id"]
+    response = client.get(f"/v1/tests/{TST_ID}?environment_id={ENV_ID}")
+    etag = response.headers["ETag"]
+    assert client.get(f"/v1/tests/{TST_ID}?environment_id={ENV_ID}", headers={"If-None-Match": etag}).status_code == 304
+
+    report_etag = client.get(f"/v1/analytics/report?suite_run_id={SRN_ID}").headers["ETag"]
+
+    client.patch(f"/v1/tests/{TST_ID}", json={"name": "Renamed Test"})
+    response = client.get(f"/v1/tests/{TST_ID}?environment_id={ENV_ID}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["name"] == "Renamed Test"
+    assert response.headers["ETag"] != etag
+
+    # Renaming a test also changes the report
+    response = client.get(f"/v1/analytics/report?suite_run_id={SRN_ID}", headers={"If-None-Match": report_etag})
+    assert response.status_code == 200
+
+    # Missing resources have no ETag
+    response = client.get("/v1/suite_runs/missing", headers={"If-None-Match": "*"})
+    assert response.status_code == 404
+    assert "ETag" not in response.headers
+
+
+def test_suite_run_etag_changes_on_evaluation_error():
+    run_queued_jobs()
+
+    response = client.post("/v1/bots", json={"name": "ETag Bot", "user_id": "unknown"})
+    BOT_ID = response.json()["id"]
+    response = client.post("/v1/environments", json={"name": "ETag Env", "url": "http://localhost", "bot_id": BOT_ID})
+    ENV_ID = response.json()["id"]
+    response = client.post("/v1/suites", json={"name": "ETag Suite", "bot_id": BOT_ID})
+    SWT_ID = response.json()["id"]
+    response = client.post("/v1/tests", json={"suite_id": SWT_ID, "name": "ETag Test"})
+    TST_ID = response.json()["id"]
+    client.post("/v1/variants", json={"test_id": TST_ID, "replay_json": {"0": {"action": "foo"}}})
+    client.patch(f"/v1/tests/{TST_ID}", json={"iteration_count": 2})
+    client.post("/v1/baselines", json={"test_id": TST_ID, "name": "Baseline", "html_blob": "<></>"})
+    run_queued_jobs()
+
+    response = client.post(
+        "/v1/suite_runs",
+        json={"suite_id": SWT_ID, "environment_id": ENV_ID, "initiation_type": "Manual", "materialize_runs": True},
+    )
+    SRN_ID = response.json()["id"]
+    VRN_ID = response.json()["test_runs"][0]["variant_runs"][0]["id"]
+    response = client.post(
+        "/v1/evaluations",
+        json={"variant_run_id": VRN_ID, "html_blob": "<>", "replayed_elapsed_seconds": 1.0, "initiation_type": "Manual"},
+    )
+    EVL_ID = response.json()["id"]
+    etag = client.get(f"/v1/suite_runs/{SRN_ID}").headers["ETag"]
+
+    # The evaluation errors on an unexpected AI response, while the suite run keeps running
+    with patch("src.core.evaluations.evaluate_against_baseline", return_value={}):
+        run_queued_jobs()
+    assert client.get(f"/v1/evaluations/{EVL_ID}").json()["status"] == "Error"
+
+    response = client.get(f"/v1/suite_runs/{SRN_ID}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["status"] == "Running"
+    assert response.headers["ETag"] != etag
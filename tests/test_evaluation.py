@@ -1,7 +1,12 @@
-from tests.conftest import client
+from tests.conftest import client, run_queued_jobs
 from unittest.mock import patch
-from src.core.evaluations import evaluate_conversation
+from src.core.evaluations import evaluate_conversation, update_run_counters
 from random import choice
+from sqlmodel import Session, select, update
+from src.db import engine
+from src.models.db_schema import Job, SuiteRunStats
+from src.models import db_schema
+from src.models.enums import JobStatusEnum, JobTypeEnum
 
 
 def test_evaluation():
@@ -44,6 +49,9 @@ def test_evaluation():
         },
     )
 
+    # Parse baseline conversation json
+    run_queued_jobs()
+
     # Create a suite run
     response = client.post(
         "/v1/suite_runs",
@@ -143,3 +151,250 @@ def test_evaluation():
         response = client.get(f"/v1/suite_runs/{SRN_ID}")
 
         assert response.json()["status"] == expected
+        evaluation = response.json()["test_runs"][0]["variant_runs"][0]["evaluations"][0]
+        assert evaluation["html_blob"] == "<>"
+
+        # The evaluations' large columns can be left out of the run tree
+        response = client.get(f"/v1/suite_runs/{SRN_ID}?include_blobs=false")
+        assert response.json()["test_runs"][0]["variant_runs"][0]["evaluations"][0] == {
+            key: value for key, value in evaluation.items() if key not in ("html_blob", "conversation_json")
+        }
+
+        # Check that the suite run's stats were saved on completion
+        with Session(engine) as db_session:
+            assert db_session.get(SuiteRunStats, SRN_ID).evaluation_count == 5
+
+
+def test_evaluation_batch():
+    response = client.post("/v1/bots", json={"name": "Batch Bot", "user_id": "unknown"})
+    BOT_ID = response.json()["id"]
+    response = client.post("/v1/environments", json={"name": "Batch Env", "url": "http://localhost", "bot_id": BOT_ID})
+    ENV_ID = response.json()["id"]
+    response = client.post("/v1/suites", json={"name": "Batch Suite", "bot_id": BOT_ID})
+    SWT_ID = response.json()["id"]
+    response = client.post("/v1/tests", json={"suite_id": SWT_ID, "name": "Batch Test"})
+    TST_ID = response.json()["id"]
+    response = client.post(
+        "/v1/test_runs", json={"test_id": TST_ID, "environment_id": ENV_ID, "initiation_type": "Manual"}
+    )
+    TRN_ID = response.json()["id"]
+
+    VRN_IDS = []
+    for variant_id in ["variant_1", "variant_2"]:
+        response = client.post(
+            "/v1/variant_runs", json={"test_run_id": TRN_ID, "variant_id": variant_id, "initiation_type": "Manual"}
+        )
+        VRN_IDS.append(response.json()["id"])
+
+    evaluations = [
+        {"variant_run_id": VRN_ID, "html_blob": "<>", "replayed_elapsed_seconds": 1.2, "initiation_type": "Manual"}
+        for VRN_ID in VRN_IDS
+        for _ in range(3)
+    ]
+
+    # Permissions are checked once for the bot shared by every evaluation
+    with patch("src.core.evaluations.has_viewer_permissions", return_value=True) as permissions_mock:
+        response = client.post("/v1/evaluations/batch", json={"evaluations": evaluations})
+    assert response.status_code == 200
+    assert permissions_mock.call_count == 1
+
+    data = response.json()["data"]
+    assert [evaluation["variant_run_id"] for evaluation in data] == [VRN_IDS[0]] * 3 + [VRN_IDS[1]] * 3
+    assert all(evaluation["status"] == "Running" for evaluation in data)
+    assert client.get(f"/v1/evaluations/{data[0]['id']}").json() == data[0]
+
+    # Each evaluation is queued for the worker
+    with Session(engine) as db_session:
+        jobs = db_session.exec(select(Job).where(Job.target_id.in_([evaluation["id"] for evaluation in data]))).all()
+        assert len(jobs) == 6
+        assert all(job.job_type == JobTypeEnum.EVALUATE_CONVERSATION for job in jobs)
+
+    # Nothing is created if a variant run doesn't exist
+    response = client.post(
+        "/v1/evaluations/batch", json={"evaluations": evaluations + [evaluations[0] | {"variant_run_id": "missing"}]}
+    )
+    assert response.status_code == 404
+
+    response = client.post("/v1/evaluations/batch", json={"evaluations": []})
+    assert response.status_code == 422
+
+
+def test_suite_run_materialize_runs():
+    response = client.post("/v1/bots", json={"name": "Launch Bot", "user_id": "unknown"})
+    BOT_ID = response.json()["id"]
+    response = client.post("/v1/environments", json={"name": "Launch Env", "url": "http://localhost", "bot_id": BOT_ID})
+    ENV_ID = response.json()["id"]
+    response = client.post("/v1/suites", json={"name": "Launch Suite", "bot_id": BOT_ID})
+    SWT_ID = response.json()["id"]
+
+    # Two enabled tests with two variants each, and a disabled test
+    TST_IDS = []
+    for name in ["First", "Second", "Disabled"]:
+        response = client.post("/v1/tests", json={"suite_id": SWT_ID, "name": name})
+        TST_IDS.append(response.json()["id"])
+        for _ in range(2):
+            client.post("/v1/variants", json={"test_id": TST_IDS[-1], "replay_json": {"0": {"action": "foo"}}})
+        client.patch(f"/v1/tests/{TST_IDS[-1]}", json={"variant_count": 2, "iteration_count": 1})
+        client.post("/v1/baselines", json={"test_id": TST_IDS[-1], "name": "Baseline", "html_blob": "<></>"})
+    client.patch(f"/v1/tests/{TST_IDS[2]}", json={"full_run_enabled": False})
+    # An enabled test without variants has nothing to run
+    client.post("/v1/tests", json={"suite_id": SWT_ID, "name": "No Variants"})
+    run_queued_jobs()
+
+    # A suite of another bot can't be run in this environment, and the suite must exist
+    response = client.post("/v1/bots", json={"name": "Other Bot", "user_id": "unknown"})
+    response = client.post("/v1/suites", json={"name": "Other Suite", "bot_id": response.json()["id"]})
+    for suite_id, status_code in [(response.json()["id"], 403), ("swt_missing", 404)]:
+        response = client.post(
+            "/v1/suite_runs",
+            json={"suite_id": suite_id, "environment_id": ENV_ID, "initiation_type": "Manual", "materialize_runs": True},
+        )
+        assert response.status_code == status_code
+
+    # The whole run tree is created and returned by one request
+    response = client.post(
+        "/v1/suite_runs",
+        json={"suite_id": SWT_ID, "environment_id": ENV_ID, "initiation_type": "Manual", "materialize_runs": True},
+    )
+    assert response.status_code == 200
+    suite_run = response.json()
+    SRN_ID = suite_run["id"]
+    assert sorted(test_run["test_id"] for test_run in suite_run["test_runs"]) == sorted(TST_IDS[:2])
+    assert all(test_run["status"] == "Running" for test_run in suite_run["test_runs"])
+    assert all(len(test_run["variant_runs"]) == 2 for test_run in suite_run["test_runs"])
+    assert client.get(f"/v1/suite_runs/{SRN_ID}").json() == suite_run
+
+    # Evaluating each variant run completes the suite run, without waiting on the disabled or variantless tests
+    evaluations = [
+        {
+            "variant_run_id": variant_run["id"],
+            "html_blob": "<>",
+            "replayed_elapsed_seconds": 1.0,
+            "initiation_type": "Manual",
+        }
+        for test_run in suite_run["test_runs"]
+        for variant_run in test_run["variant_runs"]
+    ]
+    client.post("/v1/evaluations/batch", json={"evaluations": evaluations})
+    with patch("src.core.evaluations.evaluate_against_baseline", return_value={"pass": True}):
+        run_queued_jobs()
+
+    response = client.get(f"/v1/suite_runs/{SRN_ID}")
+    assert response.json()["status"] == "Pass"
+
+
+def test_stop_suite_run():
+    run_queued_jobs()
+
+    response = client.post("/v1/bots", json={"name": "Stop Bot", "user_id": "unknown"})
+    BOT_ID = response.json()["id"]
+    response = client.post("/v1/environments", json={"name": "Stop Env", "url": "http://localhost", "bot_id": BOT_ID})
+    ENV_ID = response.json()["id"]
+    response = client.post("/v1/suites", json={"name": "Stop Suite", "bot_id": BOT_ID})
+    SWT_ID = response.json()["id"]
+    response = client.post("/v1/tests", json={"suite_id": SWT_ID, "name": "Stop Test"})
+    TST_ID = response.json()["id"]
+    client.post("/v1/variants", json={"test_id": TST_ID, "replay_json": {"0": {"action": "foo"}}})
+    client.patch(f"/v1/tests/{TST_ID}", json={"iteration_count": 3})
+    client.post("/v1/baselines", json={"test_id": TST_ID, "name": "Baseline", "html_blob": "<></>"})
+    run_queued_jobs()
+
+    response = client.post(
+        "/v1/suite_runs",
+        json={"suite_id": SWT_ID, "environment_id": ENV_ID, "initiation_type": "Manual", "materialize_runs": True},
+    )
+    SRN_ID = response.json()["id"]
+    TRN_ID = response.json()["test_runs"][0]["id"]
+    VRN_ID = response.json()["test_runs"][0]["variant_runs"][0]["id"]
+    evaluation = {
+        "variant_run_id": VRN_ID,
+        "html_blob": "<>",
+        "replayed_elapsed_seconds": 1.0,
+        "initiation_type": "Manual",
+    }
+    response = client.post("/v1/evaluations/batch", json={"evaluations": [evaluation] * 3})
+    EVL_IDS = [evaluation["id"] for evaluation in response.json()["data"]]
+
+    # The first evaluation completes, and the run is stopped while the second is being evaluated
+    def stop_during_second_evaluation(success_criteria, baseline_conversation_json, evaluation_conversation_json):
+        if eval_mock.call_count == 2:
+            assert client.post(f"/v1/suite_runs/{SRN_ID}/stop").status_code == 200
+        return {"pass": True}
+
+    with patch("src.core.evaluations.evaluate_against_baseline") as eval_mock:
+        eval_mock.side_effect = stop_during_second_evaluation
+        run_queued_jobs()
+    assert eval_mock.call_count == 2
+
+    # Everything still running was stopped, and the remaining evaluation was never run
+    assert client.get(f"/v1/suite_runs/{SRN_ID}").json()["status"] == "Stopped"
+    assert client.get(f"/v1/test_runs/{TRN_ID}").json()["status"] == "Stopped"
+    assert client.get(f"/v1/variant_runs/{VRN_ID}").json()["status"] == "Stopped"
+    assert [client.get(f"/v1/evaluations/{EVL_ID}").json()["status"] for EVL_ID in EVL_IDS] == [
+        "Pass",
+        "Stopped",
+        "Stopped",
+    ]
+
+    with Session(engine) as db_session:
+        jobs = db_session.exec(select(Job).where(Job.target_id.in_(EVL_IDS)).order_by(Job.created_at)).all()
+        assert {job.target_id: job.status for job in jobs} == {
+            EVL_IDS[0]: JobStatusEnum.COMPLETED,
+            EVL_IDS[1]: JobStatusEnum.CANCELLED,
+            EVL_IDS[2]: JobStatusEnum.CANCELLED,
+        }
+
+
+def test_evaluation_retry_completes_runs():
+    run_queued_jobs()
+
+    response = client.post("/v1/bots", json={"name": "Retry Bot", "user_id": "unknown"})
+    BOT_ID = response.json()["id"]
+    response = client.post("/v1/environments", json={"name": "Retry Env", "url": "http://localhost", "bot_id": BOT_ID})
+    ENV_ID = response.json()["id"]
+    response = client.post("/v1/suites", json={"name": "Retry Suite", "bot_id": BOT_ID})
+    SWT_ID = response.json()["id"]
+    response = client.post("/v1/tests", json={"suite_id": SWT_ID, "name": "Retry Test"})
+    TST_ID = response.json()["id"]
+    client.post("/v1/variants", json={"test_id": TST_ID, "replay_json": {"0": {"action": "foo"}}})
+    client.patch(f"/v1/tests/{TST_ID}", json={"iteration_count": 1})
+    client.post("/v1/baselines", json={"test_id": TST_ID, "name": "Baseline", "html_blob": "<></>"})
+    run_queued_jobs()
+
+    response = client.post(
+        "/v1/suite_runs",
+        json={"suite_id": SWT_ID, "environment_id": ENV_ID, "initiation_type": "Manual", "materialize_runs": True},
+    )
+    SRN_ID = response.json()["id"]
+    VRN_ID = response.json()["test_runs"][0]["variant_runs"][0]["id"]
+    response = client.post(
+        "/v1/evaluations",
+        json={"variant_run_id": VRN_ID, "html_blob": "<>", "replayed_elapsed_seconds": 1.0, "initiation_type": "Manual"},
+    )
+    EVL_ID = response.json()["id"]
+
+    # The worker fails while rolling the completed variant run up into the test run
+    def fail_test_run_once(model, *args):
+        if model is db_schema.TestRun and not failed:
+            failed.append(model)
+            raise Exception("Worker died")
+        return update_run_counters(model, *args)
+
+    failed = []
+    with patch("src.core.evaluations.evaluate_against_baseline", return_value={"pass": True}), patch(
+        "src.core.evaluations.update_run_counters", side_effect=fail_test_run_once
+    ):
+        run_queued_jobs()
+        assert failed
+        assert client.get(f"/v1/evaluations/{EVL_ID}").json()["status"] == "Running"
+        assert client.get(f"/v1/suite_runs/{SRN_ID}").json()["status"] == "Running"
+
+        # The retried job completes every level
+        with Session(engine) as db_session:
+            db_session.exec(update(Job).where(Job.target_id == EVL_ID).values(available_at=Job.created_at))
+            db_session.commit()
+        run_queued_jobs()
+
+    assert client.get(f"/v1/evaluations/{EVL_ID}").json()["status"] == "Pass"
+    assert client.get(f"/v1/variant_runs/{VRN_ID}").json()["status"] == "Pass"
+    assert client.get(f"/v1/suite_runs/{SRN_ID}").json()["status"] == "Pass"
@@ -0,0 +1,68 @@
+import json
+from tests.conftest import client
+from unittest.mock import patch
+from sqlmodel import Session
+from src.core import suite_runs
+from src.db import engine
+from src.models.db_schema import SuiteRun
+from src.models.enums import RunStatusEnum
+from tests.test_analytics import create_analytics_data
+
+
+def parse_events(body: str):
+    return [
+        (lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: ")))
+        for lines in (event.split("\n") for event in body.split("\n\n") if event.startswith("event: "))
+    ]
+
+
+def test_suite_run_events():
+    SWT_ID, ENV_ID, COMPARISON_SRN_ID, SRN_ID = create_analytics_data()
+
+    # Finished suite runs only send their final progress
+    response = client.get(f"/v1/suite_runs/{SRN_ID}/events")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    assert [event_type for event_type, _ in events] == ["progress"]
+    assert events[0][1]["status"] == "Mixed"
+    assert events[0][1]["completed_count"] == 0
+
+    response = client.get("/v1/suite_runs/missing/events")
+    assert response.status_code == 404
+
+    # Running suite runs stream the progress made by other processes (e.g. the worker) until they finish
+    response = client.post(
+        "/v1/suite_runs", json={"suite_id": SWT_ID, "environment_id": ENV_ID, "initiation_type": "Manual"}
+    )
+    RUNNING_SRN_ID = response.json()["id"]
+    poll_count = 0
+
+    def poll_suite_run_progress(suite_run_id):
+        nonlocal poll_count
+        poll_count += 1
+        if poll_count == 3:
+            with Session(engine) as db_session:
+                db_session.get(SuiteRun, suite_run_id).status = RunStatusEnum.STOPPED
+                db_session.commit()
+        return poll_suite_run_progress.wrapped(suite_run_id)
+
+    poll_suite_run_progress.wrapped = suite_runs.poll_suite_run_progress
+    with patch("src.core.suite_runs.poll_suite_run_progress", poll_suite_run_progress), patch(
+        "src.api.v1.suite_runs.settings.run_events_poll_interval_seconds", 0.01
+    ):
+        response = client.get(f"/v1/suite_runs/{RUNNING_SRN_ID}/events")
+
+    # Unchanged polls send nothing
+    events = parse_events(response.text)
+    assert poll_count == 3
+    assert [event_type for event_type, _ in events] == ["progress", "progress"]
+    assert events[0][1]["status"] == "Running"
+    assert events[1][1]["status"] == "Stopped"
+    assert events[1][1]["version"] != events[0][1]["version"]
+
+    # The streams of a suite run share each poll
+    suite_runs.suite_run_progress_cache.clear()
+    with patch("src.core.suite_runs.read_suite_run_progress", wraps=suite_runs.read_suite_run_progress) as read_mock:
+        assert suite_runs.poll_suite_run_progress(RUNNING_SRN_ID) == suite_runs.poll_suite_run_progress(RUNNING_SRN_ID)
+    assert read_mock.call_count == 1
@@ -0,0 +1,78 @@
+from datetime import datetime
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlmodel import Session, SQLModel, func, select, text
+from src.core.utils import get_page_query
+from src.db import engine
+from src.models.db_schema import (
+    Baseline,
+    Bot,
+    Environment,
+    Evaluation,
+    Job,
+    Suite,
+    SuiteRun,
+    Variant,
+    VariantRun,
+)
+from src.models import db_schema
+from src.utils import PageCursor
+
+# The filters of the paginated list endpoints
+LIST_QUERIES = [
+    (Bot, select(Bot).where(Bot.user_id == "x")),
+    (Bot, select(Bot).where(Bot.organization_id == "x")),
+    (Environment, select(Environment).where(Environment.bot_id == "x")),
+    (Suite, select(Suite).where(Suite.bot_id == "x")),
+    (SuiteRun, select(SuiteRun).where(SuiteRun.suite_id == "x")),
+    (SuiteRun, select(SuiteRun).where(SuiteRun.suite_id == "x", SuiteRun.environment_id == "x")),
+    (SuiteRun, select(SuiteRun).where(SuiteRun.environment_id == "x")),
+    (db_schema.Test, select(db_schema.Test).where(db_schema.Test.suite_id == "x")),
+    (db_schema.TestRun, select(db_schema.TestRun).where(db_schema.TestRun.test_id == "x")),
+    (
+        db_schema.TestRun,
+        select(db_schema.TestRun).where(db_schema.TestRun.test_id == "x", db_schema.TestRun.environment_id == "x"),
+    ),
+    (db_schema.TestRun, select(db_schema.TestRun).where(db_schema.TestRun.environment_id == "x")),
+    (db_schema.TestRun, select(db_schema.TestRun).where(db_schema.TestRun.suite_run_id == "x")),
+    (Baseline, select(Baseline).where(Baseline.test_id == "x")),
+    (Variant, select(Variant).where(Variant.test_id == "x")),
+]
+
+# The hot queries of the list, analytics, run and job endpoints, with the pages get_page reads by offset and by cursor
+HOT_QUERIES = [
+    get_page_query(db_query, model, 10, page, cursor)
+    for model, db_query in LIST_QUERIES
+    for page, cursor in [(1, None), (2, None), (1, PageCursor(datetime(2024, 1, 1), "x"))]
+] + [
+    select(func.count()).where(db_schema.TestRun.suite_run_id == "x"),
+    select(func.count()).where(VariantRun.test_run_id == "x"),
+    select(func.count()).where(Evaluation.variant_run_id == "x"),
+    select(Job).where(Job.target_id == "x"),
+]
+
+
+def explain(db_session: Session, db_query):
+    sql = str(db_query.compile(engine, compile_kwargs={"literal_binds": True}))
+    if engine.dialect.name == "sqlite":
+        return "\n".join(row[-1] for row in db_session.exec(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+    # Small test tables would otherwise be scanned, however they are indexed
+    db_session.exec(text("SET LOCAL enable_seqscan = off"))
+    return "\n".join(row[0] for row in db_session.exec(text(f"EXPLAIN {sql}")))
+
+
+def test_hot_queries_use_indexes():
+    with Session(engine) as db_session:
+        for db_query in HOT_QUERIES:
+            plan = explain(db_session, db_query)
+
+            # Filtered through an index, which also returns the rows in page order (created_at, id)
+            assert "INDEX ix_" in plan or "Index" in plan, plan
+            assert "TEMP B-TREE" not in plan and "Sort" not in plan, plan
+
+
+def test_models_match_migrations():
+    # Indexes only created by a migration would be dropped by the next autogenerated one
+    with engine.connect() as connection:
+        assert compare_metadata(MigrationContext.configure(connection), SQLModel.metadata) == []
@@ -0,0 +1,98 @@
+from tests.conftest import client, run_queued_jobs
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from sqlmodel import Session, select
+from src.core.jobs import claim_job, complete_job
+from src.db import engine
+from src.models.db_schema import Job
+from src.models.enums import JobStatusEnum, JobTypeEnum
+from src.settings import settings
+from src.worker import run_next_job
+
+
+def test_job_queue():
+    # Clear out jobs left by other tests
+    run_queued_jobs()
+
+    # Create bot
+    response = client.post("/v1/bots", json={"name": "My Bot", "user_id": "unknown"})
+    BOT_ID = response.json()["id"]
+
+    # Create suite
+    response = client.post("/v1/suites", json={"name": "My Suite", "bot_id": BOT_ID})
+    SWT_ID = response.json()["id"]
+
+    # Create test
+    response = client.post("/v1/tests", json={"suite_id": SWT_ID, "name": "My Test"})
+    TST_ID = response.json()["id"]
+
+    # Create baseline, which queues parsing its conversation json
+    response = client.post("/v1/baselines", json={"test_id": TST_ID, "name": "Baseline", "html_blob": "<></>"})
+    assert response.status_code == 200
+    assert "conversation_json" not in response.json()
+    BSL_ID = response.json()["id"]
+
+    with Session(engine) as db_session:
+        get_job = db_session.exec(select(Job).where(Job.target_id == BSL_ID)).one()
+        assert get_job.job_type == JobTypeEnum.POPULATE_CONVERSATION_JSON
+        assert get_job.status == JobStatusEnum.QUEUED
+        JOB_ID = get_job.id
+
+    # A failing job is put back on the queue to be retried later
+    failing_handler = MagicMock(side_effect=Exception("AI unavailable"))
+    with patch.dict("src.worker.JOB_HANDLERS", {JobTypeEnum.POPULATE_CONVERSATION_JSON: failing_handler}):
+        assert run_next_job()
+    with Session(engine) as db_session:
+        get_job = db_session.get(Job, JOB_ID)
+        assert get_job.status == JobStatusEnum.QUEUED
+        assert get_job.attempts == 1
+        assert get_job.last_error == "AI unavailable"
+        assert get_job.available_at > get_job.created_at
+
+        # Make the retry due now
+        get_job.available_at = get_job.created_at
+        db_session.commit()
+
+    # The retry succeeds and the baseline is populated
+    assert run_next_job()
+    assert not run_next_job()
+    with Session(engine) as db_session:
+        get_job = db_session.get(Job, JOB_ID)
+        assert get_job.status == JobStatusEnum.COMPLETED
+        assert get_job.attempts == 2
+
+    response = client.get(f"/v1/baselines/{BSL_ID}")
+    assert response.json()["conversation_json"]
+
+
+def test_stale_job_attempts():
+    run_queued_jobs()
+
+    # Two jobs whose worker stopped responding, one on its last attempt
+    with Session(engine) as db_session:
+        stale_jobs = [
+            Job(
+                job_type=JobTypeEnum.POPULATE_CONVERSATION_JSON,
+                target_id=f"bsl_stale_{attempts}",
+                status=JobStatusEnum.RUNNING,
+                attempts=attempts,
+                locked_at=datetime.utcnow() - timedelta(seconds=settings.job_visibility_timeout_seconds + 60),
+            )
+            for attempts in [settings.job_max_attempts - 1, settings.job_max_attempts]
+        ]
+        db_session.add_all(stale_jobs)
+        db_session.commit()
+        RETRY_JOB_ID, LAST_JOB_ID = [stale_job.id for stale_job in stale_jobs]
+
+    # Only the job with attempts left is reclaimed, the other one is failed
+    get_job = claim_job()
+    assert get_job.id == RETRY_JOB_ID
+    assert get_job.attempts == settings.job_max_attempts
+    complete_job(RETRY_JOB_ID)
+    assert not claim_job()
+
+    with Session(engine) as db_session:
+        get_job = db_session.get(Job, LAST_JOB_ID)
+        assert get_job.status == JobStatusEnum.FAILED
+        assert get_job.attempts == settings.job_max_attempts
+        assert get_job.last_error
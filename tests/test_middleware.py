@@ -0,0 +1,65 @@
+import pytest
+import rsa
+from time import time
+from unittest.mock import patch
+from jose import jwk, jwt
+from jose.exceptions import ExpiredSignatureError
+from src.middleware import PublicKeyCache, VerifiedTokenCache
+
+PRIVATE_KEY = rsa.newkeys(1024)[1].save_pkcs1().decode()
+PUBLIC_JWK = jwk.construct(PRIVATE_KEY, "RS256").public_key().to_dict()
+
+
+def test_public_key_cache():
+    public_keys = PublicKeyCache(ttl_seconds=3600, min_refresh_interval_seconds=30)
+
+    with patch("src.middleware.get_public_key", return_value={"kid_1": PUBLIC_JWK}) as fetch_mock:
+        # Nothing is fetched until the first token is verified
+        assert not fetch_mock.called
+
+        # Keys are fetched once and parsed into key objects
+        for _ in range(3):
+            assert public_keys.get("kid_1").to_dict() == PUBLIC_JWK
+        assert fetch_mock.call_count == 1
+
+        # Unknown key ids only trigger a refetch once the minimum refresh interval has passed
+        assert public_keys.get("kid_2") is None
+        assert fetch_mock.call_count == 1
+
+        fetch_mock.return_value = {"kid_1": PUBLIC_JWK, "kid_2": PUBLIC_JWK}
+        with patch("src.middleware.monotonic", side_effect=lambda: public_keys._fetched_at + 60):
+            assert public_keys.get("kid_2") is not None
+        assert fetch_mock.call_count == 2
+
+
+def test_verified_token_cache():
+    verified_tokens = VerifiedTokenCache(max_size=10, max_ttl_seconds=300)
+    token = jwt.encode(
+        {"sub": "user_1", "org_id": "org_1", "exp": time() + 60},
+        PRIVATE_KEY,
+        algorithm="RS256",
+        headers={"kid": "kid_1"},
+    )
+
+    with patch("src.middleware.public_keys.get", return_value=jwk.construct(PUBLIC_JWK, "RS256")) as key_mock:
+        # Nothing is cached before the first verification, which the middleware runs in the threadpool
+        assert verified_tokens.get(token) is None
+        assert key_mock.call_count == 0
+
+        # Only the first request verifies the signature
+        for _ in range(3):
+            assert verified_tokens.verify(token)["sub"] == "user_1"
+        assert key_mock.call_count == 1
+
+        stats = verified_tokens.stats()
+        assert stats["hits"] == 2
+        assert stats["verifications"] == 1
+        assert stats["saved_cpu_seconds"] == 2 * stats["verification_cpu_seconds"]
+
+        # Expired tokens are never cached
+        expired_token = jwt.encode(
+            {"sub": "user_1", "exp": time() - 60}, PRIVATE_KEY, algorithm="RS256", headers={"kid": "kid_1"}
+        )
+        for _ in range(2):
+            with pytest.raises(ExpiredSignatureError):
+                verified_tokens.verify(expired_token)
@@ -0,0 +1,73 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+from starlette.requests import Request
+from tests.conftest import _generic_has_permissions, real_dispatch
+from src.middleware import AuthorizationHeaderMiddleware
+from src.core.utils import org_memberships_cache
+from src.models.db_schema import Bot
+
+ORG_BOT = Bot(name="Org Bot", organization_id="org_1", created_by="user_1", last_updated_by="user_1")
+ADMIN = ["org:admin"]
+VIEWER = ["org:admin", "org:editor", "org:viewer"]
+
+
+def mock_clerk_response(role):
+    response = MagicMock()
+    response.json.return_value = {"data": [{"organization": {"id": "org_1"}, "role": role}]}
+    return response
+
+
+def claim_actor(org_id, org_role):
+    # Actor of a request whose verified session token has the org_role claim
+    return {"id": "user_1", "org_id": org_id, "org_role": org_role, "org_role_verified": True}
+
+
+@patch("src.core.utils.settings.environment", "production")
+def test_permissions_from_org_role_claim():
+    with patch("src.core.utils.http_client.get") as clerk_mock:
+        # Roles in the session token are used without calling Clerk
+        assert _generic_has_permissions(claim_actor("org_1", "org:viewer"), ORG_BOT, VIEWER)
+        assert not _generic_has_permissions(claim_actor("org_1", "org:viewer"), ORG_BOT, ADMIN)
+        assert _generic_has_permissions(claim_actor("org_1", "admin"), ORG_BOT, ADMIN)
+
+        # Bots outside the active organization are never accessible
+        assert not _generic_has_permissions(claim_actor("org_2", "org:admin"), ORG_BOT, ADMIN)
+
+        assert not clerk_mock.called
+
+
+@patch("src.core.utils.settings.environment", "production")
+def test_permissions_from_clerk():
+    org_memberships_cache.clear()
+
+    with patch("src.core.utils.http_client.get", return_value=mock_clerk_response("org:editor")) as clerk_mock:
+        # Tokens without the claim fall back to Clerk, which is only called once per actor
+        for _ in range(3):
+            assert _generic_has_permissions({"id": "user_2", "org_id": "org_1"}, ORG_BOT, VIEWER)
+            assert not _generic_has_permissions({"id": "user_2", "org_id": "org_1"}, ORG_BOT, ADMIN)
+
+        assert clerk_mock.call_count == 1
+
+
+@patch("src.core.utils.settings.environment", "production")
+def test_stubbed_org_role_is_not_trusted():
+    org_memberships_cache.clear()
+
+    async def call_next(request):
+        return request.state.actor
+
+    # A stubbed request can't grant itself a role with headers
+    request = Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/v1/bots",
+            "headers": [(b"stubbed", b"user_3"), (b"org_id", b"org_1"), (b"org_role", b"org:admin")],
+        }
+    )
+    actor = asyncio.run(real_dispatch(AuthorizationHeaderMiddleware(None), request, call_next))
+    assert actor == {"id": "user_3", "org_id": "org_1"}
+
+    with patch("src.core.utils.http_client.get", return_value=mock_clerk_response("org:viewer")) as clerk_mock:
+        assert not _generic_has_permissions(actor, ORG_BOT, ADMIN)
+        assert clerk_mock.call_count == 1